@@ -0,0 +1,101 @@
+"""Incremental extraction over the history of a page.
+
+Compare the extraction of the whole text of each revision with the
+incremental extraction, on a synthetic history where each revision edits a
+paragraph of the previous one.
+
+Usage:
+    PYTHONPATH=. python benchmarks/incremental.py [--paragraphs N]
+        [--revisions N]
+"""
+import argparse
+import functools
+import random
+import time
+
+from wikidump.extractors import identifiers, incremental, misc, scanner
+
+WORDS = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do '
+         'eiusmod tempor incididunt ut labore et dolore magna aliqua '
+         'is pm 10 1.5 doi').split()
+
+CITATIONS = (
+    '<ref>{{cite journal|title=Foo|doi=10.1000/xyz.%d|pmid=%d}}</ref>',
+    '<ref>{{cite book|title=Bar|isbn=978-3-16-14841%d-%d}}</ref>',
+    '<ref>[https://www.ncbi.nlm.nih.gov/pmc/articles/PMC%d%d Baz]</ref>',
+    '<ref>{{cite arXiv|eprint=1501.%05d|class=hep-th%d}}</ref>',
+)
+
+
+def article(paragraphs: int, seed: int=0) -> str:
+    """Return a synthetic article."""
+    rng = random.Random(seed)
+    text = []
+    for number in range(paragraphs):
+        if number % 5 == 0:
+            text.append('== Section %d ==\n' % number)
+        words = [rng.choice(WORDS) for _ in range(rng.randint(50, 150))]
+        if rng.random() < 0.5:
+            citation = rng.choice(CITATIONS) % (number, rng.randint(0, 9))
+            words.insert(rng.randrange(len(words)), citation)
+        text.append(' '.join(words) + '\n\n')
+    return ''.join(text)
+
+
+def history(paragraphs: int, revisions: int, seed: int=0):
+    """Return the texts of the revisions of a synthetic page."""
+    rng = random.Random(seed)
+    blocks = article(paragraphs, seed).split('\n\n')
+    texts = []
+    for _ in range(revisions):
+        # the last block is empty
+        position = rng.randrange(len(blocks) - 1)
+        words = blocks[position].split(' ')
+        # do not break the markup of the citations
+        plain = [i for i, word in enumerate(words) if word.isalpha()]
+        words[rng.choice(plain)] = '[[Link %d]]' % rng.randrange(100)
+        blocks[position] = ' '.join(words)
+        texts.append('\n\n'.join(blocks))
+    return texts
+
+
+def measure(extract, texts):
+    start = time.perf_counter()
+    for text in texts:
+        extract(text)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--paragraphs', type=int, default=200)
+    parser.add_argument('--revisions', type=int, default=100)
+    args = parser.parse_args()
+
+    texts = history(args.paragraphs, args.revisions)
+    print('{} revisions of {} chars'.format(len(texts), len(texts[-1])))
+
+    extractors = (
+        ('identifiers',
+         lambda text: list(identifiers.extract(text)),
+         dict(extract=identifiers.extract_chunk)),
+        ('scan',
+         scanner.scan,
+         dict(extract=scanner.scan_chunk, shift=scanner.shift,
+              join=scanner.join)),
+        ('wikilinks',
+         lambda text: list(misc.raw_wikilinks('Page', text)),
+         dict(extract=functools.partial(misc.raw_wikilinks_chunk, 'Page'))),
+    )
+    for name, extract, kwargs in extractors:
+        incremental_extract = incremental.IncrementalExtractor(**kwargs)
+        full = measure(extract, texts)
+        partial = measure(incremental_extract, texts)
+        print('{:>12}: full {:8.1f} ms, incremental {:8.1f} ms, '
+              'speedup {:5.2f} (estimated {:5.2f})'.format(
+                  name, full * 1000, partial * 1000, full / partial,
+                  incremental.speedup(incremental_extract.stats)))
+
+
+if __name__ == '__main__':
+    main()
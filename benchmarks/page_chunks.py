@@ -0,0 +1,126 @@
+"""Straggler time of extract-identifiers --jobs on a skewed dump.
+
+Run extract-identifiers on a synthetic dump with a page of many revisions
+and many small pages: in a single process, with the pages as the unit of
+work (--chunk-size 0) and with the pages split in chunks of revisions. The
+seconds taken by the workers and the longest chunk are read from the stats:
+with N cores the wall-clock time cannot be less than the longest chunk, nor
+than the seconds divided by N.
+
+Usage:
+    PYTHONPATH=.:benchmarks python benchmarks/page_chunks.py [--jobs N]
+        [--revisions N] [--pages N] [--chunk-size N]
+"""
+import argparse
+import hashlib
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+
+from wikidump import cache
+
+from incremental import history
+
+HEADER = '''<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/" \
+version="0.10" xml:lang="en">
+<siteinfo><sitename>Wikipedia</sitename><dbname>enwiki</dbname>\
+<base>x</base><generator>MediaWiki</generator><case>first-letter</case>\
+<namespaces><namespace key="0" case="first-letter" /></namespaces></siteinfo>
+'''
+
+REVISION = '''<revision><id>{id}</id><timestamp>{timestamp}</timestamp>\
+<contributor><username>U</username><id>1</id></contributor><comment>c\
+</comment><model>wikitext</model><format>text/x-wiki</format>\
+<text xml:space="preserve">{text}</text><sha1>{sha1}</sha1></revision>
+'''
+
+
+def write_dump(path: pathlib.Path, revisions: int, pages: int):
+    """Write a dump with a page of revisions revisions, then pages pages of
+    10 revisions."""
+    revision_id = 0
+    with path.open('wt', encoding='utf-8') as dump:
+        dump.write(HEADER)
+        for page_id, count in enumerate([revisions] + [10] * pages):
+            dump.write('<page><title>Page {0}</title><ns>0</ns><id>{0}</id>\n'
+                       .format(page_id))
+            # history replaces a word of a paragraph in each revision
+            paragraphs = max(count // 20, 10)
+            for number, text in enumerate(history(paragraphs, count,
+                                                  seed=page_id)):
+                revision_id += 1
+                dump.write(REVISION.format(
+                    id=revision_id,
+                    timestamp='2010-01-01T{:02d}:{:02d}:{:02d}Z'.format(
+                        number // 3600 % 24, number // 60 % 60, number % 60),
+                    text=escape(text),
+                    sha1=cache.sha1(text),
+                ))
+            dump.write('</page>\n')
+        dump.write('</mediawiki>\n')
+
+
+def run(dump_path: pathlib.Path, output_dir: pathlib.Path, options):
+    """Run extract-identifiers, return the wall seconds and the stats."""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, '-m', 'wikidump', '--output-dir', str(output_dir),
+         str(dump_path), 'extract-identifiers'] + options,
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    seconds = time.perf_counter() - start
+    stats = ET.parse(str(output_dir/(dump_path.name + '.stats.xml')))
+    return seconds, stats.find('performance/parallel').attrib
+
+
+def digest(path: pathlib.Path) -> str:
+    return hashlib.sha1(path.read_bytes()).hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--jobs', type=int, default=4)
+    parser.add_argument('--revisions', type=int, default=1000)
+    parser.add_argument('--pages', type=int, default=100)
+    parser.add_argument('--chunk-size', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = pathlib.Path(directory)
+        dump_path = directory/'dump.xml'
+        write_dump(dump_path, args.revisions, args.pages)
+
+        print('a page of {} revisions, {} pages of 10 revisions, {} jobs'
+              .format(args.revisions, args.pages, args.jobs))
+        runs = (
+            ('single process', []),
+            ('pages', ['--jobs', str(args.jobs), '--chunk-size', '0']),
+            ('chunks', ['--jobs', str(args.jobs),
+                        '--chunk-size', str(args.chunk_size)]),
+        )
+        features = set()
+        for name, options in runs:
+            output_dir = directory/name.replace(' ', '_')
+            seconds, stats = run(dump_path, output_dir, options)
+            features.add(digest(output_dir/(dump_path.name +
+                                            '.features.xml')))
+            line = '{:>14}: {:8.3f} s'.format(name, seconds)
+            if options:
+                bound = max(float(stats['seconds']) / args.jobs,
+                            float(stats['longest']))
+                line += (', workers {:8.3f} s, longest {:8.3f} s, at best '
+                         '{:8.3f} s on {} cores'.format(
+                             float(stats['seconds']),
+                             float(stats['longest']), bound, args.jobs))
+            print(line)
+        assert len(features) == 1
+
+
+if __name__ == '__main__':
+    main()
@@ -29,10 +29,12 @@ setup(
         'mwcli==0.0.1',
         'mwtypes==0.2.0',
         'mwxml==0.2.0',
-        'regex==2019.02.18',
+        'regex==2021.4.4',
         'more-itertools==6.0.0',
         'fuzzywuzzy==0.8.0',
         'python-Levenshtein==0.12.0',
+        'rapidfuzz==2.11.1',
+        'numpy==1.23.5',
         'typing==3.5.0.1',
     ],
     zip_safe=False,
@@ -0,0 +1,3 @@
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers', 'slow: slow tests, deselected by -m "not slow"')
@@ -0,0 +1,55 @@
+from wikidump.extractors.common import Span, SpanIndex, enclosed_by
+
+import random
+
+
+def random_spans(rng, count, length=100):
+    spans = []
+    for _ in range(count):
+        begin = rng.randrange(length)
+        spans.append(Span(begin, rng.randint(begin, length)))
+    return spans
+
+
+def test_span_index():
+    index = SpanIndex([Span(10, 20), Span(0, 5), Span(12, 30), Span(3, 40)])
+
+    assert index.encloses(Span(13, 18))
+    assert index.enclosing(Span(13, 18)) == [
+        Span(3, 40), Span(10, 20), Span(12, 30)]
+    assert index.enclosing(Span(0, 5)) == [Span(0, 5)]
+    assert not index.encloses(Span(2, 41))
+    assert index.enclosing(Span(2, 41)) == []
+    assert not SpanIndex([]).encloses(Span(0, 0))
+
+
+def test_span_index_random():
+    rng = random.Random(0)
+    for _ in range(200):
+        containers = random_spans(rng, rng.randint(0, 20))
+        spans = random_spans(rng, rng.randint(0, 20))
+        index = SpanIndex(containers)
+        for span in spans:
+            expected = [other for other in containers if span <= other]
+            assert index.encloses(span) == bool(expected)
+            assert index.enclosing(span) == sorted(expected, key=tuple)
+
+
+def test_enclosed_by():
+    rng = random.Random(1)
+    for _ in range(200):
+        containers = {
+            name: random_spans(rng, rng.randint(0, 10))
+            for name in ('references', 'templates', 'sections')
+        }
+        spans = random_spans(rng, rng.randint(0, 20))
+        result = enclosed_by(spans, **{
+            name: SpanIndex(span_list)
+            for name, span_list in containers.items()
+        })
+        expected = [
+            {name for name, span_list in containers.items()
+             if any(span <= other for other in span_list)}
+            for span in spans
+        ]
+        assert result == expected
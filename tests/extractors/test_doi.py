@@ -3,6 +3,9 @@ from wikidump.extractors.common import Identifier
 
 import pprint
 import collections
+import random
+
+from more_itertools import peekable
 
 
 INPUT_TEXT = """
@@ -77,3 +80,23 @@ def test_extract():
         print(_, capture_begin, capture_end)
         assert 0 <= capture_begin < len(INPUT_TEXT)
         assert 0 <= capture_end < len(INPUT_TEXT)
+
+
+FUZZ_TOKENS = [
+    '10.1234/', '10.12/', 'abc', 'é', '_', '0', '-', '.', ',', '!', ';',
+    '(', ')', '[', ']', '{', '}', '<', '>', '|', '?', '#', ' ', '\n', '\r',
+    '\t', '\u00a0', '\x1c', '<!--', '-->', '--->', '<ref>', '</ref >',
+    '<REF name="a b">', '<span\n>', '<br>', '<blockquote>', '<b x', '<i>',
+]
+
+
+def test_read_doi_at_fuzz():
+    """read_doi_at reads the same dois as the tokenizer of mwcites."""
+    rnd = random.Random(0)
+    for _ in range(3000):
+        text = ''.join(rnd.choice(FUZZ_TOKENS)
+                       for _ in range(rnd.randint(1, 30)))
+        for match in doi.DOI_START_RE.finditer(text, overlapped=True):
+            begin_pos = match.start()
+            tokens = peekable(doi.tokenize_finditer(text[begin_pos:]))
+            assert doi.read_doi_at(text, begin_pos) == doi.read_doi(tokens)
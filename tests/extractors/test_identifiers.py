@@ -0,0 +1,81 @@
+from wikidump.extractors import arxiv, doi, identifiers, isbn, pubmed
+
+from . import test_arxiv, test_doi, test_scanner
+from .utils import assert_captures_in_text
+
+import collections
+import random
+
+import pytest
+
+
+TEXTS = [
+    test_arxiv.INPUT_TEXT,
+    test_doi.INPUT_TEXT,
+    test_scanner.TEXT,
+    """
+    {{cite|...|...|pmid=1}} {{cite|...|...|PMID = 2|...}}
+    {{cite|...|...|pmc = 3|...}} {{cite|...|...|pmc = pmc4|...}}
+    [http://www.ncbi.nlm.nih.gov/pubmed/5 ID]
+    [https://www.ncbi.nlm.nih.gov/pmc/articles/PMC6 ID]
+    ISBN 978-3-16-148410-0, isbn: 0-306-40615-2 and ISBN 123456789X
+    doi:10.1000/182 doi 10.1000/182. DOI:10.1000/(1)2,
+    arXiv:1501.00001v2 arxiv.org/abs/hep-th/9901001 ARXIV:1501.00002
+    """,
+]
+
+
+def chained_extract(text):
+    for extractor in (arxiv.extract, doi.extract, isbn.extract,
+                      pubmed.extract):
+        yield from extractor(text)
+
+
+def assert_equivalent(text):
+    expected = collections.Counter(chained_extract(text))
+    captures = list(identifiers.extract(text))
+    assert collections.Counter(captures) == expected
+
+    positions = [span.begin for _, span in captures]
+    assert positions == sorted(positions)
+
+
+def test_extract():
+    for text in TEXTS:
+        assert_equivalent(text)
+        assert_captures_in_text(identifiers.extract(text), text)
+
+
+def test_extract_random():
+    rng = random.Random(0)
+    pieces = ['arXiv:', 'arxiv.org/abs/', '1501.00001', 'hep-th/9901001',
+              'doi:', '10.', '1000/', '182', 'ISBN ', '0-306-40615-2', 'X',
+              'pmid=', 'pmc = ', 'PMC', '//www.ncbi.nlm.nih.gov/pubmed/',
+              '//www.ncbi.nlm.nih.gov/pmc/articles/', '{{', '}}', '|', ' ',
+              '\n', '.', ',', '(', ')', '-', 'ß', 'İ']
+    for _ in range(500):
+        text = ''.join(rng.choice(pieces) for _ in range(rng.randint(1, 40)))
+        assert_equivalent(text)
+
+
+def test_extract_types():
+    for types in ({'doi'}, {'isbn', 'pmc'}, {'arxiv', 'pmid'}):
+        types = frozenset(types)
+        # casefolding 'İ' changes the offsets
+        for text in TEXTS + ['İ' + text for text in TEXTS]:
+            expected = collections.Counter(
+                capture for capture in chained_extract(text)
+                if capture.data.type in types)
+            assert collections.Counter(
+                identifiers.extract(text, types)) == expected
+
+            captures, _ = identifiers.extract_chunk(text, types)
+            assert collections.Counter(captures) == expected
+
+
+def test_parse_types():
+    assert identifiers.parse_types('doi, ISBN') == {'doi', 'isbn'}
+    with pytest.raises(ValueError):
+        identifiers.parse_types('doi,pubmed')
+    with pytest.raises(ValueError):
+        identifiers.parse_types(',')
@@ -0,0 +1,88 @@
+from wikidump.extractors import identifiers, incremental, misc, scanner
+
+from . import test_arxiv, test_doi, test_scanner
+
+import random
+
+
+PIECES = [
+    '\n== Section ==\n', '\n=== Sub ===\n', '\n=Level 1=\n', '\n==\n', '\n',
+    '\n= 1990 =\n', '{{cite|', '}}', '[[Link', '|anchor', ']]', '[[', '<ref>',
+    '</ref>', '<ref name="a" />', '<ref name="b"', '>', 'isbn', 'ISBN ',
+    '0-306-40615-2', 'pmid = ', 'pmc', '12345', '10.1000/182', 'doi:',
+    'arXiv:', '1501.00001', '//www.ncbi.nlm.nih.gov/pubmed/', 'text ', '.',
+    ' ', '\n\n', '<references />',
+]
+
+
+def random_texts(rng, count):
+    """Consecutive revisions: each one changes a few pieces of the last."""
+    pieces = [rng.choice(PIECES) for _ in range(40)]
+    for _ in range(count):
+        for _ in range(rng.randint(1, 3)):
+            position = rng.randrange(len(pieces))
+            if rng.random() < 0.5:
+                pieces[position] = rng.choice(PIECES)
+            else:
+                pieces.insert(position, rng.choice(PIECES))
+        yield ''.join(pieces)
+
+
+def test_chunks():
+    text = 'a\n== b ==\nc\n=d=\n'
+    assert [text[begin:end] for begin, end in incremental.chunks(text)] == \
+        ['a\n', '== b ==\nc\n', '=d=\n']
+    assert list(incremental.chunks('')) == [(0, 0)]
+
+
+def assert_same_as_full(extract_chunk, extract, shift=None, join=None):
+    kwargs = {}
+    if shift is not None:
+        kwargs = dict(shift=shift, join=join)
+    incremental_extract = incremental.IncrementalExtractor(
+        extract_chunk, **kwargs)
+
+    rng = random.Random(0)
+    texts = [test_arxiv.INPUT_TEXT, test_doi.INPUT_TEXT, test_scanner.TEXT]
+    for _ in range(20):
+        texts.extend(random_texts(rng, 20))
+
+    for text in texts:
+        assert incremental_extract(text) == extract(text)
+
+    assert incremental_extract.stats['chunks_reused'] > 0
+
+
+def test_identifiers():
+    assert_same_as_full(
+        identifiers.extract_chunk,
+        lambda text: list(identifiers.extract(text)),
+    )
+
+
+def test_scan():
+    assert_same_as_full(
+        scanner.scan_chunk,
+        scanner.scan,
+        shift=scanner.shift,
+        join=scanner.join,
+    )
+
+
+def wikilink_attributes(wikilink):
+    return tuple(getattr(wikilink, name) for name in misc.Wikilink.__slots__)
+
+
+def test_raw_wikilinks():
+    def extract(text):
+        return [
+            (wikilink_attributes(wikilink), span)
+            for wikilink, span in misc.raw_wikilinks('Page', text)
+        ]
+
+    def extract_chunk(text):
+        captures, closed = misc.raw_wikilinks_chunk('Page', text)
+        return [(wikilink_attributes(wikilink), span)
+                for wikilink, span in captures], closed
+
+    assert_same_as_full(extract_chunk, extract)
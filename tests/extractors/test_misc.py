@@ -1,4 +1,5 @@
-from wikidump.extractors.misc import Section, sections, templates, references
+from wikidump.extractors.misc import (Section, sections, templates, references,
+                                      wikilinks)
 
 from .utils import assert_captures_in_text
 
@@ -146,3 +147,51 @@ def test_multiline_reference():
     found_templates = [capture.data for capture in captures]
     assert found_templates == [text]
     assert_captures_in_text(captures, text)
+
+
+def test_sections_full_body():
+    text = dedent('''\
+        Preamble
+        == Section 1 ==
+        Lorem ipsum
+        === Section 2 ===\t
+        == Section 3 ==
+        == Section 4 ==
+        asdnot
+        ==Section 5==''')
+
+    for section, _ in sections(text, include_preamble=True):
+        if section.is_preamble:
+            expected = section.body
+        else:
+            equals = '=' * section.level
+            expected = equals + section.name + equals + '\n' + section.body
+        assert section.full_body == expected
+
+    preamble, section_1, *_ = sections(text, include_preamble=True)
+    assert preamble.data.body == 'Preamble'
+    assert section_1.data.full_body == '== Section 1 ==\nLorem ipsum'
+
+
+def test_wikilinks_sections():
+    text = dedent('''\
+        [[Incipit]] text
+        == Section 1 ==
+        [[Link 1]] and [[Link 2|anchor
+        with newline]]
+        == Section 2 ==
+        === Section 3 ===
+        [[]] [[#Section 1]]s''')
+
+    found = [
+        (wikilink.link, wikilink.tosection, wikilink.anchor,
+         wikilink.section_name, wikilink.section_level,
+         wikilink.section_number)
+        for wikilink, _ in wikilinks('Page', text, sections(text))
+    ]
+    assert found == [
+        ('Incipit', '', 'Incipit', '---~--- incipit ---~---', 0, 0),
+        ('Link 1', '', 'Link 1', ' Section 1 ', 2, 1),
+        ('Link 2', '', 'anchor with newline', ' Section 1 ', 2, 1),
+        ('Page', 'Section 1', 'Page', ' Section 3 ', 3, 3),
+    ]
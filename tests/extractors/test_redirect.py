@@ -0,0 +1,44 @@
+from wikidump import utils
+from wikidump.extractors import redirect
+
+
+def targets(captures):
+    return [(capture.data.target, capture.data.tosection)
+            for capture in captures]
+
+
+def test_redirects():
+    text = '  #REDIRECT [[Apple#Taste|apples]]\n[[Category:Fruit]]'
+    assert targets(redirect.redirects(text, 'en')) == [('Apple', 'Taste')]
+
+    text = '#RINVIA [[Mela]]'
+    assert targets(redirect.redirects(text, 'it')) == [('Mela', '')]
+    assert targets(redirect.redirects(text, 'en')) == []
+
+    text = 'Apple is a fruit.\n#REDIRECT [[Pear]]'
+    assert targets(redirect.redirects(text, 'en')) == []
+
+
+def test_strip_comments():
+    text = 'a<!-- b -->c<!-- d\n-->e<!-- unclosed f'
+    for length in range(len(text) + 2):
+        prefix, truncated = redirect.strip_comments(text, length)
+        assert prefix == utils.remove_comments(text)[:length]
+    assert redirect.strip_comments(text) == ('ace<!-- unclosed f', False)
+    assert redirect.strip_comments(text, 2) == ('ac', True)
+
+
+def test_redirects_in_prefix():
+    texts = [
+        '<!-- comment -->#REDIRECT [[Apple]]',
+        '#REDIRECT <!-- comment -->[[Apple]]',
+        'Apple is a fruit.' * 100 + '\n#REDIRECT [[Pear]]',
+        '<!--' + 'x' * 1000 + '-->#REDIRECT [[Pear]]',
+        ' ' * 1000 + '#REDIRECT [[Pear]]',
+        '#REDIRECT [[Pear|' + 'x' * 1000 + ']]',
+        '#REDIRECT [[Pear',
+    ]
+    for text in texts:
+        expected = redirect.redirects(utils.remove_comments(text), 'en')
+        found = redirect.redirects_in_prefix(text, 'en', length=64)
+        assert targets(found) == targets(expected)
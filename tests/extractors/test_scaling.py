@@ -0,0 +1,143 @@
+"""Scaling of the extractors on pathological inputs.
+
+Each extractor is run on adversarial texts (unclosed markup, very long lines,
+giant tables, ...) whose size doubles, the time must grow (nearly) linearly
+with the size. The exponent of the growth is fitted on all the sizes, a
+quadratic extractor has one near 2, a linear one at most MAX_EXPONENT: a
+single slow measure, e.g. on a loaded machine, does not change it much.
+
+The tests are slow, `pytest -m "not slow"` skips them.
+"""
+import time
+
+import numpy
+
+from wikidump import utils
+from wikidump.extractors import (arxiv, doi, identifiers, incremental, isbn,
+                                 misc, pubmed, redirect, scanner)
+
+import pytest
+
+pytestmark = pytest.mark.slow
+
+MIN_SIZE = 2**8
+MAX_SIZE = 2**15
+REPEAT = 5
+MAX_EXPONENT = 1.5
+# the times below this are too short to be measured reliably
+MIN_TIME = 0.0002
+# stop growing the input when the extraction is this slow
+MAX_TIME = 0.2
+
+TABLE_ROW = '|-\n| [[a]] || {{b|c}} || <ref>d</ref>\n'
+
+INPUTS = {
+    'plain': lambda size: 'lorem ipsum ' * (size // 12),
+    'long line': lambda size: 'a' * size,
+    'long equals line': lambda size: '\n' + '=' * size,
+    'equals lines': lambda size: ('=' * 63 + '\n') * (size // 64),
+    'unclosed headings': lambda size: '\n=a' * (size // 3),
+    'blank lines after heading': lambda size: '==a==' + ' \n' * (size // 2),
+    'table': lambda size: '{|\n' + TABLE_ROW * (size // len(TABLE_ROW)),
+    'unclosed wikilinks': lambda size: '[[a' * (size // 3),
+    'open brackets': lambda size: '[' * size,
+    'unclosed anchor': lambda size: '[[a|' + 'b\n' * (size // 2),
+    'nested wikilinks': lambda size: '[[' * (size // 4) + ']]' * (size // 4),
+    'unclosed templates': lambda size: '{{' * (size // 2),
+    'nested templates': lambda size: '{{' * (size // 4) + '}}' * (size // 4),
+    'unclosed template args': lambda size: '{{a|' * (size // 4),
+    'unclosed refs': lambda size: '<ref' * (size // 4),
+    'unclosed ref tags': lambda size: '<ref ' * (size // 5),
+    'unclosed references': lambda size: '<ref>' * (size // 5),
+    'unclosed comments': lambda size: '<!--' * (size // 4),
+    'doi start': lambda size: '10.1000/' + 'a' * size,
+    'doi brackets': lambda size: '10.1000/' + '[' * size,
+    'dois': lambda size: 'doi:10.1000/a. ' * (size // 15),
+    'isbn dashes': lambda size: 'isbn ' + '-' * size,
+    'isbns': lambda size: 'isbn ' * (size // 5),
+    'pmids': lambda size: 'pmid = ' * (size // 7),
+    'arxivs': lambda size: 'arxiv:' * (size // 6),
+    'redirect anchor': lambda size: '#REDIRECT [[a|' + 'b' * size,
+    'spaces before redirect': lambda size: ' ' * size + '#REDIRECT',
+    'comment before redirect': lambda size: '<!--' + ' ' * size,
+}
+
+EXTRACTORS = {
+    'arxiv.extract': lambda text: list(arxiv.extract(text)),
+    'doi.extract': lambda text: list(doi.extract(text)),
+    'isbn.extract': lambda text: list(isbn.extract(text)),
+    'pubmed.extract': lambda text: list(pubmed.extract(text)),
+    'identifiers.candidates': identifiers.candidates,
+    'identifiers.extract': lambda text: list(identifiers.extract(text)),
+    'identifiers.extract_chunk': identifiers.extract_chunk,
+    'incremental.chunks': lambda text: list(incremental.chunks(text)),
+    'incremental.IncrementalExtractor':
+        lambda text: incremental.IncrementalExtractor(
+            identifiers.extract_chunk)(text),
+    'misc.references': lambda text: list(misc.references(text)),
+    'misc.templates': lambda text: list(misc.templates(text)),
+    'misc.section_headings': lambda text: list(misc.section_headings(text)),
+    'misc.sections': lambda text: list(misc.sections(text)),
+    'misc.pub_identifiers': lambda text: list(misc.pub_identifiers(text)),
+    'misc.raw_wikilinks': lambda text: list(misc.raw_wikilinks('Page', text)),
+    'misc.raw_wikilinks_chunk':
+        lambda text: misc.raw_wikilinks_chunk('Page', text),
+    'misc.wikilinks':
+        lambda text: list(misc.wikilinks('Page', text, misc.sections(text))),
+    'redirect.redirects': lambda text: list(redirect.redirects(text, 'it')),
+    'redirect.redirects_in_prefix':
+        lambda text: list(redirect.redirects_in_prefix(text, 'it')),
+    'redirect.strip_comments': redirect.strip_comments,
+    'scanner.scan_chunk': scanner.scan_chunk,
+    'utils.remove_comments': utils.remove_comments,
+    'utils.strip_comments': utils.strip_comments,
+}
+
+
+def measure(function, text):
+    """Return the shortest CPU time taken by function(text)."""
+    # the CPU time, the wall-clock one counts the other processes too
+    times = []
+    for _ in range(REPEAT):
+        start = time.process_time()
+        function(text)
+        times.append(time.process_time() - start)
+        if times[-1] > MAX_TIME:
+            break
+    return min(times)
+
+
+def scaling(function, generate):
+    """Return the exponent of the growth of the time of the extraction.
+
+    The size of the input is doubled until MAX_SIZE or until the extraction
+    takes more than MAX_TIME. The exponent is fitted on the sizes that take
+    at least MIN_TIME, it is None if they are less than two.
+    """
+    sizes = []
+    times = []
+    size = MIN_SIZE
+    while size <= MAX_SIZE:
+        seconds = measure(function, generate(size))
+        if seconds >= MIN_TIME:
+            sizes.append(size)
+            times.append(seconds)
+        if seconds > MAX_TIME:
+            break
+        size *= 2
+    if len(sizes) < 2:
+        return None
+    exponent, _ = numpy.polyfit(numpy.log(sizes), numpy.log(times), 1)
+    return exponent
+
+
+@pytest.mark.parametrize('name', sorted(EXTRACTORS))
+def test_linear_scaling(name):
+    function = EXTRACTORS[name]
+    superlinear = []
+    for input_name, generate in sorted(INPUTS.items()):
+        exponent = scaling(function, generate)
+        if exponent is not None and exponent > MAX_EXPONENT:
+            superlinear.append('{}: time ~ size^{:.2f}'
+                               .format(input_name, exponent))
+    assert not superlinear, superlinear
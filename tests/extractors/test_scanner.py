@@ -0,0 +1,80 @@
+from wikidump.extractors.misc import section_header_re, sections
+from wikidump.extractors.scanner import match_heading, scan
+
+import random
+from textwrap import dedent
+
+
+TEXT = dedent('''\
+    Preamble {{Infobox|name={{lang|en|Foo}}}} [[File:x.png|a [[link]]]]
+    == History ==
+    Text<ref name="a">{{cite|doi=10.1000/1}}</ref> more<ref name="a" />.
+    <!-- == Hidden == {{hidden}} <ref>hidden</ref> -->
+    === {{lang|it|Storia}} ===
+    [[Foo|bar]] {{unclosed
+    <references />
+    ''')
+
+
+def spans_text(spans, text):
+    return [text[begin:end] for begin, end in spans]
+
+
+def test_scan():
+    markup = scan(TEXT)
+
+    assert spans_text(markup.comments, TEXT) == [
+        '<!-- == Hidden == {{hidden}} <ref>hidden</ref> -->']
+    assert [heading for heading, _ in markup.headings] == [
+        (' History ', 2), (' {{lang|it|Storia}} ', 3)]
+    assert spans_text(markup.references, TEXT) == [
+        '<ref name="a">{{cite|doi=10.1000/1}}</ref>', '<ref name="a" />']
+    assert spans_text(markup.templates, TEXT) == [
+        '{{Infobox|name={{lang|en|Foo}}}}',
+        '{{lang|en|Foo}}',
+        '{{cite|doi=10.1000/1}}',
+        '{{lang|it|Storia}}',
+    ]
+    assert spans_text(markup.wikilinks, TEXT) == [
+        '[[File:x.png|a [[link]]]]', '[[link]]', '[[Foo|bar]]']
+
+
+def test_sections_from_markup():
+    text = TEXT.replace(
+        '<!-- == Hidden == {{hidden}} <ref>hidden</ref> -->\n', '')
+    markup = scan(text)
+
+    for include_preamble in (True, False):
+        expected = [
+            (section.name, section.level, section.body, span)
+            for section, span in sections(text, include_preamble)
+        ]
+        found = [
+            (section.name, section.level, section.body, span)
+            for section, span in sections(text, include_preamble, markup)
+        ]
+        assert found == expected
+
+
+HEADING_TOKENS = ['=', '==', 'a', 'b c', ' ', '\t', '\r', '\x0b', '\x1c',
+                  '\u00a0', '\n', '\n=', '\n\n']
+
+
+def test_match_heading_fuzz():
+    """match_heading matches the same headings as section_header_re."""
+    rnd = random.Random(0)
+    for _ in range(3000):
+        text = ''.join(rnd.choice(HEADING_TOKENS)
+                       for _ in range(rnd.randint(1, 20)))
+        line_starts = [0] + [pos + 1 for pos, char in enumerate(text)
+                             if char == '\n']
+        for pos in line_starts:
+            match = section_header_re.match(text, pos)
+            heading = match_heading(text, pos)
+            if match is None:
+                assert heading is None
+            else:
+                name, level = heading.data
+                assert name == match.group('section_name')
+                assert level == len(match.group('equals'))
+                assert heading.span == match.span()
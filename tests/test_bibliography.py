@@ -0,0 +1,98 @@
+from wikidump import bibliography, cache, reader, utils
+from wikidump.processors import bibliography_extractor
+
+import io
+
+import pytest
+
+DUMP = '''<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/" version="0.10">
+<siteinfo><sitename>Wikipedia</sitename><dbname>enwiki</dbname></siteinfo>
+<page><title>Foo</title><ns>0</ns><id>1</id>
+<revision><id>1</id><timestamp>2005-01-01T00:00:00Z</timestamp><text>== History ==
+a
+== References ==
+b</text></revision>
+</page>
+</mediawiki>'''
+
+
+def test_normalize():
+    assert bibliography.normalize(' Further  Reading: ') == 'further  reading'
+    # fuzzywuzzy drops only the chars between 128 and 255
+    assert bibliography.normalize('Bibliografía') == 'bibliografa'
+    assert bibliography.normalize('Литература') == 'литература'
+    assert bibliography.normalize('snake_case') == 'snake_case'
+
+
+@pytest.mark.parametrize('name,expected', [
+    ('References', True),
+    ('references', True),
+    ('== Notes ==', True),
+    ('Refrences', True),
+    ('Further reading', True),
+    ('Citation', True),
+    ('See also', False),
+    ('Notes and references', False),
+    ('External links', False),
+    ('', False),
+    ('!!!', False),
+])
+def test_classifier(name, expected):
+    classifier = bibliography.Classifier('en')
+    assert classifier(name) == expected
+    assert classifier.classify([name, 'History', name]) == \
+        [expected, False, expected]
+
+
+def test_classifier_cache():
+    classifier = bibliography.Classifier('en', cache_size=2)
+    assert classifier.classify(['Notes', 'NOTES', 'History']) == \
+        [True, True, False]
+    assert len(classifier.by_name) == 2
+    assert len(classifier.by_normalized_name) == 2
+    assert classifier('Notes')
+
+
+def test_persistent_cache(tmp_path):
+    path = str(tmp_path/'bibliography.sqlite')
+
+    classifier = bibliography.Classifier(
+        'en', persistent_cache=bibliography.PersistentCache(path))
+    assert classifier.classify(['Notes', 'History']) == [True, False]
+    classifier.flush()
+    classifier.persistent_cache.close()
+
+    persistent_cache = bibliography.PersistentCache(path)
+    assert persistent_cache.get(classifier.key, ['notes', 'history', 'x']) \
+        == {'notes': True, 'history': False}
+
+    # the saved decisions are used instead of scoring the names
+    persistent_cache.put(classifier.key, {'history': True})
+    classifier = bibliography.Classifier(
+        'en', persistent_cache=persistent_cache)
+    assert classifier('History')
+
+    # the decisions of another language are not
+    classifier = bibliography.Classifier(
+        'it', persistent_cache=persistent_cache)
+    assert not classifier('History')
+    assert classifier('Bibliografia')
+
+
+def test_extract_revisions_default_classifier():
+    stats = {
+        'performance': {
+            'cache': cache.CacheStatsDict(),
+            'revisions_analyzed': 0,
+        },
+        'section_names': {
+            'global': utils.counter(),
+            'last_revision': utils.counter(),
+        },
+    }
+    page = next(iter(reader.dump_from_file(io.StringIO(DUMP))))
+    revisions = list(bibliography_extractor.extract_revisions(
+        page, 'en', stats, only_last_revision=False))
+    assert [(heading.name, heading.level)
+            for heading in revisions[0].sections] == [(' References ', 2)]
+    assert revisions[0].text == '== References ==\nb'
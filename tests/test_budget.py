@@ -0,0 +1,112 @@
+from wikidump import budget
+from wikidump.extractors import identifiers
+
+import collections
+import threading
+import time
+
+import pytest
+import regex
+
+Page = collections.namedtuple('Page', 'id title')
+Revision = collections.namedtuple('Revision', 'id page text')
+
+# the pattern backtracks over the whole text for each "<ref" (as the one of
+# `misc.references` did when there is no "</ref>")
+references_re = regex.compile(r'<ref.*?</ref>', regex.DOTALL)
+PATHOLOGICAL_TEXT = '<ref>' * 20000
+
+
+def references(text):
+    return list(references_re.finditer(text, timeout=budget.remaining()))
+
+
+def test_remaining():
+    assert budget.remaining() is None
+    with budget.deadline(10):
+        assert 0 < budget.remaining() <= 10
+        with budget.deadline(0):
+            assert budget.remaining() is None
+        assert budget.remaining() is not None
+    assert budget.remaining() is None
+
+
+def test_check():
+    budget.check()
+    with budget.deadline(0.001):
+        time.sleep(0.002)
+        with pytest.raises(TimeoutError):
+            list(identifiers.extract('doi:10.1000/182'))
+
+
+def test_within_budget():
+    revision_budget = budget.Budget(timeout=10, max_size=10)
+    revision = Revision(1, Page(2, 'Page'), '<ref>a</ref>')
+    assert revision_budget.run(revision, len) is None
+
+    revision = Revision(1, Page(2, 'Page'), 'abc')
+    assert revision_budget.run(revision, str.upper) == 'ABC'
+    assert revision_budget.run(Revision(1, None, None), len) == 0
+
+
+def test_over_size(tmp_path):
+    log_path = tmp_path/'budget.tsv'
+    revision = Revision(1, Page(2, 'Page'), 'abcdef')
+
+    revision_budget = budget.Budget(max_size=4, log_path=str(log_path))
+    assert revision_budget.run(revision, str.upper) is None
+
+    revision_budget = budget.Budget(max_size=4, action=budget.TRUNCATE,
+                                    log_path=str(log_path),
+                                    stats=revision_budget.stats)
+    assert revision_budget.run(revision, str.upper) == 'ABCD'
+
+    assert revision_budget.stats == {
+        'over_time': 0, 'over_size': 2, 'skipped': 1, 'truncated': 1}
+    assert log_path.read_text().splitlines() == [
+        '2\tPage\t1\tsize\t6\tskipped',
+        '2\tPage\t1\tsize\t6\ttruncated',
+    ]
+
+
+def test_over_time(tmp_path):
+    log_path = tmp_path/'budget.tsv'
+    revision_budget = budget.Budget(timeout=0.05, log_path=str(log_path))
+    revision = Revision(1, Page(2, 'Page'), PATHOLOGICAL_TEXT)
+
+    assert revision_budget.run(revision, references) is None
+    assert revision_budget.stats['over_time'] == 1
+    assert log_path.read_text() == '2\tPage\t1\ttime\t{}\tskipped\n'.format(
+        len(PATHOLOGICAL_TEXT))
+
+
+def test_log_rows(tmp_path):
+    log_path = tmp_path/'budget.tsv'
+    log_rows = []
+    revision_budget = budget.Budget(max_size=4, log_path=str(log_path),
+                                    log_rows=log_rows)
+    assert revision_budget.run(Revision(1, Page(2, 'Page'), 'abcdef'),
+                               str.upper) is None
+    # the rows are kept, to be written later
+    assert log_rows == [(2, 'Page', 1, 'size', 6, 'skipped')]
+    assert not log_path.exists()
+
+    budget.write_log(str(log_path), log_rows)
+    budget.write_log(str(log_path), [])
+    budget.write_log(None, log_rows)
+    assert log_path.read_text() == '2\tPage\t1\tsize\t6\tskipped\n'
+
+
+def test_over_time_in_thread():
+    revision_budget = budget.Budget(timeout=0.05)
+    revision = Revision(1, Page(2, 'Page'), PATHOLOGICAL_TEXT)
+    results = []
+
+    thread = threading.Thread(
+        target=lambda: results.append(
+            revision_budget.run(revision, references)))
+    thread.start()
+    thread.join()
+
+    assert results == [None]
+    assert revision_budget.stats['over_time'] == 1
@@ -0,0 +1,46 @@
+from wikidump import cache
+
+import collections
+
+Revision = collections.namedtuple('Revision', 'sha1 text')
+
+
+def test_sha1():
+    # the sha1 of the empty text in the dumps
+    assert cache.sha1('') == 'phoiac9h4m842xq45sp7s6u21eteeq1'
+    assert len(cache.sha1('Lorem ipsum')) == cache.SHA1_LENGTH
+
+
+def test_revision_sha1():
+    assert cache.revision_sha1(Revision('abc', 'text')) == 'abc'
+    assert cache.revision_sha1(Revision(None, 'text')) == cache.sha1('text')
+    assert cache.revision_sha1(Revision(None, None)) == cache.sha1('')
+
+
+def test_revision_cache():
+    revision_cache = cache.RevisionCache(size=2)
+    calls = []
+
+    def get(text):
+        def extract():
+            calls.append(text)
+            return text.upper()
+        return revision_cache.get(Revision(None, text), extract)
+
+    assert get('a') == 'A'
+    assert get('b') == 'B'
+    assert get('a') == 'A'
+    # 'b' is the least recently used
+    assert get('c') == 'C'
+    assert get('a') == 'A'
+    assert get('b') == 'B'
+
+    assert calls == ['a', 'b', 'c', 'b']
+    assert revision_cache.stats == {'hits': 2, 'misses': 4}
+
+
+def test_revision_cache_disabled():
+    revision_cache = cache.RevisionCache(size=0)
+    for _ in range(2):
+        assert revision_cache.get(Revision('abc', 'a'), lambda: 'A') == 'A'
+    assert revision_cache.stats == {'hits': 0, 'misses': 0}
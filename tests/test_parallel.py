@@ -0,0 +1,37 @@
+from wikidump import parallel
+
+
+def test_chunks():
+    assert list(parallel.chunks(range(5), chunk_size=2)) == [
+        (None, [0, 1], False),
+        (1, [2, 3], False),
+        (3, [4], True),
+    ]
+    assert list(parallel.chunks(range(4), chunk_size=2)) == [
+        (None, [0, 1], False),
+        (1, [2, 3], True),
+    ]
+    # the pages without revisions have a chunk too
+    assert list(parallel.chunks([], chunk_size=2)) == [(None, [], True)]
+    assert list(parallel.chunks(range(5), chunk_size=0)) == [
+        (None, [0, 1, 2, 3, 4], True)]
+
+
+def test_imap():
+    stats = parallel.ParallelStatsDict()
+    tasks = [-number for number in range(20)]
+    # the workers are forked, abs is pickled by name
+    assert list(parallel.imap(abs, tasks, jobs=3, stats=stats)) == \
+        list(range(20))
+    assert stats['jobs'] == 3
+    assert stats['chunks'] == 20
+    assert 0 <= stats['longest'] <= stats['seconds']
+
+
+def test_add_stats():
+    total = {'a': 1, 'b': {'c': 2}}
+    parallel.add_stats(total, {'a': 2, 'b': {'c': 3}})
+    assert total == {'a': 3, 'b': {'c': 5}}
+
+    parallel.clear_stats(total)
+    assert total == {'a': 0, 'b': {'c': 0}}
@@ -0,0 +1,111 @@
+from wikidump import reader
+
+import hashlib
+import io
+
+DUMP = '''<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/" version="0.10">
+<siteinfo><sitename>Wikipedia</sitename><dbname>enwiki</dbname></siteinfo>
+<page><title>Foo</title><ns>0</ns><id>1</id>
+<revision><id>1</id><timestamp>2005-01-01T00:00:00Z</timestamp><text>one</text></revision>
+<revision><id>2</id><timestamp>2008-01-01T00:00:00Z</timestamp><text>two</text></revision>
+<revision><id>3</id><timestamp>2012-01-01T00:00:00Z</timestamp><text>three</text></revision>
+</page>
+<page><title>Bar</title><ns>0</ns><id>2</id>
+<revision><id>4</id><timestamp>2015-01-01T00:00:00Z</timestamp><text>four</text></revision>
+</page>
+</mediawiki>'''
+
+
+def read(**kwargs):
+    dump = reader.dump_from_file(io.StringIO(DUMP), **kwargs)
+    pages = [(page.id, [(rev.id, rev.text) for rev in page]) for page in dump]
+    return dump, pages
+
+
+def test_parse_timestamp():
+    assert reader.parse_timestamp('2010-01-01') == '2010-01-01T00:00:00Z'
+    assert reader.parse_timestamp('2010-01-01T12:30:00Z') == \
+        '2010-01-01T12:30:00Z'
+
+
+def test_unbounded():
+    dump, pages = read()
+    assert pages == [
+        (1, [(1, 'one'), (2, 'two'), (3, 'three')]),
+        (2, [(4, 'four')]),
+    ]
+    assert dump.revisions_filtered == 0
+
+
+def test_window():
+    dump, pages = read(since='2008-01-01T00:00:00Z',
+                       until='2012-01-01T00:00:00Z')
+    assert pages == [(1, [(2, 'two')]), (2, [])]
+    assert dump.revisions_filtered == 3
+
+
+def test_until_first_revision():
+    dump, pages = read(until='2006-01-01T00:00:00Z')
+    assert pages == [(1, [(1, 'one')]), (2, [])]
+    assert dump.revisions_filtered == 3
+
+
+def test_load_checksums(tmpdir):
+    sums = tmpdir.join('md5sums.txt')
+    sums.write(
+        'D41D8CD98F00B204E9800998ECF8427E  enwiki-pages.xml.bz2\n'
+        '\n'
+        '0cc175b9c0f1b6a831c399e269772661 *enwiki-other.xml.7z\n'
+    )
+    assert reader.load_checksums(str(sums)) == {
+        'enwiki-pages.xml.bz2': 'd41d8cd98f00b204e9800998ecf8427e',
+        'enwiki-other.xml.7z': '0cc175b9c0f1b6a831c399e269772661',
+    }
+
+
+def test_open_verified_file(tmpdir):
+    dump = tmpdir.join('dump.xml')
+    dump.write(DUMP)
+
+    digest = hashlib.sha1(DUMP.encode('utf-8')).hexdigest()
+
+    xml_file, verifier = reader.open_verified_file(str(dump), digest)
+    assert xml_file.read().decode('utf-8') == DUMP
+    ok, _ = verifier.verify()
+    assert ok
+    assert verifier.algorithm == 'sha1'
+
+    xml_file, verifier = reader.open_verified_file(str(dump), '0' * 32)
+    xml_file.read()
+    ok, message = verifier.verify()
+    assert not ok
+    assert 'md5 mismatch' in message
+
+
+def test_open_verified_file_not_read(tmpdir):
+    # more than the pipes can hold: the decompressor blocks until closed
+    data = DUMP * 1000
+    dump = tmpdir.join('dump.xml')
+    dump.write(data)
+
+    digest = hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+    xml_file, verifier = reader.open_verified_file(str(dump), digest)
+    xml_file.read(10)
+    ok, message = verifier.verify()
+    assert not ok
+    assert 'not read until the end' in message
+    assert verifier.process.returncode is not None
+
+
+def test_open_verified_file_corrupt(tmpdir):
+    dump = tmpdir.join('dump.xml.bz2')
+    dump.write('not bzip2 data')
+
+    digest = hashlib.md5(b'not bzip2 data').hexdigest()
+
+    xml_file, verifier = reader.open_verified_file(str(dump), digest)
+    xml_file.read()
+    ok, message = verifier.verify()
+    assert not ok
+    assert 'bzcat exited with status' in message
@@ -0,0 +1,49 @@
+from wikidump import reverts
+
+
+def process(detector, sha1s):
+    return [detector.process(sha1, revision_id)
+            for revision_id, sha1 in enumerate(sha1s)]
+
+
+def test_detector():
+    detector = reverts.Detector()
+    assert process(detector, ['a', 'b', 'c', 'a', 'a', 'c']) == [
+        None,
+        None,
+        None,
+        reverts.Revert(3, 0, [1, 2]),
+        # a null edit reverts nothing
+        None,
+        reverts.Revert(5, 2, [3, 4]),
+    ]
+
+
+def test_detector_radius():
+    detector = reverts.Detector(radius=2)
+    # the first revision is too far to be restored
+    assert process(detector, ['a', 'b', 'c', 'd', 'a', 'd']) == [
+        None, None, None, None, None, reverts.Revert(5, 3, [4])]
+    # only the sha1 of the last revisions are kept
+    assert len(detector.last) <= 3
+
+
+def test_delayed():
+    # the edit war of b and c, the last revision restores a
+    sha1s = ['a', 'b', 'a', 'b', 'c', 'a', 'd']
+    delayed = list(reverts.delayed(enumerate(sha1s),
+                                   key=lambda item: (item[1], item[0]),
+                                   radius=3))
+
+    assert [item for item, _, _ in delayed] == list(enumerate(sha1s))
+    assert [revert for _, revert, _ in delayed] == [
+        None,
+        None,
+        reverts.Revert(2, 0, [1]),
+        reverts.Revert(3, 1, [2]),
+        None,
+        reverts.Revert(5, 2, [3, 4]),
+        None,
+    ]
+    assert [reverted for _, _, reverted in delayed] == \
+        [False, True, True, True, True, False, False]
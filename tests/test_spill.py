@@ -0,0 +1,40 @@
+from wikidump import spill
+
+import operator
+import random
+
+
+def test_sorted_spilled():
+    rnd = random.Random(0)
+    # (key, position): the positions check that the sort is stable
+    items = [(rnd.randrange(50), position) for position in range(2500)]
+    key = operator.itemgetter(0)
+
+    stats = spill.SpillStatsDict()
+    assert list(spill.sorted_spilled(items, key=key, buffer_size=1000,
+                                     stats=stats)) == sorted(items, key=key)
+    assert stats == {'pages': 1, 'runs': 2}
+
+    # the buffer is large enough, or unlimited
+    for buffer_size in (5000, 0):
+        stats = spill.SpillStatsDict()
+        assert list(spill.sorted_spilled(
+            items, key=key, buffer_size=buffer_size, stats=stats)) \
+            == sorted(items, key=key)
+        assert stats == {'pages': 0, 'runs': 0}
+
+    assert list(spill.sorted_spilled([], buffer_size=1)) == []
+
+
+def test_sorted_runs():
+    runs = spill.SortedRuns()
+    runs.spill([1, 3, 5])
+    runs.spill([])
+    runs.spill(sorted([2, 3, 4] * spill.BATCH_SIZE))
+    assert len(runs) == 3
+
+    merged = list(runs.merge([0, 6]))
+    assert merged == [0, 1] + [2] * spill.BATCH_SIZE + [3] * \
+        (spill.BATCH_SIZE + 1) + [4] * spill.BATCH_SIZE + [5, 6]
+    # the runs are removed once merged
+    assert len(runs) == 0
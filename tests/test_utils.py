@@ -0,0 +1,139 @@
+from wikidump import utils
+from wikidump.extractors import identifiers
+from wikidump.extractors.common import CaptureResult, Span
+
+import collections
+import random
+
+import pytest
+
+
+def test_remove_comments():
+    text = 'No comments here.'
+    assert utils.remove_comments(text) is text
+    assert utils.remove_comments('a<!-- b -->c<!--\nd-->') == 'ac'
+    # a comment ends at the first -->, the unclosed ones are kept
+    assert utils.remove_comments('a<!-- <!-- b -->c<!-->d<!-- e') == \
+        'ac<!-->d<!-- e'
+    text = '<!--' * 3
+    assert utils.remove_comments(text) is text
+    assert utils.strip_comments('a<!--b-->c<!--d')[0] == 'ac<!--d'
+
+
+def test_strip_comments_without_comments():
+    text = 'No comments here.'
+    stripped, offset_map = utils.strip_comments(text)
+    assert stripped is text
+    assert not offset_map
+    assert offset_map.original_span(Span(3, 11)) == Span(3, 11)
+
+
+def test_strip_comments():
+    text = '<!--x-->ab<!-- y -->cd<!--z-->'
+    stripped, offset_map = utils.strip_comments(text)
+    assert stripped == 'abcd'
+    assert [offset_map.original(offset) for offset in range(4)] == \
+        [8, 9, 20, 21]
+    assert offset_map.original_span(Span(0, 4)) == Span(8, 22)
+    assert offset_map.original_span(Span(2, 2)) == Span(20, 20)
+    assert offset_map.original_captures([CaptureResult('bc', Span(1, 3))]) \
+        == [CaptureResult('bc', Span(9, 21))]
+
+
+def test_strip_comments_identifiers():
+    rng = random.Random(0)
+    pieces = ['doi:10.1000/182 ', 'ISBN 0-306-40615-2 ', 'text ', '\n',
+              '<!-- comment -->', '<!-- PMID 12345 -->', '{{cite|pmc = 345}}']
+    for _ in range(100):
+        text = ''.join(rng.choice(pieces) for _ in range(20))
+        stripped, offset_map = utils.strip_comments(text)
+        assert stripped == utils.remove_comments(text)
+        captures = list(identifiers.extract(stripped))
+        for (_, span), (_, original_span) in zip(
+                captures, offset_map.original_captures(captures)):
+            # the comments inside the span are kept in the original text
+            assert utils.remove_comments(text[slice(*original_span)]) == \
+                stripped[slice(*span)]
+
+
+def test_intern_table():
+    table = utils.InternTable()
+    ids = table.array(['c', 'a', 'c', 'b'])
+    assert ids.tolist() == [0, 1, 2]
+    assert [table[id_] for id_ in ids.tolist()] == ['c', 'a', 'b']
+    assert table.array(['b', 'd']).tolist() == [2, 3]
+    assert len(table) == 4
+    assert table.array([]) is utils.EMPTY_IDS
+
+
+def test_diff_ids():
+    table = utils.InternTable()
+    previous = table.array(['a', 'b', 'c'])
+    current = table.array(['d', 'c', 'a'])
+
+    added, removed = utils.sorted_diff(previous, current)
+    assert added.tolist() == [table.intern('d')]
+    assert removed.tolist() == [table.intern('b')]
+
+    assert sorted(utils.diff_ids(previous, current, table)) == \
+        sorted(utils.diff(['a', 'b', 'c'], ['d', 'c', 'a']))
+    assert utils.diff_ids(current, current.copy(), table) == []
+    assert utils.diff_ids(utils.EMPTY_IDS, previous, table) == [
+        utils.Diff('added', 'a'),
+        utils.Diff('added', 'b'),
+        utils.Diff('added', 'c'),
+    ]
+
+
+def test_live_intervals():
+    table = utils.InternTable()
+    intervals = utils.LiveIntervals()
+    a, b, c = (table.intern(item) for item in 'abc')
+
+    assert intervals.add(1, table.array(['a', 'b'])) == []
+    assert intervals.add(2, table.array(['a', 'b'])) == []
+    assert intervals.add(3, table.array(['c', 'a'])) == [
+        utils.Interval(b, 1, 3)]
+    assert len(intervals) == 2
+    assert intervals.add(4, utils.EMPTY_IDS) == [
+        utils.Interval(a, 1, 4), utils.Interval(c, 3, 4)]
+    # an identifier added again opens a new interval
+    assert intervals.add(5, table.array(['b'])) == []
+    assert intervals.close() == [utils.Interval(b, 5, None)]
+    assert len(intervals) == 0
+
+
+def test_space_saving():
+    rng = random.Random(0)
+    stream = ['a'] * 1000 + ['b'] * 500 + ['c'] * 300 + \
+        ['rare %d' % number for number in range(5000)]
+    rng.shuffle(stream)
+    exact = collections.Counter(stream)
+
+    counter = utils.SpaceSaving(3, size=50)
+    counter.update(stream)
+    assert len(counter) == 50
+    assert counter.total == len(stream)
+
+    # the keys more common than total / size are always counted
+    assert [key for key, _ in counter.most_common()] == ['a', 'b', 'c']
+    for key, count in counter.most_common(50):
+        assert count - counter.error(key) <= exact[key] <= count
+        assert counter.error(key) <= len(stream) / 50
+
+
+def test_counter():
+    assert isinstance(utils.counter(), collections.Counter)
+
+    counter = utils.counter(top_k=2)
+    counter.update('abacab')
+    # nothing is dropped, the counts are exact
+    assert counter.most_common() == [('a', 3), ('b', 2)]
+    assert counter.error('a') == 0
+
+
+def test_parse_top_k():
+    assert utils.parse_top_k('10') == 10
+    assert utils.parse_top_k('0') == 0
+    with pytest.raises(ValueError):
+        utils.parse_top_k('-1')
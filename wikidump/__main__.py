@@ -9,11 +9,12 @@ import argparse
 import subprocess
 
 import mw.xml_dump
-import mwxml
 import pathlib
 from typing import IO, Optional, Union
 
-from . import processors, utils
+from . import budget, cache, processors, reader, spill, utils
+
+ERR_CHECKSUM = 3
 
 
 def open_xml_file(path: Union[str, IO]):
@@ -54,6 +55,12 @@ def create_path(path: Union[pathlib.Path, str]):
         path.parent.mkdir(parents=True)
 
 
+def mark_invalid(output_dir: pathlib.Path, basename: str, message: str):
+    """Mark the outputs obtained from an input file as invalid."""
+    with (output_dir/(basename + '.invalid')).open('wt') as outfile:
+        outfile.write(message + '\n')
+
+
 def get_args():
     """Parse command line arguments."""
     ERR_NO_FILES = 1
@@ -88,6 +95,80 @@ def get_args():
         action='store_true',
         help="Don't write any file",
     )
+    parser.add_argument(
+        '--verify-checksums',
+        metavar='FILE',
+        type=pathlib.Path,
+        required=False,
+        default=None,
+        help='Verify the input files against this md5sums or sha1sums file '
+             'while they are read.',
+    )
+    parser.add_argument(
+        '--since',
+        type=reader.parse_timestamp,
+        required=False,
+        default=None,
+        help='Consider only the revisions made at or after this date '
+             '(e.g. 2010-01-01 or 2010-01-01T12:00:00Z).',
+    )
+    parser.add_argument(
+        '--until',
+        type=reader.parse_timestamp,
+        required=False,
+        default=None,
+        help='Consider only the revisions made before this date, '
+             '--only-last-revision then refers to the last revision before '
+             'this date.',
+    )
+    parser.add_argument(
+        '--revision-cache-size',
+        metavar='N',
+        type=int,
+        default=cache.DEFAULT_SIZE,
+        help='Reuse the results of the last N distinct texts of each page '
+             'for the revisions with the same text (e.g. reverts), 0 '
+             'disables the cache [default: {}].'.format(cache.DEFAULT_SIZE),
+    )
+    parser.add_argument(
+        '--revision-timeout',
+        metavar='SECONDS',
+        type=float,
+        default=budget.DEFAULT_TIMEOUT,
+        help='Skip the revisions whose extraction takes longer than this, 0 '
+             'disables the limit [default: {}].'.format(
+                 budget.DEFAULT_TIMEOUT),
+    )
+    parser.add_argument(
+        '--max-revision-size',
+        metavar='CHARS',
+        type=int,
+        default=budget.DEFAULT_MAX_SIZE,
+        help='Skip or truncate (see --over-budget) the revisions longer than '
+             'this, 0 disables the limit [default: {}].'.format(
+                 budget.DEFAULT_MAX_SIZE),
+    )
+    parser.add_argument(
+        '--over-budget',
+        choices=budget.ACTIONS,
+        default=budget.SKIP,
+        help='What to do with the revisions longer than --max-revision-size. '
+             'Over budget revisions are logged in FILE.budget.tsv in the '
+             'output directory [default: {}].'.format(budget.SKIP),
+    )
+
+    parser.add_argument(
+        '--sort-buffer-size',
+        metavar='N',
+        type=int,
+        default=spill.DEFAULT_BUFFER_SIZE,
+        help='Keep at most N revisions of a page in memory when they are '
+             'sorted (extract-redirects, extract-revisionlist '
+             '--ensure-sorted, extract-identifiers-history), the others are '
+             'spilled to compressed temporary files, 0 disables the limit '
+             '[default: {}].'.format(
+                 spill.DEFAULT_BUFFER_SIZE),
+    )
 
     subparsers = parser.add_subparsers(help='sub-commands help')
     processors.bibliography_extractor.configure_subparsers(subparsers)
@@ -120,16 +201,37 @@ def main():
     if not args.output_dir.exists():
         args.output_dir.mkdir(parents=True)
 
+    checksums = dict()
+    if args.verify_checksums:
+        checksums = reader.load_checksums(str(args.verify_checksums))
+
+    invalid_files = []
     for input_file_path in args.files:
         utils.log("Analyzing {}...".format(input_file_path))
 
-        dump = mwxml.Dump.from_file(open_xml_file(str(input_file_path)))
-
         basename = input_file_path.name
 
+        verifier = None
+        if basename in checksums:
+            xml_file, verifier = reader.open_verified_file(
+                str(input_file_path),
+                checksums[basename],
+            )
+        else:
+            if args.verify_checksums:
+                utils.log("No checksum found for {}.".format(basename))
+            xml_file = open_xml_file(str(input_file_path))
+
+        dump = reader.dump_from_file(
+            xml_file,
+            since=args.since,
+            until=args.until,
+        )
+
         if args.dry_run:
             pages_output = open(os.devnull, 'wt')
             stats_output = open(os.devnull, 'wt')
+            args.budget_log = None
         else:
             pages_output = output_writer(
                 path=str(args.output_dir/(basename + '.features.xml')),
@@ -139,6 +241,11 @@ def main():
                 path=str(args.output_dir/(basename + '.stats.xml')),
                 compression=args.output_compression,
             )
+            # the log is appended to only if some revision is over budget
+            budget_log = args.output_dir/(basename + '.budget.tsv')
+            if budget_log.exists():
+                budget_log.unlink()
+            args.budget_log = str(budget_log)
         args.func(
             dump,
             pages_output,
@@ -153,8 +260,24 @@ def main():
         pages_output.close()
         stats_output.close()
 
+        if verifier is not None:
+            # the decompressor must not be left blocked writing to xml_file
+            xml_file.close()
+            ok, message = verifier.verify()
+            utils.log(message)
+            if not ok:
+                invalid_files.append(input_file_path)
+                if not args.dry_run:
+                    mark_invalid(args.output_dir, basename, message)
+
         utils.log("Done Analyzing {}.".format(input_file_path))
 
+    if invalid_files:
+        utils.log("Error: the checksum of {} file(s) did not match, their "
+                  "outputs are marked as invalid.".format(len(invalid_files)))
+        print(file=sys.stderr)
+        sys.exit(ERR_CHECKSUM)
+
 
 if __name__ == '__main__':
     main()
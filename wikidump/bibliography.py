@@ -0,0 +1,253 @@
+"""Classification of the section names as bibliography.
+
+A section is a bibliography if its name matches one of the bibliography
+synonyms of the language (see `languages.bibliography`) with a score of at
+least `SCORE_CUTOFF`. The score is the one of `fuzzywuzzy.process.extractOne`
+(WRatio of the processed strings, rounded to an integer), computed with
+rapidfuzz against all the synonyms at once.
+
+The same few names (References, Notes, See also, ...) are in almost every
+revision of every page, so the decisions are cached in memory, keyed by the
+name and by the processed name, and can be saved in a sqlite database that
+is shared by the runs and by the languages.
+"""
+import hashlib
+import re
+import sqlite3
+
+import numpy
+import rapidfuzz.fuzz
+import rapidfuzz.process
+from typing import Dict, Iterable, List, Mapping, MutableMapping, Optional
+
+from . import languages
+
+SCORE_CUTOFF = 91       # between 0, 100
+# names, 0 for an unbounded cache
+DEFAULT_CACHE_SIZE = 2**16
+# decisions written to the persistent cache at once
+FLUSH_SIZE = 1024
+
+# fuzzywuzzy.utils.full_process with force_ascii=True: it drops the chars
+# between 128 and 255 (and only them) and replaces the non-word chars, as
+# defined by the re module, with spaces.
+_NON_ASCII_TABLE = dict.fromkeys(range(128, 256))
+_non_word_re = re.compile(r'\W', re.UNICODE)
+
+
+def normalize(name: str) -> str:
+    """Return the name processed like fuzzywuzzy does before scoring it."""
+    name = name.translate(_NON_ASCII_TABLE)
+    return _non_word_re.sub(' ', name).lower().strip()
+
+
+def synonyms_key(synonyms: Iterable[str], score_cutoff: int) -> str:
+    """Return the key of the decisions taken with synonyms and cutoff."""
+    key = '\n'.join(sorted(synonyms)) + '\n{}'.format(score_cutoff)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+class PersistentCache:
+    """Decisions of the classifiers, saved in a sqlite database.
+
+    The decisions depend only on the synonyms and on the score cutoff, so
+    they are keyed by them (see `synonyms_key`) and not by the language:
+    changing the synonyms of a language does not reuse stale decisions.
+    """
+    def __init__(self, path: str):
+        """Open the database in path, creating it if needed."""
+        self.path = path
+        # other processes may be writing the same database
+        self.connection = sqlite3.connect(path, timeout=60)
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS decisions ('
+                'synonyms TEXT NOT NULL, '
+                'name TEXT NOT NULL, '
+                'is_bibliography INTEGER NOT NULL, '
+                'PRIMARY KEY (synonyms, name))'
+            )
+
+    def get(self, key: str, names: Iterable[str]) -> Dict[str, bool]:
+        """Return the saved decisions for the names."""
+        names = list(names)
+        decisions = {}
+        # stay below SQLITE_MAX_VARIABLE_NUMBER
+        for begin in range(0, len(names), 500):
+            chunk = names[begin:begin + 500]
+            rows = self.connection.execute(
+                'SELECT name, is_bibliography FROM decisions '
+                'WHERE synonyms = ? AND name IN ({})'.format(
+                    ', '.join('?' * len(chunk))),
+                [key] + chunk,
+            )
+            decisions.update((name, bool(value)) for name, value in rows)
+        return decisions
+
+    def put(self, key: str, decisions: Mapping[str, bool]) -> None:
+        """Save the decisions."""
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO decisions VALUES (?, ?, ?)',
+                ((key, name, int(value)) for name, value in decisions.items()),
+            )
+
+    def close(self) -> None:
+        """Close the database."""
+        self.connection.close()
+
+
+class Classifier:
+    """Tell whether section names are bibliography in a language.
+
+    The memory caches hold at most `cache_size` names each, a size of 0
+    makes them unbounded. The decisions that are not in the memory caches
+    are looked up in `persistent_cache`, if given, before being computed;
+    the computed ones are saved there in batches, call `flush` at the end.
+    """
+    def __init__(self,
+                 language: str,
+                 score_cutoff: int=SCORE_CUTOFF,
+                 cache_size: int=DEFAULT_CACHE_SIZE,
+                 persistent_cache: Optional[PersistentCache]=None):
+        """Instantiate a classifier."""
+        synonyms = sorted(languages.bibliography[language])
+        self.language = language
+        self.score_cutoff = score_cutoff
+        self.synonyms = [normalize(synonym) for synonym in synonyms]
+        self.key = synonyms_key(synonyms, score_cutoff)
+        self.cache_size = cache_size
+        self.persistent_cache = persistent_cache
+        self.by_name = {}
+        self.by_normalized_name = {}
+        self.pending = {}
+
+    def __call__(self, name: str) -> bool:
+        """Return whether the section name is bibliography."""
+        try:
+            return self.by_name[name]
+        except KeyError:
+            return self.classify((name,))[0]
+
+    def classify(self, names: Iterable[str]) -> List[bool]:
+        """Return whether each of the section names is bibliography."""
+        names = list(names)
+        decisions = {}
+        missing = []
+        for name in names:
+            if name in decisions:
+                continue
+            try:
+                decisions[name] = self.by_name[name]
+            except KeyError:
+                decisions[name] = None
+                missing.append(name)
+
+        if missing:
+            normalized_names = {name: normalize(name) for name in missing}
+            normalized_decisions = self.decide(
+                set(normalized_names.values()))
+            for name, normalized_name in normalized_names.items():
+                decision = normalized_decisions[normalized_name]
+                decisions[name] = decision
+                self._store(self.by_name, name, decision)
+
+        return [decisions[name] for name in names]
+
+    def decide(self, normalized_names: Iterable[str]) -> Dict[str, bool]:
+        """Return whether each of the normalized names is bibliography."""
+        decisions = {}
+        unknown = []
+        for normalized_name in normalized_names:
+            try:
+                decisions[normalized_name] = \
+                    self.by_normalized_name[normalized_name]
+            except KeyError:
+                unknown.append(normalized_name)
+
+        if unknown and self.persistent_cache is not None:
+            saved = self.persistent_cache.get(self.key, unknown)
+            decisions.update(saved)
+            unknown = [name for name in unknown if name not in saved]
+        if unknown:
+            scored = self.score(unknown)
+            decisions.update(scored)
+            if self.persistent_cache is not None:
+                self.pending.update(scored)
+                if len(self.pending) >= FLUSH_SIZE:
+                    self.flush()
+
+        for normalized_name, decision in decisions.items():
+            self._store(self.by_normalized_name, normalized_name, decision)
+        return decisions
+
+    def score(self, normalized_names: List[str]) -> Dict[str, bool]:
+        """Score the normalized names against all the synonyms."""
+        if not normalized_names:
+            return {}
+        # fuzzywuzzy rounds the score (half to even) before comparing it
+        scores = rapidfuzz.process.cdist(
+            normalized_names,
+            self.synonyms,
+            scorer=rapidfuzz.fuzz.WRatio,
+            processor=None,
+            score_cutoff=self.score_cutoff - 0.5,
+        )
+        matches = (numpy.round(scores) >= self.score_cutoff).any(axis=1)
+        return {name: bool(match)
+                for name, match in zip(normalized_names, matches)}
+
+    def flush(self) -> None:
+        """Save the computed decisions in the persistent cache."""
+        if self.persistent_cache is not None and self.pending:
+            self.persistent_cache.put(self.key, self.pending)
+        self.pending = {}
+
+    def _store(self, cache: MutableMapping, key: str, decision: bool) -> None:
+        cache[key] = decision
+        if self.cache_size and len(cache) > self.cache_size:
+            # drop the oldest name
+            del cache[next(iter(cache))]
+
+
+_classifiers = {}
+
+
+def get_classifier(language: str,
+                   score_cutoff: int=SCORE_CUTOFF,
+                   persistent_cache_path: Optional[str]=None) -> Classifier:
+    """Return the classifier of the language.
+
+    The classifiers, and their memory caches, are shared by all the pages
+    and all the dumps processed.
+    """
+    key = (language, score_cutoff, persistent_cache_path)
+    try:
+        return _classifiers[key]
+    except KeyError:
+        pass
+
+    persistent_cache = None
+    if persistent_cache_path is not None:
+        persistent_cache = PersistentCache(persistent_cache_path)
+    classifier = _classifiers[key] = Classifier(
+        language,
+        score_cutoff=score_cutoff,
+        persistent_cache=persistent_cache,
+    )
+    return classifier
+
+
+def forget() -> None:
+    """Forget the classifiers, without saving their decisions.
+
+    This is for the forked processes: the connections to the databases of
+    the parent process cannot be used.
+    """
+    _classifiers.clear()
+
+
+def flush() -> None:
+    """Save the computed decisions of all the classifiers."""
+    for classifier in _classifiers.values():
+        classifier.flush()
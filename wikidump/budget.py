@@ -0,0 +1,185 @@
+"""Time and size budget of the extraction of a revision.
+
+A single huge revision (e.g. a vandalism pasting megabytes of markup) can
+make the regular expressions of the extractors backtrack for minutes. The
+extraction of each revision is given a deadline: the extractors pass the
+time left (see `remaining`) to the `timeout` argument of the `regex` module,
+that raises a `TimeoutError` when the deadline is reached, or call `check`
+between short matches. The deadline is kept per thread, so this works in
+threads and in worker processes alike (unlike SIGALRM, that only works in
+the main thread).
+
+Revisions longer than a maximum size are skipped or truncated before the
+extraction, revisions that take too long are skipped. Both cases are counted
+in the stats and logged in a tab-separated side file.
+"""
+import contextlib
+import threading
+import time
+
+import mwxml
+from typing import (Callable, Iterable, Iterator, List, Mapping, Optional,
+                    Tuple, TypeVar)
+
+T = TypeVar('T')
+
+# seconds, 0 disables the time budget
+DEFAULT_TIMEOUT = 5
+# chars, 0 disables the size budget
+DEFAULT_MAX_SIZE = 0
+
+SKIP = 'skip'
+TRUNCATE = 'truncate'
+ACTIONS = (SKIP, TRUNCATE)
+
+_local = threading.local()
+
+
+def BudgetStatsDict():
+    """Return new BudgetStatsDict."""
+    return {
+        'over_time': 0,
+        'over_size': 0,
+        'skipped': 0,
+        'truncated': 0,
+    }
+
+
+def remaining() -> Optional[float]:
+    """Return the seconds left to the extraction of the current revision.
+
+    Return None when the current thread is not extracting a revision with a
+    time budget, the `regex` module then does not time out.
+    """
+    deadline = getattr(_local, 'deadline', None)
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 0)
+
+
+def check() -> None:
+    """Raise TimeoutError if the current revision is over its time budget.
+
+    This is for the loops of short anchored matches: passing `timeout` to
+    each call of the `regex` module costs more than the match itself.
+    """
+    deadline = getattr(_local, 'deadline', None)
+    if deadline is not None and time.monotonic() > deadline:
+        raise TimeoutError('revision over its time budget')
+
+
+@contextlib.contextmanager
+def deadline(timeout: Optional[float]) -> Iterator[None]:
+    """Set the deadline of the current thread to timeout seconds from now.
+
+    A timeout of None or 0 removes the deadline.
+    """
+    previous = getattr(_local, 'deadline', None)
+    _local.deadline = time.monotonic() + timeout if timeout else None
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+class Budget:
+    """Time and size budget of the extraction of the revisions.
+
+    `timeout` is in seconds and `max_size` in chars, 0 disables them. The
+    revisions longer than `max_size` are skipped or truncated, according to
+    `action`. Over budget revisions are counted in stats and logged in
+    `log_path`, if given, or appended to `log_rows`, if it is a list (e.g.
+    in a worker process, the rows are written in order by the main one with
+    `write_log`).
+    """
+    def __init__(self,
+                 timeout: float=DEFAULT_TIMEOUT,
+                 max_size: int=DEFAULT_MAX_SIZE,
+                 action: str=SKIP,
+                 log_path: Optional[str]=None,
+                 stats: Optional[Mapping]=None,
+                 log_rows: Optional[List[Tuple]]=None):
+        """Instantiate a budget."""
+        if action not in ACTIONS:
+            raise ValueError('Unknown action "{}".'.format(action))
+        self.timeout = timeout
+        self.max_size = max_size
+        self.action = action
+        self.log_path = log_path
+        self.stats = stats if stats is not None else BudgetStatsDict()
+        self.log_rows = log_rows
+
+    def run(self, mw_revision: mwxml.Revision, extract: Callable[[str], T]) \
+            -> Optional[T]:
+        """Return extract(text) for the text of the revision, within budget.
+
+        Return None if the revision is skipped.
+        """
+        text = mw_revision.text or ''
+
+        if self.max_size and len(text) > self.max_size:
+            self.stats['over_size'] += 1
+            if self.action == SKIP:
+                self.stats['skipped'] += 1
+                self.log(mw_revision, 'size', len(text), 'skipped')
+                return None
+            self.stats['truncated'] += 1
+            self.log(mw_revision, 'size', len(text), 'truncated')
+            text = text[:self.max_size]
+
+        try:
+            with deadline(self.timeout):
+                return extract(text)
+        except TimeoutError:
+            self.stats['over_time'] += 1
+            self.stats['skipped'] += 1
+            self.log(mw_revision, 'time', len(text), 'skipped')
+            return None
+
+    def log(self,
+            mw_revision: mwxml.Revision,
+            reason: str,
+            size: int,
+            action: str) -> None:
+        """Log an over budget revision in the side file."""
+        if self.log_path is None and self.log_rows is None:
+            return
+
+        page = getattr(mw_revision, 'page', None)
+        row = (
+            page.id if page is not None else '',
+            page.title if page is not None else '',
+            mw_revision.id,
+            reason,
+            size,
+            action,
+        )
+        if self.log_rows is not None:
+            self.log_rows.append(row)
+        else:
+            write_log(self.log_path, [row])
+
+
+def write_log(log_path: Optional[str], rows: Iterable[Tuple]) -> None:
+    """Append the rows of over budget revisions to the side file."""
+    rows = list(rows)
+    if log_path is None or not rows:
+        return
+    # over budget revisions are rare, the file is opened only for them
+    with open(log_path, 'at', encoding='utf-8') as log_file:
+        for row in rows:
+            log_file.write('\t'.join(str(value) for value in row) + '\n')
+
+
+def from_args(args,
+              stats: Optional[Mapping]=None,
+              log_rows: Optional[List[Tuple]]=None) -> Budget:
+    """Return the budget given by the command line args."""
+    return Budget(
+        timeout=args.revision_timeout,
+        max_size=args.max_revision_size,
+        action=args.over_budget,
+        log_path=getattr(args, 'budget_log', None),
+        stats=stats,
+        log_rows=log_rows,
+    )
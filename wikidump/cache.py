@@ -0,0 +1,80 @@
+"""Cache of the extraction results of the revisions of a page.
+
+Reverts and edit wars restore the text of an earlier revision of the page,
+so the extraction results of the revisions are cached, keyed by the sha1 of
+their text: the <sha1> in the dump, or the same hash computed from the text
+when it is missing.
+"""
+import collections
+import hashlib
+
+import mwxml
+from typing import Callable, Mapping, Optional, TypeVar
+
+T = TypeVar('T')
+
+DEFAULT_SIZE = 128
+
+# MediaWiki stores the sha1 of the texts in base 36, padded to 31 chars
+SHA1_BASE = 36
+SHA1_LENGTH = 31
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def CacheStatsDict():
+    """Return new CacheStatsDict."""
+    return {
+        'hits': 0,
+        'misses': 0,
+    }
+
+
+def sha1(text: str) -> str:
+    """Return the sha1 of the text, in the format of the dumps."""
+    number = int(hashlib.sha1(text.encode('utf-8')).hexdigest(), 16)
+    digits = []
+    while number:
+        number, digit = divmod(number, SHA1_BASE)
+        digits.append(DIGITS[digit])
+    return ''.join(reversed(digits)).rjust(SHA1_LENGTH, '0')
+
+
+def revision_sha1(mw_revision: mwxml.Revision) -> str:
+    """Return the sha1 of the text of the revision."""
+    if mw_revision.sha1:
+        return mw_revision.sha1
+    return sha1(mw_revision.text or '')
+
+
+class RevisionCache:
+    """LRU cache of the extraction results of the revisions of a page.
+
+    The cache holds at most `size` results, a size of 0 disables it.
+    """
+    def __init__(self, size: int=DEFAULT_SIZE, stats: Optional[Mapping]=None):
+        """Instantiate a cache, hits and misses are counted in stats."""
+        self.size = size
+        self.stats = stats if stats is not None else CacheStatsDict()
+        self.results = collections.OrderedDict()
+
+    def get(self, mw_revision: mwxml.Revision, extract: Callable[[], T]) -> T:
+        """Return the result of extract, reusing the one of a revision with
+        the same text if it is cached."""
+        if self.size <= 0:
+            return extract()
+
+        key = revision_sha1(mw_revision)
+        try:
+            result = self.results[key]
+        except KeyError:
+            self.stats['misses'] += 1
+        else:
+            self.stats['hits'] += 1
+            self.results.move_to_end(key)
+            return result
+
+        result = extract()
+        self.results[key] = result
+        if len(self.results) > self.size:
+            self.results.popitem(last=False)
+        return result
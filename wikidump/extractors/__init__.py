@@ -1,2 +1,4 @@
-from . import arxiv, doi, isbn, pubmed, misc, redirect
+from . import (arxiv, doi, identifiers, incremental, isbn, pubmed, misc,
+               redirect, scanner)
 from .misc import *
+from .scanner import scan
@@ -7,6 +7,7 @@ import regex as re
 from typing import Iterator
 
 from .common import CaptureResult, Identifier, Span
+from .. import budget
 
 __all__ = ('extract',)
 
@@ -30,7 +31,7 @@ ARXIV_REs = [re.compile(el, re.I | re.U) for el in ARXIV_REs]
 def extract(text: str) -> Iterator[CaptureResult[Identifier]]:
     """Extract arxiv identifiers."""
     for pattern in ARXIV_REs:
-        for match in pattern.finditer(text):
+        for match in pattern.finditer(text, timeout=budget.remaining()):
             if match.group('new_id'):
                 id_ = match.group('new_id')
                 span = match.span('new_id')
@@ -1,21 +1,33 @@
 """Classes for the extractors."""
-from typing import Generic, NamedTuple, T
+import bisect
+import heapq
+import itertools
+import operator
+
+from typing import (Generic, Iterable, List, NamedTuple, Sequence, Set,
+                    T)
 
 Identifier = NamedTuple("Identifier", [
     ('type', str),
     ('id', str),
 ])
 
+Heading = NamedTuple("Heading", [
+    ('name', str),
+    ('level', int),
+])
+
 
 class CaptureResult(NamedTuple('CaptureResult', [
     ('data', T),
     ('span', 'Span'),
 ]), Generic[T]):
-    pass
+    __slots__ = ()
 
 
 class Span(NamedTuple('Span', [('begin', int), ('end', int)])):
     """Represent the begin and the end of a capture."""
+    __slots__ = ()
 
     def __le__(self, other: 'Span') -> bool:
         # return self.begin >= other.begin and self.end <= other.end
@@ -24,3 +36,69 @@ class Span(NamedTuple('Span', [('begin', int), ('end', int)])):
 
     def __lt__(self, other: 'Span') -> bool:
         return self[0] > other[0] and self[1] < other[1]
+
+
+class SpanIndex:
+    """Sorted index of spans, answers which spans enclose a given one.
+
+    The spans are sorted by begin (and end), together with the running
+    maximum of their ends: the spans beginning at or before `span.begin`
+    enclose `span` only if that maximum reaches `span.end`, so the test is
+    a binary search.
+    """
+    def __init__(self, spans: Iterable[Span]):
+        """Build the index of the spans (the containers)."""
+        self.spans = sorted(spans, key=operator.itemgetter(0, 1))
+        self.begins = [begin for begin, _ in self.spans]
+        self.max_ends = list(itertools.accumulate(
+            (end for _, end in self.spans), max))
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def encloses(self, span: Span) -> bool:
+        """Return True if any span of the index encloses span (span <= it)."""
+        index = bisect.bisect_right(self.begins, span[0])
+        return index > 0 and self.max_ends[index - 1] >= span[1]
+
+    def enclosing(self, span: Span) -> List[Span]:
+        """Return the spans of the index that enclose span."""
+        enclosing = []
+        index = bisect.bisect_right(self.begins, span[0]) - 1
+        # max_ends is not decreasing, no span before index can enclose span
+        # once the running maximum is lower than span.end
+        while index >= 0 and self.max_ends[index] >= span[1]:
+            if self.spans[index][1] >= span[1]:
+                enclosing.append(self.spans[index])
+            index -= 1
+        enclosing.reverse()
+        return enclosing
+
+
+def enclosed_by(
+        spans: Sequence[Span],
+        **indexes: SpanIndex) -> List[Set[str]]:
+    """Return for each span the names of the indexes that enclose it.
+
+    All the spans are classified with a single sweep, merging them with the
+    spans of all the indexes in order of begin.
+    """
+    containers = heapq.merge(*(
+        zip(index.begins, (end for _, end in index.spans),
+            itertools.repeat(name))
+        for name, index in indexes.items()
+    ))
+    container = next(containers, None)
+    max_ends = dict.fromkeys(indexes, -1)
+
+    result = [set() for _ in spans]
+    for i in sorted(range(len(spans)), key=lambda i: spans[i][0]):
+        begin, end = spans[i]
+        while container is not None and container[0] <= begin:
+            _, container_end, name = container
+            if container_end > max_ends[name]:
+                max_ends[name] = container_end
+            container = next(containers, None)
+        result[i].update(name for name, max_end in max_ends.items()
+                         if max_end >= end)
+    return result
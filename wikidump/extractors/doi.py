@@ -11,6 +11,7 @@ from more_itertools import peekable
 from typing import Iterator
 
 from .common import CaptureResult, Identifier, Span
+from .. import budget
 
 __all__ = ('extract',)
 
@@ -59,9 +60,9 @@ LEXICON = [
     (r'\w+',               'word'),
     (r'.',                 'etc')
 ]
-_lexicon_pattern = '|'.join("(?P<{0}>{1})".format(name, pattern)
-                           for pattern, name in LEXICON)
-_lexicon_re = re.compile(_lexicon_pattern, re.I|re.U)
+# what ends a doi (see read_doi) and the brackets and braces in it
+_doi_end_re = re.compile(
+    r'[\s\?#\|\[\]\{\}]|<!--|-->|' + TAGS_RE.pattern, re.I|re.U)
 
 
 def extract_island(text):
@@ -137,23 +138,41 @@ def read_doi(tokens):
     return Identifier('doi', _punctuation_at_end_re.sub('', id_))
 
 
-def tokenize_search(text, start):
-    match = _lexicon_re.search(text, start)
-    while match is not None:
-        yield match.lastgroup, match.group(0)
-        match = _lexicon_re.search(text, match.end())
+def read_doi_at(text: str, begin_pos: int) -> Identifier:
+    """Read the doi starting at begin_pos (where DOI_START_RE matches).
+
+    Equivalent to `read_doi` over the tokens of the text from begin_pos, but
+    the doi is read in a single scan of the text: it ends at the first
+    whitespace, "?", "#", "|", html tag or comment delimiter, or at the
+    first "]" or "}" that closes a bracket or a brace not opened in the doi.
+    """
+    end_pos = len(text)
+    brackets = 0
+    curlies = 0
+    for match in _doi_end_re.finditer(text, begin_pos):
+        char = match.group()
+        if char == '[':
+            brackets += 1
+        elif char == '{':
+            curlies += 1
+        elif char == ']' and brackets > 0:
+            brackets -= 1
+        elif char == '}' and curlies > 0:
+            curlies -= 1
+        else:
+            end_pos = match.start()
+            break
+
+    return Identifier('doi', text[begin_pos:end_pos].rstrip('.,!'))
 
 
 def extract_search(text: str) -> Iterator[CaptureResult[Identifier]]:
     last_end = 0
-    for match in DOI_START_RE.finditer(text):
+    for match in DOI_START_RE.finditer(text, timeout=budget.remaining()):
         begin_pos = match.start()
 
         if begin_pos > last_end:
-            tokens = tokenize_search(text, begin_pos)
-            tokens = peekable(tokens)
-
-            identifier = read_doi(tokens)
+            identifier = read_doi_at(text, begin_pos)
             end_pos = begin_pos + len(identifier.id)
 
             yield CaptureResult(identifier, Span(begin_pos, end_pos))
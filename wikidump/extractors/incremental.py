@@ -0,0 +1,137 @@
+"""Incremental extraction between consecutive revisions of a page.
+
+Consecutive revisions usually differ in a few sections. The text of each
+revision is split in chunks at the beginning of the lines starting with "="
+(the section headings), the result of the extraction of each chunk is
+cached and reused in the next revision if the chunk has not changed, only
+its spans are shifted.
+
+A chunk can be extracted by itself only if no capture can extend over its
+end: the extraction functions return the captures together with a flag that
+tells if this is the case (the chunk is "closed"). When a chunk is not
+closed it is extracted together with the rest of the text, so the result is
+always the same of the extraction of the whole text.
+"""
+import itertools
+import re
+
+from typing import (Callable, Generic, Iterable, Iterator, List, Mapping,
+                    Optional, Tuple, TypeVar)
+
+from .common import CaptureResult, Span
+
+__all__ = ('IncrementalExtractor', 'IncrementalStatsDict', 'chunks',
+           'speedup')
+
+T = TypeVar('T')
+
+# The standard library `re` finds the boundaries faster than `str.find`.
+boundary_re = re.compile(r'\n=')
+
+
+def IncrementalStatsDict():
+    """Return new IncrementalStatsDict."""
+    return {
+        'chunks_reused': 0,
+        'chunks_extracted': 0,
+        'chars_reused': 0,
+        'chars_extracted': 0,
+    }
+
+
+def speedup(stats: Mapping) -> float:
+    """Return the ratio of the analyzed chars to the chars extracted.
+
+    This estimates the speedup over the extraction of the whole texts, it
+    does not take into account the time spent splitting the texts and
+    shifting the spans.
+    """
+    chars = stats['chars_reused'] + stats['chars_extracted']
+    if not stats['chars_extracted']:
+        return 1.0
+    return chars / stats['chars_extracted']
+
+
+def chunks(text: str) -> Iterator[Tuple[int, int]]:
+    """Split the text before each line starting with "="."""
+    begin = 0
+    for match in boundary_re.finditer(text):
+        end = match.start() + 1
+        yield begin, end
+        begin = end
+    yield begin, len(text)
+
+
+def shift_captures(captures: List[CaptureResult], offset: int) \
+        -> List[CaptureResult]:
+    """Return the captures with their spans moved by offset."""
+    if not offset:
+        return captures
+    # return [CaptureResult(data, Span(begin + offset, end + offset)) ...]
+    # HACK: the following is more efficient (it skips the __new__ of the
+    # named tuples). Sorry :(
+    new = tuple.__new__
+    return [
+        new(CaptureResult, (data, new(Span, (begin + offset, end + offset))))
+        for data, (begin, end) in captures
+    ]
+
+
+def join_captures(results: Iterable[List[CaptureResult]]) \
+        -> List[CaptureResult]:
+    """Join the captures of consecutive chunks of a text."""
+    return list(itertools.chain.from_iterable(results))
+
+
+class IncrementalExtractor(Generic[T]):
+    """Extractor that reuses the chunks of the previous text.
+
+    `extract` returns the result of the extraction of a chunk and whether the
+    chunk is closed, `shift` moves the spans of a result and `join` joins the
+    results of consecutive chunks. By default the results are lists of
+    captures.
+    """
+    def __init__(self,
+                 extract: Callable[[str], Tuple[T, bool]],
+                 shift: Callable[[T, int], T]=shift_captures,
+                 join: Callable[[Iterable[T]], T]=join_captures,
+                 stats: Optional[Mapping]=None):
+        """Instantiate an extractor, counters are incremented in stats."""
+        self.extract = extract
+        self.shift = shift
+        self.join = join
+        self.stats = stats if stats is not None else IncrementalStatsDict()
+        self.cache = {}
+
+    def __call__(self, text: str) -> T:
+        """Return the result of the extraction of text."""
+        cache = {}
+        results = []
+
+        for begin, end in chunks(text):
+            chunk = text[begin:end]
+
+            cached = self.cache.get(chunk) or cache.get(chunk)
+            reused = cached is not None
+            if not reused:
+                cached = self.extract(chunk)
+                self.stats['chunks_extracted'] += 1
+                self.stats['chars_extracted'] += len(chunk)
+            cache[chunk] = cached
+
+            result, closed = cached
+            if not closed and end < len(text):
+                # some capture could extend in the next chunks
+                result, _ = self.extract(text[begin:])
+                self.stats['chunks_extracted'] += 1
+                self.stats['chars_extracted'] += len(text) - begin
+                results.append(self.shift(result, begin))
+                break
+
+            if reused:
+                self.stats['chunks_reused'] += 1
+                self.stats['chars_reused'] += len(chunk)
+            results.append(self.shift(result, begin))
+
+        self.cache = cache
+        return self.join(results)
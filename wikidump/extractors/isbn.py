@@ -7,15 +7,16 @@ import regex as re
 from typing import Iterator
 
 from .common import CaptureResult, Identifier, Span
+from .. import budget
 
 __all__ = ('extract',)
 
-ISBN_RE = re.compile(r'isbn\s?=?\s?([0-9\-Xx]+)', re.I)
+ISBN_RE = re.compile(r'isbn\s?=?\s?(?P<id>[0-9\-Xx]+)', re.I)
 
 
 def extract(text: str) -> Iterator[CaptureResult[Identifier]]:
     """Extract isbn identifiers."""
-    for match in ISBN_RE.finditer(text):
+    for match in ISBN_RE.finditer(text, timeout=budget.remaining()):
         id_ = match.group(1)
         span = match.span(1)
         yield CaptureResult(
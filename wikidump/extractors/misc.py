@@ -1,16 +1,16 @@
 """Various extractors."""
+import bisect
 import functools
 
 import regex
-import signal
 import itertools
 from more_itertools import peekable
 from typing import (Callable, Iterable, Iterator, List, TypeVar, NamedTuple,
-                    Optional)
+                    Optional, Tuple)
 
-from . import arxiv, doi, isbn, pubmed
-from .common import CaptureResult, Span
-from .. import timeout
+from . import arxiv, doi, identifiers, isbn, pubmed, scanner
+from .common import CaptureResult, Heading, Span
+from .. import budget
 
 # empty generator
 # Python Empty Generator Function
@@ -20,36 +20,63 @@ def empty_generator():
 
 
 class Section:
-    """Section class."""
-    def __init__(self, name: str, level: int, body: str):
-        """Instantiate a section."""
+    """Section class.
+
+    The section does not copy its body: it keeps a reference to the source
+    of the page and the offsets of the body, body and full_body are sliced
+    out of the source only when accessed.
+    """
+    __slots__ = ('name', 'level', 'source', 'heading_begin', 'body_begin',
+                 'body_end')
+
+    def __init__(self,
+                 name: str,
+                 level: int,
+                 body: Optional[str]=None,
+                 source: str='',
+                 heading_begin: int=0,
+                 body_begin: int=0,
+                 body_end: int=0):
+        """Instantiate a section, given its body or its offsets in source."""
         self.name = name
         self.level = level
-        self.body = body
-        self._full_body = None
+        if body is not None:
+            source, heading_begin, body_begin, body_end = \
+                body, 0, 0, len(body)
+        self.source = source
+        self.heading_begin = heading_begin
+        self.body_begin = body_begin
+        self.body_end = body_end
 
     @property
     def is_preamble(self):
         """Return True when this section is the preamble of the page."""
         return self.level == 0
 
+    @property
+    def body(self) -> str:
+        """Get the body of the section."""
+        return self.source[self.body_begin:self.body_end]
+
     @property
     def full_body(self) -> str:
         """Get the full body of the section."""
-        if self._full_body is not None:
-            return self._full_body
-
         if self.is_preamble:
-            full_body = self.body
-        else:
-            equals = ''.join('=' for _ in range(self.level))
-            full_body = '{equals}{name}{equals}\n{body}'.format(
-                equals=equals,
-                name=self.name,
-                body=self.body,
-            )
-        self._full_body = full_body
-        return full_body
+            return self.body
+
+        equals = '=' * self.level
+        heading_length = 2 * len(equals) + len(self.name) + 1
+        if (self.body_begin - self.heading_begin == heading_length
+                and self.body_begin <= self.body_end
+                and self.source[self.body_begin - 1] == '\n'):
+            # the heading in the source is exactly the formatted one
+            return self.source[self.heading_begin:self.body_end]
+
+        return '{equals}{name}{equals}\n{body}'.format(
+            equals=equals,
+            name=self.name,
+            body=self.body,
+        )
 
     def __repr__(self):
         'Return a nicely formatted representation string'
@@ -59,10 +86,13 @@ class Section:
             class_name=self.__class__.__name__,
             name=self.name,
             level=self.level,
-            body=self.body[:20],
+            body=self.source[self.body_begin:
+                             min(self.body_begin + 20, self.body_end)],
         )
 
 
+# The syntax of the headings, `scanner.match_heading` matches it in linear
+# time.
 section_header_re = regex.compile(
     r'''^
         (?P<equals>=+)              # Match the equals, greedy
@@ -73,6 +103,8 @@ section_header_re = regex.compile(
         $
     ''', regex.VERBOSE | regex.MULTILINE)
 
+heading_start_re = regex.compile(r'^=', regex.MULTILINE)
+
 templates_re = regex.compile(
     r'''
         \{\{
@@ -80,6 +112,15 @@ templates_re = regex.compile(
         \}\}
     ''', regex.VERBOSE)
 
+references_re = regex.compile(
+    r'''
+        <ref
+        .*?
+        <\/ref>
+    ''', regex.VERBOSE | regex.IGNORECASE | regex.DOTALL)
+
+last_reference_end_re = regex.compile(r'(?r)<\/ref>', regex.IGNORECASE)
+
 
 @functools.lru_cache(maxsize=1000)
 def _pattern_or(words: List) -> str:
@@ -88,43 +129,74 @@ def _pattern_or(words: List) -> str:
     return r'(?:{})'.format(words_joined)
 
 
-def references(source: str) -> Iterator[CaptureResult[str]]:
-    """Return all the references found in the document."""
-    pattern = regex.compile(
-        r'''
-            <ref
-            .*?
-            <\/ref>
-        ''', regex.VERBOSE | regex.IGNORECASE | regex.DOTALL)
+def references(source: str, markup: Optional[scanner.Markup]=None) \
+        -> Iterator[CaptureResult[str]]:
+    """Return all the references found in the document.
+
+    If markup (the output of `scanner.scan(source)`) is given the references
+    found by the scanner are returned, self-closing references included.
+    """
+    if markup is not None:
+        for begin, end in markup.references:
+            yield CaptureResult(source[begin:end], Span(begin, end))
+        return
 
-    for match in pattern.finditer(source):
+    # A "<ref" after the last "</ref>" can not be matched, but the pattern
+    # would look for its end until the end of source (quadratic).
+    last_end = last_reference_end_re.search(source)
+    if not last_end:
+        return
+
+    for match in references_re.finditer(source, 0, last_end.end(),
+                                        timeout=budget.remaining()):
         yield CaptureResult(match.group(0), Span(*match.span()))
 
 
-def sections(source: str, include_preamble: bool=False) \
+def section_headings(source: str) -> Iterator[CaptureResult[Heading]]:
+    """Return the section headings found in the document."""
+    end = 0
+    for match in heading_start_re.finditer(source):
+        if match.start() < end:
+            continue
+        heading = scanner.match_heading(source, match.start())
+        if heading:
+            end = heading.span.end
+            yield heading
+
+
+def sections(source: str,
+             include_preamble: bool=False,
+             markup: Optional[scanner.Markup]=None) \
         -> Iterator[CaptureResult[Section]]:
-    """Return the sections found in the document."""
-    section_header_matches = peekable(section_header_re.finditer(source))
+    """Return the sections found in the document.
+
+    If markup (the output of `scanner.scan(source)`) is given the headings
+    found by the scanner are used.
+    """
+    if markup is not None:
+        headings = iter(markup.headings)
+    else:
+        headings = section_headings(source)
+
+    section_header_matches = peekable(headings)
     if include_preamble:
         try:
-            body_end = section_header_matches.peek().start()
+            body_end = section_header_matches.peek().span.begin
             body_end -= 1  # Don't include the newline before the next section
         except StopIteration:
             body_end = len(source)
         preamble = Section(
             name='',
             level=0,
-            body=source[:body_end],
+            source=source,
+            body_end=body_end,
         )
         yield CaptureResult(preamble, Span(0, body_end))
 
-    for match in section_header_matches:
-        name = match.group('section_name')
-        level = len(match.group('equals'))
-
-        body_begin = match.end() + 1  # Don't include the newline after
+    for (name, level), (heading_begin, heading_end) in section_header_matches:
+        body_begin = heading_end + 1  # Don't include the newline after
         try:
-            body_end = section_header_matches.peek().start()
+            body_end = section_header_matches.peek().span.begin
             body_end -= 1  # Don't include the newline before the next section
         except StopIteration:
             body_end = len(source)
@@ -132,10 +204,13 @@ def sections(source: str, include_preamble: bool=False) \
         section = Section(
             name=name,
             level=level,
-            body=source[body_begin:body_end],
+            source=source,
+            heading_begin=heading_begin,
+            body_begin=body_begin,
+            body_end=body_end,
         )
 
-        yield CaptureResult(section, Span(match.start(), body_end))
+        yield CaptureResult(section, Span(heading_begin, body_end))
 
 
 # @functools.lru_cache(maxsize=10)
@@ -160,9 +235,25 @@ def sections(source: str, include_preamble: bool=False) \
 #         yield match.group(0)
 
 
-def templates(source: str) -> Iterator[CaptureResult[str]]:
-    """Return all the templates found in the document."""
-    for match in templates_re.finditer(source):
+def templates(source: str, markup: Optional[scanner.Markup]=None) \
+        -> Iterator[CaptureResult[str]]:
+    """Return all the templates found in the document.
+
+    If markup (the output of `scanner.scan(source)`) is given the templates
+    found by the scanner are returned, nested templates included.
+    """
+    if markup is not None:
+        for begin, end in markup.templates:
+            yield CaptureResult(source[begin:end], Span(begin, end))
+        return
+
+    # as for the references, stop at the last possible end
+    last_end = source.rfind('}}')
+    if last_end == -1:
+        return
+
+    for match in templates_re.finditer(source, 0, last_end + 2,
+                                       timeout=budget.remaining()):
         yield CaptureResult(match.group(0), Span(*match.span()))
 
 
@@ -171,14 +262,13 @@ Extractor = Callable[[str], T]
 
 
 def pub_identifiers(source: str, extractors: Iterable[Extractor]=None) -> T:
-    """Return all the identifiers found in the document."""
+    """Return all the identifiers found in the document.
+
+    By default all the identifiers are found in a single pass, in order of
+    appearance (see `identifiers.extract`).
+    """
     if extractors is None:
-        extractors = (
-            arxiv.extract,
-            doi.extract,
-            isbn.extract,
-            pubmed.extract,
-        )
+        extractors = (identifiers.extract,)
     for identifier_extractor in extractors:
         for capture in identifier_extractor(source):
             yield capture
@@ -186,6 +276,9 @@ def pub_identifiers(source: str, extractors: Iterable[Extractor]=None) -> T:
 
 class Wikilink:
     """Link class."""
+    __slots__ = ('link', 'tosection', 'anchor', 'section_name',
+                 'section_level', 'section_number')
+
     def __init__(self,
                  link: str,
                  tosection: str,
@@ -236,9 +329,6 @@ class Wikilink:
 #    &oldid=1274292
 # [3] https://it.wikipedia.org/w/index.php?\
 #   title=Utente:CristianCantoro/Sandbox&oldid=79784393#Test_regexp
-REGEX_TIMEOUT = 5
-
-
 wikilink_re = regex.compile(
     r'''(?P<total>                          # named group <total>:
           (?P<wikilink>                     # <wikilink>:
@@ -314,44 +404,21 @@ def reverse_position(revpos: int, strlen: int) -> int:
     return -(revpos+1) % strlen
 
 
-def wikilinks(page_title: str,
-              source: str,
-              sections: Iterator[CaptureResult[Section]],
-              debug: Optional[bool]=False) \
+def raw_wikilinks(page_title: str, source: str) \
         -> Iterator[CaptureResult[Wikilink]]:
-    """Return the wikilinks found in the document."""
+    """Return the wikilinks found in the document, without their section.
 
-    wikilink_matches = empty_generator()
+    Broken links (with an empty link) are returned as well, see `wikilinks`.
+    The matching is stopped by the time budget of the revision (see
+    `budget`).
+    """
+    if '[[' not in source:
+        return
 
-    if debug:
-        try:
-            wikilink_matches = timeout.wrap_timeout(
-                lambda t: peekable(wikilink_re.finditer(t,concurrent=True)),
-                REGEX_TIMEOUT,
-                [source]
-                )
-        except CallTimeout as exception:
-            import ipdb; ipdb.set_trace()
-
-    else:
-        wikilink_matches = peekable(
-            wikilink_re.finditer(source,concurrent=True)
-            )
-
-    sections_limits = [SectionLimits(name=section.name,
-                                     level=section.level,
-                                     number=idx,
-                                     begin=span.begin,
-                                     end=span.end)
-                       for idx, (section, span) in enumerate(sections, 1)]
+    wikilink_matches = wikilink_re.finditer(source, concurrent=True,
+                                            timeout=budget.remaining())
 
-    last_section_seen = 0
-    prevmatch_start = 0
-    prevmatch_end = 0
     for match in wikilink_matches:
-        prevmatch_start = match.start()
-        prevmatch_end = match.end()
-
         link = match.group('link') or ''
         link = link.strip()
 
@@ -366,25 +433,82 @@ def wikilinks(page_title: str,
 
         anchor = match.group('anchor') or link
 
-        # newlines in anchor are visualized as spaces.
-        anchor = anchor.replace('\n', ' ')
-        anchor = ' '.join(anchor.strip().split())
+        # newlines in anchor are visualized as spaces (split() splits on
+        # them too).
+        anchor = ' '.join(anchor.split())
 
         total_start = match.start('total')
         total_end = match.end('total')
 
+        wikilink = Wikilink(
+            link=link,
+            anchor=anchor,
+            tosection=tosection,
+            section_name='---~--- incipit ---~---',
+            section_level=0,
+            section_number=0
+        )
+
+        yield CaptureResult(wikilink, Span(total_start, total_end))
+
+    return
+
+
+def raw_wikilinks_chunk(page_title: str, source: str) \
+        -> Tuple[List[CaptureResult[Wikilink]], bool]:
+    """Return the raw wikilinks in source and whether source is closed.
+
+    source is closed if no wikilink can extend over its end, see
+    `incremental`.
+    """
+    captures = list(raw_wikilinks(page_title, source))
+    last_end = captures[-1].span.end if captures else 0
+    if last_end == len(source) and captures:
+        return captures, False
+
+    match = wikilink_re.search(source, last_end, partial=True,
+                               timeout=budget.remaining())
+    closed = match is None or match.start() == len(source)
+    return captures, closed
+
+
+def wikilinks(page_title: str,
+              source: str,
+              sections: Iterator[CaptureResult[Section]],
+              captures: Optional[Iterable[CaptureResult[Wikilink]]]=None) \
+        -> Iterator[CaptureResult[Wikilink]]:
+    """Return the wikilinks found in the document.
+
+    The links can be given (see `raw_wikilinks`), in this case only the
+    section where they are is found. The sections must not overlap, as the
+    ones returned by `sections`.
+    """
+    if captures is None:
+        captures = raw_wikilinks(page_title, source)
+
+    sections_limits = [SectionLimits(name=section.name,
+                                     level=section.level,
+                                     number=idx,
+                                     begin=span.begin,
+                                     end=span.end)
+                       for idx, (section, span) in enumerate(sections, 1)]
+    sections_begins = [section.begin for section in sections_limits]
+
+    for raw_wikilink, span in captures:
+        total_start = span.begin
+
         link_section_number = 0
         link_section_name = '---~--- incipit ---~---'
         link_section_level = 0
 
-        for section in sections_limits[last_section_seen:]:
-            if section.begin <= total_start <= section.end:
-                link_section_number = section.number
-                link_section_name = section.name
-                link_section_level = section.level
-                last_section_seen = (link_section_number - 1)\
-                    if link_section_number > 0 else 0
-                break
+        # the last section beginning before the link is the only one that
+        # can contain it
+        index = bisect.bisect_right(sections_begins, total_start) - 1
+        if index >= 0 and total_start <= sections_limits[index].end:
+            section = sections_limits[index]
+            link_section_number = section.number
+            link_section_name = section.name
+            link_section_level = section.level
 
         # There are cases in which in the wikitext you will find cases
         # such as:
@@ -399,29 +523,16 @@ def wikilinks(page_title: str,
         #
         # We consider these cases to be broken no matter what and we
         # ignore them
-        if not link:
+        if not raw_wikilink.link:
             continue
 
         wikilink = Wikilink(
-            link=link,
-            anchor=anchor,
-            tosection=tosection,
+            link=raw_wikilink.link,
+            anchor=raw_wikilink.anchor,
+            tosection=raw_wikilink.tosection,
             section_name=link_section_name,
             section_level=link_section_level,
             section_number=link_section_number
         )
 
-        anchor_prefix = (source[match.start('total'):
-                                match.start('wikilink')]
-                         .strip('[')
-                         )
-        anchor_suffix = (source[match.end('wikilink'):
-                                match.end('total')]
-                         .strip(']')
-                         )
-        anchor = anchor_prefix + anchor + anchor_suffix
-
-        # print(source[total_start:total_end])
-        yield CaptureResult(wikilink, Span(total_start, total_end))
-
-    return
+        yield CaptureResult(wikilink, span)
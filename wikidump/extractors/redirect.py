@@ -4,12 +4,15 @@ import regex
 import argparse
 
 from more_itertools import peekable
-from typing import Iterable, Iterator
+from typing import Iterable, Iterator, Optional, Tuple
 
 if __name__ == '__main__':
     from common import CaptureResult, Span
+    # run as a script, the revisions have no time budget
+    budget = None
 else:
     from .common import CaptureResult, Span
+    from .. import budget
 
 # Synonims for #REDIRECT for the various languages
 # (h/t to Reedy from #mediawiki on freebode)
@@ -37,6 +40,8 @@ redirect_magicwords = {
 
 class Redirect:
     """Redirect class."""
+    __slots__ = ('target', 'tosection')
+
     def __init__(self,
                  target: str,
                  tosection: str):
@@ -99,6 +104,71 @@ for lang, word_list in redirect_magicwords.items():
       redirect_pattern, (regex.VERBOSE|regex.IGNORECASE|regex.MULTILINE))
 
 
+# A redirect must be at the very beginning of the text, so it is enough to
+# look at the first characters of each revision.
+PREFIX_LENGTH = 512
+
+COMMENT_START = '<!--'
+COMMENT_END = '-->'
+
+
+def strip_comments(source: str, length: Optional[int]=None) \
+        -> Tuple[str, bool]:
+    """Remove the html comments from the first length chars of a string.
+
+    Return the first `length` characters of `source` with the comments
+    removed (the same result of `utils.remove_comments(source)[:length]`) and
+    True if the string has been truncated.
+    """
+    if length is None:
+        length = len(source)
+
+    chunks = []
+    size = 0
+    pos = 0
+    while size < length:
+        remaining = length - size
+        start = source.find(COMMENT_START, pos,
+                            pos + remaining + len(COMMENT_START) - 1)
+        end = -1
+        if start != -1:
+            end = source.find(COMMENT_END, start + len(COMMENT_START))
+
+        if end == -1:
+            # no (closed) comment before the end of the prefix
+            chunks.append(source[pos:pos + remaining])
+            pos += remaining
+            break
+
+        chunks.append(source[pos:start])
+        size += start - pos
+        pos = end + len(COMMENT_END)
+
+    return ''.join(chunks), pos < len(source)
+
+
+def redirects_in_prefix(
+        source: str,
+        language: str,
+        length: int=PREFIX_LENGTH) -> Iterator[CaptureResult[Redirect]]:
+    """Return the redirects found in the document, comments included.
+
+    Equivalent to `redirects(utils.remove_comments(source), language)`, but
+    only the beginning of the document is examined. The whole document is
+    parsed only when its prefix could be the beginning of a (very long)
+    redirect.
+    """
+    prefix, truncated = strip_comments(source, length)
+    captures = list(redirects(prefix, language))
+    if not captures and truncated:
+        head = prefix.lstrip()
+        if not head or head.startswith('#'):
+            text, _ = strip_comments(source)
+            captures = list(redirects(text, language))
+
+    return iter(captures)
+
+
 def redirects(source: str, language: str) -> Iterator[CaptureResult[Redirect]]:
     """Return the redirects found in the document."""
 
@@ -106,7 +176,9 @@ def redirects(source: str, language: str) -> Iterator[CaptureResult[Redirect]]:
            'Language {} not in allowed choices.'.format(language)
 
     redirect_re = redirect_res[language]
-    redirect_matches = peekable(redirect_re.finditer(source, concurrent=True))
+    timeout = budget.remaining() if budget is not None else None
+    redirect_matches = peekable(redirect_re.finditer(
+        source, concurrent=True, timeout=timeout))
 
     for match in redirect_matches:
         target = match.group('link') or ''
@@ -0,0 +1,228 @@
+"""Single pass scanner of the wikitext markup.
+
+`scan` finds in one pass over the text the html comments, the section
+headings, the <ref> tags (also self-closing ones), the templates and the
+wikilinks. Templates and wikilinks can be nested, e.g. {{a|{{b}}}}, and both
+the outer and the inner spans are returned.
+
+The output can be passed to the extractors in `misc` (see the `markup`
+argument of `sections`, `references` and `templates`) so that they do not
+need to scan the text again.
+"""
+import operator
+import re
+
+import regex
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from .common import CaptureResult, Heading, Span
+
+__all__ = ('Markup', 'match_heading', 'scan', 'scan_chunk')
+
+Markup = NamedTuple('Markup', [
+    ('comments', List[Span]),
+    ('headings', List[CaptureResult[Heading]]),
+    ('references', List[Span]),
+    ('templates', List[Span]),
+    ('wikilinks', List[Span]),
+])
+
+# Candidate tokens, this is a plain alternation of literals: the standard
+# library `re` finds them much faster than `regex` (or than a single pattern
+# that matches the tags and the headings completely). Candidates are then
+# confirmed with `ref_tag_re` and `match_heading`.
+token_re = re.compile(r'<!--|</?ref|\{\{|\}\}|\[\[|\]\]|\n=', re.IGNORECASE)
+
+ref_tag_re = re.compile(
+    r'''
+        (?P<ref_close></ref\s*>)
+      | (?P<ref_selfclosing><ref(?:\s[^>]*)?/>)
+      | (?P<ref_open><ref(?:\s[^>]*)?>)
+    ''', re.VERBOSE | re.IGNORECASE)
+
+# The end of the content of a line (a reverse search) and the spaces after it
+trailing_spaces_re = regex.compile(r'(?r)\s*')
+spaces_re = regex.compile(r'\s*')
+equals_re = regex.compile(r'=+')
+trailing_equals_re = regex.compile(r'(?r)=+')
+
+COMMENT_END = '-->'
+
+
+def match_heading(source: str, pos: int=0) \
+        -> Optional[CaptureResult[Heading]]:
+    """Match a section heading at pos, the beginning of a line.
+
+    Same result of `misc.section_header_re.match(source, pos)` in linear
+    time: the pattern backtracks over the whole line for each possible level,
+    a line of a few thousand equals takes minutes.
+    """
+    line_end = source.find('\n', pos)
+    if line_end == -1:
+        line_end = len(source)
+    # the closing equals must be followed only by spaces
+    content_end = trailing_spaces_re.match(source, pos, line_end).start()
+
+    opening = equals_re.match(source, pos, content_end)
+    closing = trailing_equals_re.match(source, pos, content_end)
+    if not (opening and closing):
+        return None
+    # the greatest level that leaves a name of at least one char
+    level = min(opening.end() - pos, content_end - closing.start(),
+                (content_end - pos - 1) // 2)
+    if level < 1:
+        return None
+
+    # the trailing spaces can go on over the next (blank) lines, the heading
+    # ends at the last line end among them.
+    end = spaces_re.match(source, content_end).end()
+    if end < len(source):
+        end = source.rfind('\n', content_end, end)
+
+    heading = Heading(name=source[pos + level:content_end - level],
+                      level=level)
+    return CaptureResult(heading, Span(pos, end))
+
+
+def scan(source: str) -> Markup:
+    """Scan the markup of the document.
+
+    Markup inside html comments is ignored, unclosed tags, templates and
+    wikilinks are ignored as well.
+    """
+    markup, _ = scan_chunk(source)
+    return markup
+
+
+def scan_chunk(source: str) -> Tuple[Markup, bool]:
+    """Scan the markup of source and return whether source is closed.
+
+    source is closed if no markup is left open at its end, see
+    `incremental`.
+    """
+    comments = []
+    headings = []
+    references = []
+    templates = []
+    wikilinks = []
+
+    templates_stack = []
+    wikilinks_stack = []
+    ref_open = None
+
+    if source.startswith('='):
+        heading = match_heading(source)
+        if heading:
+            headings.append(heading)
+
+    last_tag_end = source.rfind('>')
+    skip_until = 0
+    comments_closed = True
+    tags_closed = True
+    for match in token_re.finditer(source):
+        start = match.start()
+        if start < skip_until:
+            # inside a comment or a tag
+            continue
+
+        token = match.group()
+        if token == '{{':
+            templates_stack.append(start)
+        elif token == '}}':
+            if templates_stack:
+                templates.append(Span(templates_stack.pop(), match.end()))
+        elif token == '[[':
+            wikilinks_stack.append(start)
+        elif token == ']]':
+            if wikilinks_stack:
+                wikilinks.append(Span(wikilinks_stack.pop(), match.end()))
+        elif token == '\n=':
+            heading = match_heading(source, start + 1)
+            if heading:
+                headings.append(heading)
+        elif token == '<!--':
+            if not comments_closed:
+                continue
+            end = source.find(COMMENT_END, match.end())
+            if end == -1:
+                # no comment can be closed from here on
+                comments_closed = False
+                continue
+            skip_until = end + len(COMMENT_END)
+            comments.append(Span(start, skip_until))
+        else:
+            if start > last_tag_end:
+                # the tag could be closed after the end of source (and
+                # looking for its end at each "<ref" is quadratic)
+                tags_closed = False
+                continue
+            match = ref_tag_re.match(source, start)
+            if not match:
+                continue
+            kind = match.lastgroup
+            if kind == 'ref_open':
+                if ref_open is None:
+                    ref_open = start
+            elif kind == 'ref_close':
+                if ref_open is not None:
+                    references.append(Span(ref_open, match.end()))
+                    ref_open = None
+            elif ref_open is None:
+                # self-closing tag
+                references.append(Span(start, match.end()))
+            skip_until = match.end()
+
+    # nested spans are closed before the enclosing ones, sort them by begin
+    # (Span.__lt__ tests the containment, so it can not be used to sort)
+    templates.sort(key=operator.itemgetter(0))
+    wikilinks.sort(key=operator.itemgetter(0))
+
+    markup = Markup(
+        comments=comments,
+        headings=headings,
+        references=references,
+        templates=templates,
+        wikilinks=wikilinks,
+    )
+    closed = (
+        comments_closed and tags_closed and ref_open is None
+        and not templates_stack and not wikilinks_stack
+        # a heading at the end could end differently in a longer text
+        and not (headings and headings[-1].span.end == len(source))
+    )
+    return markup, closed
+
+
+def shift(markup: Markup, offset: int) -> Markup:
+    """Return the markup with all the spans moved by offset."""
+    if not offset:
+        return markup
+
+    # HACK: tuple.__new__ skips the __new__ of the named tuples, it is more
+    # efficient. Sorry :(
+    new = tuple.__new__
+
+    def shift_spans(spans):
+        return [new(Span, (begin + offset, end + offset))
+                for begin, end in spans]
+
+    return Markup(
+        comments=shift_spans(markup.comments),
+        headings=[
+            new(CaptureResult,
+                (heading, new(Span, (begin + offset, end + offset))))
+            for heading, (begin, end) in markup.headings
+        ],
+        references=shift_spans(markup.references),
+        templates=shift_spans(markup.templates),
+        wikilinks=shift_spans(markup.wikilinks),
+    )
+
+
+def join(markups: Iterable[Markup]) -> Markup:
+    """Join the markup of consecutive chunks of a text."""
+    joined = Markup([], [], [], [], [])
+    for markup in markups:
+        for spans, other_spans in zip(joined, markup):
+            spans.extend(other_spans)
+    return joined
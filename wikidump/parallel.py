@@ -0,0 +1,142 @@
+"""Extraction of the revisions in worker processes, by chunks of revisions.
+
+A page with hundreds of thousands of revisions would keep a single worker
+busy for the whole time if the pages were the unit of work. Instead the
+revisions of each page are split in chunks of at most `chunk_size`
+revisions (see `chunks`), the chunks of all the pages are extracted by a
+pool of worker processes and their results are yielded in order (see
+`imap`).
+
+Each chunk comes with the last revision of the previous chunk of the page,
+its seed: the worker extracts it first, so that the state of the stateful
+extractors (e.g. the captures reused by `incremental`) is the one they have
+in a single process. The stateful part of the processors that depends on
+all the previous revisions (the diffs, the reverts, ...) is cheap, and it
+stays in the main process.
+
+The workers are forked: the initializer and its arguments are not pickled,
+the tasks and their results are. The time taken by each chunk is counted in
+the stats, the longest chunk is the straggler that bounds the wall-clock
+time.
+"""
+import collections
+import concurrent.futures
+import functools
+import itertools
+import multiprocessing
+import time
+
+import more_itertools
+from typing import (Any, Callable, Iterable, Iterator, List, Mapping,
+                    Optional, Tuple, TypeVar)
+
+T = TypeVar('T')
+
+DEFAULT_JOBS = 1
+DEFAULT_CHUNK_SIZE = 200
+
+# the tasks submitted for each worker, ahead of the first one whose result
+# is waited for
+LOOKAHEAD = 2
+
+
+def ParallelStatsDict():
+    """Return new ParallelStatsDict."""
+    return {
+        'jobs': DEFAULT_JOBS,
+        'chunks': 0,
+        # CPU seconds taken by the chunks in the workers
+        'seconds': 0.0,
+        'longest': 0.0,
+        # seconds the main process waited for the results
+        'waited': 0.0,
+    }
+
+
+def chunks(items: Iterable[T], chunk_size: int=DEFAULT_CHUNK_SIZE) \
+        -> Iterator[Tuple[Optional[T], List[T], bool]]:
+    """Split the items (e.g. the revisions of a page) in chunks.
+
+    Yield the seed of each chunk (the last item of the previous chunk, None
+    for the first one), its items and whether it is the last chunk. No
+    items make a single empty chunk, a chunk_size of 0 a single chunk.
+    """
+    items = more_itertools.peekable(items)
+    size = chunk_size or None
+    seed = None
+    while True:
+        chunk = list(itertools.islice(items, size))
+        last = not items
+        yield seed, chunk, last
+        if last:
+            return
+        seed = chunk[-1]
+
+
+def _timed(function: Callable[[Any], T], task: Any) -> Tuple[T, float]:
+    """Return function(task) and the seconds it took."""
+    # the CPU time: the workers may be more than the cores
+    start = time.process_time()
+    result = function(task)
+    return result, time.process_time() - start
+
+
+def imap(function: Callable[[Any], T],
+         tasks: Iterable[Any],
+         jobs: int,
+         initializer: Optional[Callable]=None,
+         initargs: Tuple=(),
+         stats: Optional[Mapping]=None) -> Iterator[T]:
+    """Yield function(task) for each task, in order, computed by jobs workers.
+
+    function, the tasks and the results are pickled. At most LOOKAHEAD
+    tasks for each worker are read ahead of the result yielded.
+    """
+    if stats is None:
+        stats = ParallelStatsDict()
+    stats['jobs'] = jobs
+
+    def result(future):
+        start = time.perf_counter()
+        value, seconds = future.result()
+        stats['waited'] += time.perf_counter() - start
+        stats['chunks'] += 1
+        stats['seconds'] += seconds
+        stats['longest'] = max(stats['longest'], seconds)
+        return value
+
+    timed = functools.partial(_timed, function)
+    futures = collections.deque()
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=jobs,
+            mp_context=multiprocessing.get_context('fork'),
+            initializer=initializer,
+            initargs=initargs) as executor:
+        try:
+            for task in tasks:
+                futures.append(executor.submit(timed, task))
+                if len(futures) >= jobs * LOOKAHEAD:
+                    yield result(futures.popleft())
+            while futures:
+                yield result(futures.popleft())
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def add_stats(total: Mapping, stats: Mapping) -> None:
+    """Add the counters of stats, a nested dict, to total."""
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            add_stats(total[key], value)
+        else:
+            total[key] += value
+
+
+def clear_stats(stats: Mapping) -> None:
+    """Set the counters of stats, a nested dict, to 0."""
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            clear_stats(value)
+        else:
+            stats[key] = 0
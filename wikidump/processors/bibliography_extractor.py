@@ -1,17 +1,14 @@
 """Extract sections which are to be considered bibliography."""
-import collections
 import datetime
-import functools
 
-import fuzzywuzzy.process
 import jsonable
 import more_itertools
 import mwxml
-from typing import Iterable, Iterator, Mapping, NamedTuple, Optional
+from typing import (Iterable, Iterator, List, Mapping, NamedTuple, Optional,
+                    Tuple)
 
-from .. import dumper, extractors, languages, utils
-
-FUZZY_MATCH_CUTOFF = 91      # between 0, 100
+from .. import (bibliography, budget, cache, dumper, extractors, languages,
+               utils)
 
 features_template = '''
 <%!
@@ -89,12 +86,19 @@ stats_template = '''
         <end_time>${stats['performance']['end_time'] | x}</end_time>
         <revisions_analyzed>${stats['performance']['revisions_analyzed'] | x}</revisions_analyzed>
         <pages_analyzed>${stats['performance']['pages_analyzed'] | x}</pages_analyzed>
+        <revisions_filtered>${stats['performance']['revisions_filtered'] | x}</revisions_filtered>
+        <cache hits="${stats['performance']['cache']['hits'] | x}" misses="${stats['performance']['cache']['misses'] | x}" />
+        <budget over_time="${stats['performance']['budget']['over_time'] | x}" over_size="${stats['performance']['budget']['over_size'] | x}" skipped="${stats['performance']['budget']['skipped'] | x}" truncated="${stats['performance']['budget']['truncated'] | x}" />
     </performance>
     <extracted-section-names>
         % for key in ['global', 'last_revision']:
         <${key}>
             % for section_name, count in stats['section_names'][key].most_common():
+            % if stats['top_k']:
+            <section name="${section_name | x}" count="${count}" error="${stats['section_names'][key].error(section_name)}" />
+            % else:
             <section name="${section_name | x}" count="${count}" />
+            % endif
             % endfor
         </${key}>
         % endfor
@@ -113,7 +117,7 @@ Revision = NamedTuple('Revision', [
     ('format', str),
     ('timestamp', jsonable.Type),
     ('text', str),
-    ('sections', Iterable[extractors.misc.Section])
+    ('sections', Iterable[extractors.common.Heading])
 ])
 
 
@@ -127,29 +131,67 @@ Page = NamedTuple('Page', [
 
 # TODO: instead of comparing section_name to a bib synonym,
 # search all the possible bib synonyms in the section name
-@functools.lru_cache(maxsize=500)
 def is_bibliography(
         section_name: str,
         language: str,
-        score_cutoff: int=FUZZY_MATCH_CUTOFF) -> bool:
+        score_cutoff: int=bibliography.SCORE_CUTOFF) -> bool:
     """Check whether a section is a bibliography."""
-    bibliography_synonyms = languages.bibliography[language]
-    match = fuzzywuzzy.process.extractOne(
-        section_name,
-        bibliography_synonyms,
-        score_cutoff=score_cutoff,
-    )
-    return bool(match)
+    classifier = bibliography.get_classifier(language, score_cutoff)
+    return classifier(section_name)
+
+
+def bibliography_in_revision(
+        text: str,
+        classifier: bibliography.Classifier,
+        ) -> Tuple[List[extractors.common.Heading], str]:
+    """Return the headings of the bibliography sections of the revision and
+    their text.
+
+    The sections keep a reference to the whole text of the revision, the
+    headings are returned instead: they are cached and yielded.
+    """
+    text = utils.remove_comments(text)
+
+    sections = [section for section, _ in extractors.sections(text)]
+
+    # the names of all the sections are classified at once
+    decisions = classifier.classify(section.name for section in sections)
+    bibliography_sections = [
+        section
+        for section, is_bibliography_section in zip(sections, decisions)
+        if is_bibliography_section
+    ]
+
+    # TODO: use section.fullbody
+    text = "".join(section.full_body for section in bibliography_sections)
+
+    headings = [
+        extractors.common.Heading(name=section.name, level=section.level)
+        for section in bibliography_sections
+    ]
+    return headings, text
 
 
 def extract_revisions(
         mw_page: mwxml.Page,
         language: str,
         stats: Mapping,
-        only_last_revision: bool) -> Iterator[Revision]:
+        only_last_revision: bool,
+        revision_cache_size: int=cache.DEFAULT_SIZE,
+        revision_budget: Optional[budget.Budget]=None,
+        classifier: Optional[bibliography.Classifier]=None,
+        ) -> Iterator[Revision]:
     """Extract the sections which are bibliography from the revisions."""
+    if revision_budget is None:
+        revision_budget = budget.Budget()
+    if classifier is None:
+        classifier = bibliography.get_classifier(language)
     section_names_stats = stats['section_names']
     revisions = more_itertools.peekable(mw_page)
+    revision_cache = cache.RevisionCache(
+        revision_cache_size,
+        stats=stats['performance']['cache'],
+    )
     for mw_revision in revisions:
         utils.dot()
 
@@ -157,21 +199,22 @@ def extract_revisions(
         if only_last_revision and not is_last_revision:
             continue
 
-        text = utils.remove_comments(mw_revision.text or '')
-
-        sections = (section for section, _ in extractors.sections(text))
-
-        bibliography_sections = list(
-            section for section in sections
-            if is_bibliography(section.name, language)
+        result = revision_budget.run(
+            mw_revision,
+            lambda text: revision_cache.get(
+                mw_revision,
+                lambda: bibliography_in_revision(text, classifier),
+            ),
         )
+        if result is None:
+            # over budget
+            continue
+        bibliography_headings, text = result
 
-        for section in bibliography_sections:
-            section_names_stats['global'][section.name] += 1
-            if is_last_revision:
-                section_names_stats['last_revision'][section.name] += 1
-        # TODO: use section.fullbody
-        text = "".join(section.full_body for section in bibliography_sections)
+        section_names = [heading.name for heading in bibliography_headings]
+        section_names_stats['global'].update(section_names)
+        if is_last_revision:
+            section_names_stats['last_revision'].update(section_names)
 
         yield Revision(
             id=mw_revision.id,
@@ -183,7 +226,7 @@ def extract_revisions(
             format=mw_revision.format,
             timestamp=mw_revision.timestamp.to_json(),
             text=text,
-            sections=bibliography_sections,
+            sections=bibliography_headings,
         )
 
         stats['performance']['revisions_analyzed'] += 1
@@ -193,7 +236,11 @@ def extract_pages(
         dump: Iterable[mwxml.Page],
         language: str,
         stats: Mapping,
-        only_last_revision: bool) -> Iterator[Page]:
+        only_last_revision: bool,
+        revision_cache_size: int=cache.DEFAULT_SIZE,
+        revision_budget: Optional[budget.Budget]=None,
+        classifier: Optional[bibliography.Classifier]=None,
+        ) -> Iterator[Page]:
     """Extract revisions from a page."""
     for mw_page in dump:
         utils.log("Processing", mw_page.title)
@@ -208,6 +255,9 @@ def extract_pages(
             language=language,
             stats=stats,
             only_last_revision=only_last_revision,
+            revision_cache_size=revision_cache_size,
+            revision_budget=revision_budget,
+            classifier=classifier,
         )
 
         yield Page(
@@ -236,6 +286,22 @@ def configure_subparsers(subparsers):
         action='store_true',
         help='Consider only the last revision for each page.',
     )
+    parser.add_argument(
+        '--bibliography-cache',
+        metavar='FILE',
+        required=False,
+        default=None,
+        help='Save which section names are bibliography in this sqlite '
+             'database, shared by all the languages, and reuse it in the '
+             'next runs.',
+    )
+    parser.add_argument(
+        '--top-k',
+        metavar='N',
+        type=utils.parse_top_k,
+        default=0,
+        help=utils.TOP_K_HELP,
+    )
     parser.set_defaults(func=main)
 
 
@@ -251,18 +317,30 @@ def main(
             'end_time': None,
             'revisions_analyzed': 0,
             'pages_analyzed': 0,
+            'revisions_filtered': 0,
+            'cache': cache.CacheStatsDict(),
+            'budget': budget.BudgetStatsDict(),
         },
         'section_names': {
-            'global': collections.Counter(),
-            'last_revision': collections.Counter(),
+            'global': utils.counter(args.top_k),
+            'last_revision': utils.counter(args.top_k),
         },
+        'top_k': args.top_k,
     }
 
+    classifier = bibliography.get_classifier(
+        args.language,
+        persistent_cache_path=args.bibliography_cache,
+    )
     pages_generator = extract_pages(
         dump,
         language=args.language,
         stats=stats,
         only_last_revision=args.only_last_revision,
+        revision_cache_size=args.revision_cache_size,
+        revision_budget=budget.from_args(
+            args, stats=stats['performance']['budget']),
+        classifier=classifier,
     )
 
     with features_output_h:
@@ -275,6 +353,8 @@ def main(
             generator='youtux/wikidump',
         )
         stats['performance']['end_time'] = datetime.datetime.utcnow()
+        stats['performance']['revisions_filtered'] = dump.revisions_filtered
+    classifier.flush()
 
     with stats_output_h:
         dumper.render_template(
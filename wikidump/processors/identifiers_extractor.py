@@ -7,10 +7,12 @@ import functools
 
 import more_itertools
 import mwxml
-from typing import Iterable, Mapping, Callable
+import numpy
+from typing import (Callable, FrozenSet, Iterable, Iterator, List, Mapping,
+                    Optional, Sequence, Set, Tuple)
 
-from .. import dumper, extractors, utils, languages
-from . import bibliography_extractor
+from .. import (bibliography, budget, cache, dumper, extractors, parallel,
+               reverts, utils, languages)
 
 features_template = '''
 <%!
@@ -39,6 +41,12 @@ features_template = '''
                 <id>${revision.id | x}</id>
                 ${tag_user_if_exists(revision.user)}
                 <timestamp>${revision.timestamp | x}</timestamp>
+                % if revision.revert:
+                <revert restored="${revision.revert.restored | x}" />
+                % endif
+                % if revision.reverted:
+                <reverted />
+                % endif
                 <publication-identifiers-diff>
                     % for key, group in groupby_action(revision.publication_identifiers_diff):
                     <diff action="${key | x}">
@@ -57,13 +65,22 @@ features_template = '''
 '''
 
 stats_template = '''
+<%!
+    from wikidump.extractors.incremental import speedup
+%>
 <stats>
     <performance>
         <start_time>${stats['performance']['start_time']}</start_time>
         <end_time>${stats['performance']['end_time']}</end_time>
         <revisions_analyzed>${stats['performance']['revisions_analyzed']}</revisions_analyzed>
         <pages_analyzed>${stats['performance']['pages_analyzed']}</pages_analyzed>
+        <revisions_filtered>${stats['performance']['revisions_filtered']}</revisions_filtered>
+        <cache hits="${stats['performance']['cache']['hits']}" misses="${stats['performance']['cache']['misses']}" />
+        <budget over_time="${stats['performance']['budget']['over_time']}" over_size="${stats['performance']['budget']['over_size']}" skipped="${stats['performance']['budget']['skipped']}" truncated="${stats['performance']['budget']['truncated']}" />
+        <parallel jobs="${stats['performance']['parallel']['jobs']}" chunks="${stats['performance']['parallel']['chunks']}" seconds="${'%.3f' % stats['performance']['parallel']['seconds']}" longest="${'%.3f' % stats['performance']['parallel']['longest']}" waited="${'%.3f' % stats['performance']['parallel']['waited']}" />
+        <incremental chunks_reused="${stats['performance']['incremental']['chunks_reused']}" chunks_extracted="${stats['performance']['incremental']['chunks_extracted']}" chars_reused="${stats['performance']['incremental']['chars_reused']}" chars_extracted="${stats['performance']['incremental']['chars_extracted']}" speedup="${'%.2f' % speedup(stats['performance']['incremental'])}" />
     </performance>
+    <reverts reverts="${stats['reverts']['reverts']}" reverted="${stats['reverts']['reverted']}" />
     <identifiers>
         % for key in ['global', 'last_revision']:
         <${key}>
@@ -85,7 +102,18 @@ Revision = collections.namedtuple('Revision', [
     'id',
     'user',
     'timestamp',
+    'publication_identifiers',
     'publication_identifiers_diff',
+    'revert',
+    'reverted',
+])
+# what the workers need of a revision, see `budget.Budget.run` and
+# `cache.revision_sha1`
+RevisionText = collections.namedtuple('RevisionText', [
+    'id',
+    'page',
+    'text',
+    'sha1',
 ])
 
 
@@ -94,9 +122,8 @@ def always_true(*args, **kwargs) -> bool:
     return True
 
 
-def is_section_bibliography(section, language):
-    return bibliography_extractor.is_bibliography(
-        section.name, language)
+def is_section_bibliography(section, classifier):
+    return classifier(section.name)
 
 
 def get_section_filter(args) -> Callable[[str, str], bool]:
@@ -106,9 +133,13 @@ def get_section_filter(args) -> Callable[[str, str], bool]:
     elif args.filter_sections == 'bibliography':
         if not args.language:
             raise ValueError('--language argument not provided.')
+        classifier = bibliography.get_classifier(
+            args.language,
+            persistent_cache_path=args.bibliography_cache,
+        )
         return functools.partial(
             is_section_bibliography,
-            language=args.language,
+            classifier=classifier,
         )
     else:
         msg = 'Requested seciton filter "{}" not implemented'.format(
@@ -128,17 +159,18 @@ def IdentifierStatsDict():
     }
 
 
-@utils.listify(wrapper=set)
 def where_appears(
-        span: extractors.common.Span,
-        **spans: Mapping[str, Iterable[extractors.common.Span]]):
-    """Find out where the current span appears, given a dict of spans."""
-    span_le = extractors.Span.__le__
-    for key, span_list in spans.items():
-        # if any(span <= other_span) for other_span in span_list):
-        # HACK: the following is more efficient. Sorry :(
-        if any(span_le(span, other_span) for other_span in span_list):
-            yield key
+        spans: Sequence[extractors.common.Span],
+        **containers: Iterable[extractors.common.Span]) -> List[Set[str]]:
+    """Find out where each span appears, given a dict of spans.
+
+    Return for each span the set of the keys whose spans enclose it.
+    """
+    indexes = {
+        key: extractors.common.SpanIndex(span_list)
+        for key, span_list in containers.items()
+    }
+    return extractors.common.enclosed_by(spans, **indexes)
 
 
 def identifier_appearance_stat_key(appearances: set) -> str:
@@ -155,75 +187,321 @@ def identifier_appearance_stat_key(appearances: set) -> str:
         return 'only_in_raw_text'
 
 
-def extract_revisions(
-        page: mwxml.Page,
-        stats: Mapping,
-        only_last_revision: bool,
-        section_filter: Callable[[extractors.misc.Section], bool]=always_true,
-        ) -> Iterable[Revision]:
-    """Extract the identifiers from the revisions."""
-    revisions = more_itertools.peekable(page)
+class RevisionAnalyzer:
+    """Extract the identifiers from the revisions of a page, in order.
+
+    The analyzer keeps the state of the previous revisions of the page: the
+    captures of the chunks and of the sections that did not change (see
+    `incremental`) and the results of the last texts (see `cache`).
+
+    Only the identifiers of identifier_types are extracted, all of them if
+    None. If appearance_stats is False, where the identifiers appear is not
+    needed and the identifiers are extracted only from the filtered
+    sections.
+    """
+    def __init__(
+            self,
+            stats: Mapping,
+            section_filter: Callable[[extractors.misc.Section], bool]=
+            always_true,
+            revision_cache_size: int=cache.DEFAULT_SIZE,
+            revision_budget: Optional[budget.Budget]=None,
+            identifier_types: Optional[FrozenSet[str]]=None,
+            appearance_stats: bool=True):
+        """Instantiate an analyzer, its performance is counted in stats."""
+        if revision_budget is None:
+            revision_budget = budget.Budget()
+        self.section_filter = section_filter
+        self.revision_budget = revision_budget
+        self.stats_incremental = stats['performance']['incremental']
+
+        # the captures of the sections that did not change are reused
+        self.scan = extractors.incremental.IncrementalExtractor(
+            extractors.scanner.scan_chunk,
+            shift=extractors.scanner.shift,
+            join=extractors.scanner.join,
+            stats=self.stats_incremental,
+        )
+        self.extract_identifiers = functools.partial(
+            extractors.identifiers.extract_chunk,
+            types=identifier_types,
+        )
+        self.pub_identifiers = extractors.incremental.IncrementalExtractor(
+            self.extract_identifiers,
+            stats=self.stats_incremental,
+        )
+        # filtered section text -> (captures, closed), of the previous
+        # revision
+        self.sections_cache = {}
+
+        if appearance_stats:
+            self.extract = self.identifiers_in_revision
+        else:
+            self.extract = self.identifiers_in_filtered_sections
+
+        self.revision_cache = cache.RevisionCache(
+            revision_cache_size,
+            stats=stats['performance']['cache'],
+        )
+
+    def __call__(self, mw_revision: mwxml.Revision) \
+            -> Optional[List[Tuple[extractors.common.CaptureResult,
+                                   Set[str]]]]:
+        """Return the identifiers in the revision and where they appear.
+
+        Return None if the revision is over budget.
+        """
+        return self.revision_budget.run(
+            mw_revision,
+            lambda text: self.revision_cache.get(
+                mw_revision,
+                lambda: self.extract(text),
+            ),
+        )
 
-    stats_identifiers = stats['identifiers']
+    def identifiers_in_revision(self, source):
+        """Return the identifiers in the revision and where they appear.
 
-    prev_identifiers = set()
-    for mw_revision in revisions:
-        utils.dot()
+        The spans of the identifiers are in the text of the revision, with
+        the comments.
+        """
+        text, offset_map = utils.strip_comments(source)
 
-        is_last_revision = not utils.has_next(revisions)
-        if only_last_revision and not is_last_revision:
-            continue
+        identifiers_captures = self.pub_identifiers(text)
+        if not identifiers_captures:
+            # most revisions have no identifiers, where they appear is not
+            # needed
+            return []
 
-        text = utils.remove_comments(mw_revision.text or '')
+        # sections, references and templates are found in a single pass
+        markup = self.scan(text)
 
         sections_captures_filtered = list(
             capture
-            for capture in extractors.sections(text, include_preamble=True)
-            if section_filter(capture.data)
+            for capture in extractors.sections(text,
+                                               include_preamble=True,
+                                               markup=markup)
+            if self.section_filter(capture.data)
         )
 
-        references_captures = list(extractors.references(text))
-
-        templates_captures = list(extractors.templates(text))
-
-        identifiers_captures = list(extractors.pub_identifiers(text))
-        identifiers = [identifier for identifier, _ in identifiers_captures]
-
-        # TODO: check if funziona
-        where = functools.partial(
-            where_appears,
-            references=[span for _, span in references_captures],
-            templates=[span for _, span in templates_captures],
+        identifiers_appearances = where_appears(
+            [span for _, span in identifiers_captures],
+            references=markup.references,
+            templates=markup.templates,
             sections=[span for _, span in sections_captures_filtered],
         )
+        return list(zip(offset_map.original_captures(identifiers_captures),
+                        identifiers_appearances))
+
+    def identifiers_in_filtered_sections(self, source):
+        """Return the identifiers in the filtered sections of the revision.
+
+        Each filtered section is extracted by itself (see `incremental`)
+        and the sections that did not change are reused, the other sections
+        are not extracted at all. The spans of the identifiers are in the
+        text of the revision, with the comments.
+        """
+        stats_incremental = self.stats_incremental
+        extract_identifiers = self.extract_identifiers
+        text, offset_map = utils.strip_comments(source)
+
+        markup = self.scan(text)
+
+        cache = {}
+        identifiers_captures = []
+        for section, (begin, end) in extractors.sections(
+                text, include_preamble=True, markup=markup):
+            if not self.section_filter(section):
+                continue
+
+            chunk = text[begin:end]
+            cached = self.sections_cache.get(chunk) or cache.get(chunk)
+            if cached is None:
+                cached = extract_identifiers(chunk)
+                stats_incremental['chunks_extracted'] += 1
+                stats_incremental['chars_extracted'] += len(chunk)
+            else:
+                stats_incremental['chunks_reused'] += 1
+                stats_incremental['chars_reused'] += len(chunk)
+            cache[chunk] = cached
+
+            captures, closed = cached
+            if not closed and end < len(text):
+                # an identifier could extend over the end of the section,
+                # then it is not in the section
+                captures, _ = extract_identifiers(text[begin:])
+                captures = [capture for capture in captures
+                            if capture.span.end <= end - begin]
+            identifiers_captures.extend(
+                extractors.incremental.shift_captures(captures, begin))
+        self.sections_cache = cache
+
+        appearances = {'sections'}
+        return [(capture, appearances) for capture
+                in offset_map.original_captures(identifiers_captures)]
+
+
+def new_revision(mw_revision: mwxml.Revision) -> Revision:
+    """Return the revision, without its identifiers."""
+    return Revision(
+        id=mw_revision.id,
+        user=mw_revision.user,
+        timestamp=mw_revision.timestamp.to_json(),
+        publication_identifiers=None,
+        publication_identifiers_diff=None,
+        revert=None,
+        reverted=False,
+    )
 
-        identifiers_with_appearances = [
-            (identifier, where(span))
-            for identifier, span in identifiers_captures
-        ]
 
-        for identifier, appearances in identifiers_with_appearances:
+def analyzed_revision(
+        revision: Revision,
+        identifiers_with_appearances: List[
+            Tuple[extractors.common.CaptureResult, Set[str]]],
+        is_last_revision: bool,
+        stats: Mapping,
+        identifier_table: utils.InternTable,
+        appearance_stats: bool) -> Tuple[Revision, numpy.ndarray]:
+    """Return the revision with its identifiers and its filtered identifiers.
+
+    Where the identifiers appear is counted in the stats, if
+    appearance_stats.
+    """
+    if appearance_stats:
+        stats_identifiers = stats['identifiers']
+        for _, appearances in identifiers_with_appearances:
             key_to_increment = identifier_appearance_stat_key(appearances)
             stats_identifiers['global'][key_to_increment] += 1
             if is_last_revision:
                 stats_identifiers['last_revision'][key_to_increment] += 1
 
-        identifiers_filtered = [
-            identifier
-            for identifier, appearances in identifiers_with_appearances
-            if 'sections' in appearances
-        ]
-
-        yield Revision(
-            id=mw_revision.id,
-            user=mw_revision.user,
-            timestamp=mw_revision.timestamp.to_json(),
-            publication_identifiers_diff=utils.diff(prev_identifiers,
-                                                    identifiers_filtered),
+    identifiers_filtered = identifier_table.array(
+        identifier
+        for (identifier, _), appearances in identifiers_with_appearances
+        if 'sections' in appearances
+    )
+
+    # the text of the revision is not kept, while the revisions wait to know
+    # whether they are reverted
+    revision = revision._replace(publication_identifiers=[
+        capture for capture, _ in identifiers_with_appearances
+    ])
+    return revision, identifiers_filtered
+
+
+def diffed_revisions(
+        analyzed: Iterable[Tuple[Revision, str, numpy.ndarray]],
+        stats: Mapping,
+        identifier_table: utils.InternTable,
+        collapse_reverts: bool=False,
+        revert_radius: int=reverts.DEFAULT_RADIUS) -> Iterator[Revision]:
+    """Yield the analyzed revisions with the diffs of their identifiers.
+
+    analyzed yields the revisions of a page, in order, with the sha1 of
+    their text and their filtered identifiers.
+    """
+    stats_reverts = stats['reverts']
+    prev_identifiers = utils.EMPTY_IDS
+    for (revision, _, identifiers_filtered), revert, reverted in \
+            reverts.delayed(analyzed,
+                            key=lambda analyzed: (analyzed[1],
+                                                  analyzed[0].id),
+                            radius=revert_radius):
+        if revert is not None:
+            stats_reverts['reverts'] += 1
+        if reverted:
+            stats_reverts['reverted'] += 1
+
+        if collapse_reverts and reverted:
+            # the revisions after the reverted ones are diffed with the
+            # last revision not reverted
+            diff = []
+        else:
+            diff = utils.diff_ids(prev_identifiers, identifiers_filtered,
+                                  identifier_table)
+            prev_identifiers = identifiers_filtered
+
+        yield revision._replace(
+            publication_identifiers_diff=diff,
+            revert=revert,
+            reverted=reverted,
         )
 
-        stats['performance']['revisions_analyzed'] += 1
-        prev_identifiers = identifiers_filtered
+
+def extract_revisions(
+        page: mwxml.Page,
+        stats: Mapping,
+        only_last_revision: bool,
+        section_filter: Callable[[extractors.misc.Section], bool]=always_true,
+        revision_cache_size: int=cache.DEFAULT_SIZE,
+        revision_budget: Optional[budget.Budget]=None,
+        identifier_types: Optional[FrozenSet[str]]=None,
+        identifier_table: Optional[utils.InternTable]=None,
+        appearance_stats: bool=True,
+        collapse_reverts: bool=False,
+        revert_radius: int=reverts.DEFAULT_RADIUS,
+        ) -> Iterable[Revision]:
+    """Extract the identifiers from the revisions.
+
+    Only the identifiers of identifier_types are extracted, all of them if
+    None. The identifiers are interned in identifier_table, if given.
+
+    If appearance_stats is False, where the identifiers appear is not
+    counted in the stats and the identifiers are extracted only from the
+    filtered sections, the ones that end up in the diffs.
+
+    The identity reverts of at most revert_radius revisions are marked (see
+    `reverts`), if collapse_reverts is True the reverted revisions have
+    empty diffs and the diff of the revert is from the restored revision.
+    """
+    if identifier_table is None:
+        identifier_table = utils.InternTable()
+    revisions = more_itertools.peekable(page)
+
+    analyze = RevisionAnalyzer(
+        stats,
+        section_filter=section_filter,
+        revision_cache_size=revision_cache_size,
+        revision_budget=revision_budget,
+        identifier_types=identifier_types,
+        appearance_stats=appearance_stats,
+    )
+
+    def analyzed_revisions():
+        """Yield the revisions with their sha1 and their filtered identifiers.
+        """
+        for mw_revision in revisions:
+            utils.dot()
+
+            is_last_revision = not utils.has_next(revisions)
+            if only_last_revision and not is_last_revision:
+                continue
+
+            identifiers_with_appearances = analyze(mw_revision)
+            if identifiers_with_appearances is None:
+                # over budget
+                continue
+
+            revision, identifiers_filtered = analyzed_revision(
+                new_revision(mw_revision),
+                identifiers_with_appearances,
+                is_last_revision,
+                stats=stats,
+                identifier_table=identifier_table,
+                appearance_stats=appearance_stats,
+            )
+            yield revision, cache.revision_sha1(mw_revision), \
+                identifiers_filtered
+
+            stats['performance']['revisions_analyzed'] += 1
+
+    return diffed_revisions(
+        analyzed_revisions(),
+        stats=stats,
+        identifier_table=identifier_table,
+        collapse_reverts=collapse_reverts,
+        revert_radius=revert_radius,
+    )
 
 
 def extract_pages(
@@ -231,6 +509,12 @@ def extract_pages(
         stats: Mapping,
         only_last_revision: bool,  # TODO: default value to False
         section_filter: Callable[[extractors.misc.Section], bool]=always_true,
+        revision_cache_size: int=cache.DEFAULT_SIZE,
+        revision_budget: Optional[budget.Budget]=None,
+        identifier_types: Optional[FrozenSet[str]]=None,
+        identifier_table: Optional[utils.InternTable]=None,
+        appearance_stats: bool=True,
+        collapse_reverts: bool=False,
         ) -> Iterable[Page]:
     """"Extract the pages from the dump."""
     for mw_page in dump:
@@ -246,6 +530,12 @@ def extract_pages(
             stats=stats,
             only_last_revision=only_last_revision,
             section_filter=section_filter,
+            revision_cache_size=revision_cache_size,
+            revision_budget=revision_budget,
+            identifier_types=identifier_types,
+            identifier_table=identifier_table,
+            appearance_stats=appearance_stats,
+            collapse_reverts=collapse_reverts,
         )
 
         yield Page(
@@ -256,6 +546,177 @@ def extract_pages(
         stats['performance']['pages_analyzed'] += 1
 
 
+def AnalyzerStatsDict():
+    """Return new AnalyzerStatsDict, the stats of a `RevisionAnalyzer`."""
+    return {
+        'performance': {
+            'incremental': extractors.incremental.IncrementalStatsDict(),
+            'cache': cache.CacheStatsDict(),
+            'budget': budget.BudgetStatsDict(),
+        },
+    }
+
+
+# the args of the worker process, see `init_worker`
+_worker_args = None
+
+
+def init_worker(args) -> None:
+    """Initialize a worker process of extract-identifiers --jobs."""
+    global _worker_args
+    _worker_args = args
+    # the connections of the classifiers cannot be shared with the parent
+    bibliography.forget()
+
+
+def analyze_chunk(
+        chunk: Tuple[Optional[RevisionText], List[RevisionText]]) \
+        -> Tuple[List, Mapping, List[Tuple]]:
+    """Extract the identifiers from a chunk of revisions, in a worker.
+
+    Return the identifiers of each revision (see `RevisionAnalyzer`), the
+    stats of the chunk and the rows of its over budget revisions, that are
+    logged by the main process in order.
+    """
+    args = _worker_args
+    seed, revision_texts = chunk
+    stats = AnalyzerStatsDict()
+    log_rows = []
+    analyze = RevisionAnalyzer(
+        stats,
+        section_filter=get_section_filter(args),
+        revision_cache_size=args.revision_cache_size,
+        revision_budget=budget.from_args(
+            args, stats=stats['performance']['budget'], log_rows=log_rows),
+        identifier_types=args.identifier_types,
+        appearance_stats=args.stats,
+    )
+
+    if seed is not None:
+        # the seed is the last revision of the previous chunk, it is counted
+        # and logged in there
+        analyze(seed)
+        parallel.clear_stats(stats)
+        del log_rows[:]
+
+    results = [analyze(revision_text) for revision_text in revision_texts]
+    bibliography.flush()
+    return results, stats, log_rows
+
+
+def extract_pages_parallel(
+        dump: mwxml.Dump,
+        stats: Mapping,
+        args,
+        identifier_table: Optional[utils.InternTable]=None) -> Iterable[Page]:
+    """Extract the pages from the dump, in args.jobs worker processes.
+
+    The revisions of the pages are split in chunks of args.chunk_size
+    revisions (see `parallel`), the diffs are computed here from the results
+    of the workers, in order.
+    """
+    if identifier_table is None:
+        identifier_table = utils.InternTable()
+
+    # the page, the revisions, their sha1 and whether they are the last of
+    # the page, and whether it is the last chunk of the page, of the chunks
+    # sent to the workers
+    sent = collections.deque()
+
+    def chunks():
+        for mw_page in dump:
+            utils.log("Processing", mw_page.title)
+
+            # Skip non-articles
+            if mw_page.namespace != 0:
+                utils.log('Skipped (namespace != 0)')
+                continue
+
+            page = Page(id=mw_page.id, title=mw_page.title, revisions=None)
+
+            def revision_texts(revisions=more_itertools.peekable(mw_page)):
+                for mw_revision in revisions:
+                    utils.dot()
+
+                    is_last_revision = not utils.has_next(revisions)
+                    if args.only_last_revision and not is_last_revision:
+                        continue
+
+                    revision_text = RevisionText(
+                        id=mw_revision.id,
+                        page=page,
+                        text=mw_revision.text,
+                        sha1=cache.revision_sha1(mw_revision),
+                    )
+                    yield new_revision(mw_revision), revision_text, \
+                        is_last_revision
+
+            for seed, chunk, last in parallel.chunks(revision_texts(),
+                                                     args.chunk_size):
+                sent.append((
+                    page,
+                    [(revision, revision_text.sha1, is_last_revision)
+                     for revision, revision_text, is_last_revision in chunk],
+                    last,
+                ))
+                yield (seed[1] if seed is not None else None,
+                       [revision_text for _, revision_text, _ in chunk])
+
+    def analyzed_chunks():
+        for results, chunk_stats, log_rows in parallel.imap(
+                analyze_chunk,
+                chunks(),
+                jobs=args.jobs,
+                initializer=init_worker,
+                initargs=(args,),
+                stats=stats['performance']['parallel']):
+            parallel.add_stats(stats, chunk_stats)
+            budget.write_log(getattr(args, 'budget_log', None), log_rows)
+            page, revisions, last = sent.popleft()
+            yield page, zip(revisions, results), last
+
+    analyzed_chunks_iter = analyzed_chunks()
+
+    for page, analyzed, last in analyzed_chunks_iter:
+        def analyzed_revisions(analyzed=analyzed, last=last):
+            while True:
+                for (revision, sha1, is_last_revision), \
+                        identifiers_with_appearances in analyzed:
+                    if identifiers_with_appearances is None:
+                        # over budget
+                        continue
+
+                    revision, identifiers_filtered = analyzed_revision(
+                        revision,
+                        identifiers_with_appearances,
+                        is_last_revision,
+                        stats=stats,
+                        identifier_table=identifier_table,
+                        appearance_stats=args.stats,
+                    )
+                    yield revision, sha1, identifiers_filtered
+
+                    stats['performance']['revisions_analyzed'] += 1
+                if last:
+                    return
+                _, analyzed, last = next(analyzed_chunks_iter)
+
+        revisions_generator = diffed_revisions(
+            analyzed_revisions(),
+            stats=stats,
+            identifier_table=identifier_table,
+            collapse_reverts=args.collapse_reverts,
+        )
+        yield Page(
+            id=page.id,
+            title=page.title,
+            revisions=revisions_generator,
+        )
+        stats['performance']['pages_analyzed'] += 1
+        # the next chunks are of the next page only once these are consumed
+        more_itertools.consume(revisions_generator)
+
+
 def configure_subparsers(subparsers):
     """Configure the subparsers."""
     parser = subparsers.add_parser(
@@ -280,6 +741,56 @@ pubmed).''',
         required=False,
         help='The language of the dump.',
     )
+    parser.add_argument(
+        '--stats',
+        action='store_true',
+        help='Count in the stats where the identifiers appear (templates, '
+             'references, filtered sections). Otherwise the identifiers are '
+             'extracted only from the filtered sections.',
+    )
+    parser.add_argument(
+        '--identifier-types',
+        metavar='TYPES',
+        type=extractors.identifiers.parse_types,
+        required=False,
+        default=None,
+        help='Extract only these identifiers, comma separated, from: {} '
+             '[default: all].'.format(
+                 ', '.join(extractors.identifiers.TYPES)),
+    )
+    parser.add_argument(
+        '--collapse-reverts',
+        action='store_true',
+        help='Leave out of the diffs the revisions undone by an identity '
+             'revert (a revision with the same text of one of the last {} '
+             'revisions).'.format(reverts.DEFAULT_RADIUS),
+    )
+    parser.add_argument(
+        '--jobs', '-j',
+        metavar='N',
+        type=int,
+        default=parallel.DEFAULT_JOBS,
+        help='Extract the identifiers in N worker processes [default: {}].'
+             .format(parallel.DEFAULT_JOBS),
+    )
+    parser.add_argument(
+        '--chunk-size',
+        metavar='N',
+        type=int,
+        default=parallel.DEFAULT_CHUNK_SIZE,
+        help='With --jobs, split the revisions of the pages in chunks of N '
+             'revisions extracted by different workers, 0 does not split '
+             'the pages [default: {}].'.format(parallel.DEFAULT_CHUNK_SIZE),
+    )
+    parser.add_argument(
+        '--bibliography-cache',
+        metavar='FILE',
+        required=False,
+        default=None,
+        help='Save which section names are bibliography in this sqlite '
+             'database, shared by all the languages, and reuse it in the '
+             'next runs.',
+    )
     parser.set_defaults(func=main)
 
 
@@ -294,7 +805,13 @@ def main(dump: mwxml.Dump,
             'end_time': None,
             'revisions_analyzed': 0,
             'pages_analyzed': 0,
+            'revisions_filtered': 0,
+            'incremental': extractors.incremental.IncrementalStatsDict(),
+            'cache': cache.CacheStatsDict(),
+            'budget': budget.BudgetStatsDict(),
+            'parallel': parallel.ParallelStatsDict(),
         },
+        'reverts': reverts.RevertsStatsDict(),
         'identifiers': {
             'global': IdentifierStatsDict(),
             'last_revision': IdentifierStatsDict(),
@@ -303,12 +820,27 @@ def main(dump: mwxml.Dump,
     print(args)
 
     section_filter = get_section_filter(args)
-    pages_generator = extract_pages(
-        dump,
-        stats=stats,
-        only_last_revision=args.only_last_revision,
-        section_filter=section_filter,
-    )
+    if args.jobs > 1:
+        pages_generator = extract_pages_parallel(
+            dump,
+            stats=stats,
+            args=args,
+            identifier_table=utils.InternTable(),
+        )
+    else:
+        pages_generator = extract_pages(
+            dump,
+            stats=stats,
+            only_last_revision=args.only_last_revision,
+            section_filter=section_filter,
+            revision_cache_size=args.revision_cache_size,
+            revision_budget=budget.from_args(
+                args, stats=stats['performance']['budget']),
+            identifier_types=args.identifier_types,
+            identifier_table=utils.InternTable(),
+            appearance_stats=args.stats,
+            collapse_reverts=args.collapse_reverts,
+        )
 
     with features_output_h:
         stats['performance']['start_time'] = datetime.datetime.utcnow()
@@ -318,6 +850,8 @@ def main(dump: mwxml.Dump,
             pages=pages_generator,
         )
         stats['performance']['end_time'] = datetime.datetime.utcnow()
+        stats['performance']['revisions_filtered'] = dump.revisions_filtered
+    bibliography.flush()
 
     with stats_output_h:
         dumper.render_template(
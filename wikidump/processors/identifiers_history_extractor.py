@@ -3,28 +3,24 @@
 The output format is csv.
 
 The program analyze one page at a time, and it outputs the history of the
-identifier of the page.
+identifier of the page: a row for each interval of time in which an
+identifier is in the page. The revisions are read once and their texts are
+not kept: only the identifiers of each revision, sorted by timestamp (a few
+pages have revisions out of order, e.g. after an import), that are spilled
+to disk for the pages with a huge history (see `spill`). A row is written
+as soon as the identifier is removed (the ones in the last revision of the
+page are written at its end).
+
+With --collapse-reverts the revisions undone by an identity revert (see
+`reverts`) are left out: the identifiers they add or remove do not split
+the intervals.
 """
-import collections
 import csv
-import datetime
-import itertools
+import functools
 
-import more_itertools
 import mwxml
-import networkx
 
-from .. import extractors, utils
-
-PageHistoryElem = collections.namedtuple(
-    'PageHistoryElem',
-    'identifier revision_id timestamp action',
-)
-
-Revision = collections.namedtuple(
-    'Revision',
-    'id timestamp identifiers',
-)
+from .. import budget, cache, extractors, reverts, spill, utils
 
 
 def configure_subparsers(subparsers):
@@ -39,46 +35,37 @@ pubmed).''',
         required=True,
         help='Wikimedia project.',
     )
+    parser.add_argument(
+        '--identifier-types',
+        metavar='TYPES',
+        type=extractors.identifiers.parse_types,
+        required=False,
+        default=None,
+        help='Extract only these identifiers, comma separated, from: {} '
+             '[default: all].'.format(
+                 ', '.join(extractors.identifiers.TYPES)),
+    )
+    parser.add_argument(
+        '--collapse-reverts',
+        action='store_true',
+        help='Leave out the revisions undone by an identity revert (a '
+             'revision with the same text of one of the last {} '
+             'revisions).'.format(reverts.DEFAULT_RADIUS),
+    )
     parser.set_defaults(func=main)
 
 
-def identifiers_in_revision(mw_revision):
-    utils.dot()
-    text = utils.remove_comments(mw_revision.text or '')
+def identifiers_in_revision(text, pub_identifiers=None):
+    if pub_identifiers is None:
+        pub_identifiers = extractors.pub_identifiers
+    text = utils.remove_comments(text)
     identifiers = [
-        # extractors.common.Identifier(sys.intern(identifier.type), sys.intern(identifier.id))
         identifier
-        for identifier, _ in extractors.pub_identifiers(text)
+        for identifier, _ in pub_identifiers(text)
     ]
     return identifiers
 
 
-def revisions_topology(revisions):
-    topology = networkx.DiGraph()
-    for revision in revisions:
-        timestamp = datetime.datetime.fromtimestamp(
-            revision.timestamp.unix(),
-            datetime.timezone.utc,
-        )
-        # if timestamp < datetime.datetime(2007,12,1, tzinfo=datetime.timezone.utc):
-        #     continue
-        # Much RAM is used. Maybe use some mechanism of string intern?
-        topology.add_node(
-            revision.id,
-            timestamp=timestamp,
-            # identifiers=identifiers_in_revision(revision),
-        )
-        topology.add_edge(revision.parent_id, revision.id)
-
-    return topology
-
-    # history_by_topological_sort = [
-    #     (revision_id, topology.node[revision_id]['timestamp'],  topology.node[revision_id]['identifiers'])
-    #     for revision_id in networkx.topological_sort(topology)
-    #     if revision_id is not None
-    # ]
-
-
 def main(dump: mwxml.Dump,
          features_output_h,
          stats_output_h,
@@ -87,6 +74,23 @@ def main(dump: mwxml.Dump,
     print(args)
 
     writer = csv.writer(features_output_h)
+    revision_budget = budget.from_args(args)
+    # the revisions keep the sorted ids of their identifiers, that are
+    # interned once per run
+    identifier_table = utils.InternTable()
+
+    def write_intervals(mw_page, intervals):
+        for identifier_id, start, end in intervals:
+            identifier = identifier_table[identifier_id]
+            writer.writerow((
+                args.project,
+                mw_page.id,
+                mw_page.title,
+                identifier.type,
+                identifier.id,
+                start,
+                end,
+            ))
 
     for mw_page in dump:
         utils.log('Analyzing ', mw_page.title)
@@ -95,65 +99,52 @@ def main(dump: mwxml.Dump,
             utils.log('Skipped (namespace != 0)')
             continue
 
-        revisions = more_itertools.peekable(mw_page)
-
-        history = [
-            Revision(
-                revision.id,
-                revision.timestamp,
-                identifiers_in_revision(revision),
-            )
-            for revision in revisions
-        ]
-
-        history.sort(key=lambda r: (r.timestamp, r.id))
-
-        first_rev = history[0]
-        history_with_empty_first = itertools.chain(
-            [Revision(first_rev.id, first_rev.timestamp, [])],
-            history,
+        # the identifiers of the sections that did not change are reused
+        pub_identifiers = extractors.incremental.IncrementalExtractor(
+            functools.partial(extractors.identifiers.extract_chunk,
+                              types=args.identifier_types),
         )
-
-        diff_history = [
-            (r2.id, r2.timestamp, utils.diff(r1.identifiers, r2.identifiers))
-            for r1, r2 in utils.pairwise(history_with_empty_first)
-        ]
-
-        page_history = [
-            PageHistoryElem(identifier, revision_id, timestamp, action)
-            for revision_id, timestamp, diffs in diff_history
-            for action, identifier in diffs
-        ]
-
-        page_history.sort(
-            key=lambda r: (r.identifier, r.timestamp, r.revision_id)
-        )
-
-        lastvalue = PageHistoryElem(
-            identifier=None,
-            timestamp=None,
-            revision_id=None,
-            action='removed',
+        revision_cache = cache.RevisionCache(args.revision_cache_size)
+
+        def analyzed_revisions():
+            for revision in mw_page:
+                utils.dot()
+                identifiers = revision_budget.run(
+                    revision,
+                    lambda text: revision_cache.get(
+                        revision,
+                        lambda: identifier_table.array(
+                            identifiers_in_revision(text, pub_identifiers)),
+                    ),
+                )
+                if identifiers is None:
+                    # over budget
+                    continue
+                yield (cache.revision_sha1(revision), revision.id,
+                       revision.timestamp, identifiers)
+
+        # the intervals need the revisions in order of time, the order of
+        # the dump is not always: the sort is linear when it is
+        analyzed = spill.sorted_spilled(
+            analyzed_revisions(),
+            key=lambda revision: (revision[2], revision[1]),
+            buffer_size=args.sort_buffer_size,
         )
+        if args.collapse_reverts:
+            # the revisions wait to know whether they are reverted
+            analyzed = (
+                revision
+                for revision, _, reverted in reverts.delayed(
+                    analyzed, key=lambda revision: revision[:2])
+                if not reverted
+            )
 
-        page_history_by_identifier = itertools.groupby(
-            page_history,
-            key=lambda r: (r.identifier),
-        )
+        # only the identifiers of the last revision are kept, with the
+        # timestamp of the revision that added them
+        intervals = utils.LiveIntervals()
+        for _, _, timestamp, identifiers in analyzed:
+            write_intervals(mw_page, intervals.add(timestamp, identifiers))
 
-        for identifier, actions in page_history_by_identifier:
-            for r1, r2 in utils.grouper(actions, 2, fillvalue=lastvalue):
-                assert r1.action != r2.action
-                assert r2.timestamp is None or r1.timestamp <= r2.timestamp
-
-                writer.writerow((
-                    args.project,
-                    mw_page.id,
-                    mw_page.title,
-                    identifier.type,
-                    identifier.id,
-                    r1.timestamp,
-                    r2.timestamp,
-                ))
+        write_intervals(mw_page, intervals.close())
 
     features_output_h.close()
@@ -14,7 +14,7 @@ import more_itertools
 import mwxml
 from typing import Iterable, Iterator, Mapping, NamedTuple, Optional
 
-from .. import dumper, extractors, languages, utils
+from .. import budget, dumper, extractors, languages, spill, utils
 
 stats_template = '''
 <stats>
@@ -23,6 +23,9 @@ stats_template = '''
         <end_time>${stats['performance']['end_time'] | x}</end_time>
         <revisions_analyzed>${stats['performance']['revisions_analyzed'] | x}</revisions_analyzed>
         <pages_analyzed>${stats['performance']['pages_analyzed'] | x}</pages_analyzed>
+        <revisions_filtered>${stats['performance']['revisions_filtered'] | x}</revisions_filtered>
+        <budget over_time="${stats['performance']['budget']['over_time'] | x}" over_size="${stats['performance']['budget']['over_size'] | x}" skipped="${stats['performance']['budget']['skipped'] | x}" truncated="${stats['performance']['budget']['truncated'] | x}" />
+        <spill pages="${stats['performance']['spill']['pages'] | x}" runs="${stats['performance']['spill']['runs'] | x}" />
     </performance>
 </stats>
 '''
@@ -37,7 +40,6 @@ Revision = NamedTuple('Revision', [
     ('model', str),
     ('format', str),
     ('timestamp', jsonable.Type),
-    ('text', str),
     ('redirects', Iterable[extractors.redirect.Redirect])
 ])
 
@@ -53,18 +55,35 @@ Page = NamedTuple('Page', [
 def extract_revisions(
         mw_page: mwxml.Page,
         language: str,
-        stats: Mapping) -> Iterator[Revision]:
-    """Extract the internall links (wikilinks) from the revisions."""
+        stats: Mapping,
+        revision_budget: Optional[budget.Budget]=None) -> Iterator[Revision]:
+    """Extract the redirects from the revisions.
+
+    The text of the revisions is not kept, so that sorting the revisions of a
+    page does not hold all their texts in memory.
+    """
+    if revision_budget is None:
+        revision_budget = budget.Budget()
+
+    def redirects_in_text(text):
+        # a redirect must be at the beginning of the text
+        return tuple(
+            redirect
+            for redirect, _
+            in extractors.redirect.redirects_in_prefix(
+                text,
+                language=language,
+            )
+        )
 
     revisions = more_itertools.peekable(mw_page)
     for mw_revision in revisions:
         utils.dot()
 
-        text = utils.remove_comments(mw_revision.text or '')
-
-        redirects = (redirect
-                     for redirect, _
-                     in extractors.redirect.redirects(text, language=language))
+        redirects = revision_budget.run(mw_revision, redirects_in_text)
+        if redirects is None:
+            # over budget
+            continue
 
         yield Revision(
             id=mw_revision.id,
@@ -75,7 +94,6 @@ def extract_revisions(
             model=mw_revision.model,
             format=mw_revision.format,
             timestamp=mw_revision.timestamp.to_json(),
-            text=text,
             redirects=redirects
         )
         stats['performance']['revisions_analyzed'] += 1
@@ -84,7 +102,8 @@ def extract_revisions(
 def extract_pages(
         dump: Iterable[mwxml.Page],
         language: str,
-        stats: Mapping) -> Iterator[Page]:
+        stats: Mapping,
+        revision_budget: Optional[budget.Budget]=None) -> Iterator[Page]:
     """Extract revisions from a page."""
     for mw_page in dump:
         utils.log("Processing", mw_page.title)
@@ -97,7 +116,8 @@ def extract_pages(
         revisions_generator = extract_revisions(
             mw_page,
             language=language,
-            stats=stats
+            stats=stats,
+            revision_budget=revision_budget,
         )
 
         yield Page(
@@ -136,6 +156,9 @@ def main(
             'end_time': None,
             'revisions_analyzed': 0,
             'pages_analyzed': 0,
+            'revisions_filtered': 0,
+            'budget': budget.BudgetStatsDict(),
+            'spill': spill.SpillStatsDict(),
         },
     }
     stats['performance']['start_time'] = datetime.datetime.utcnow()
@@ -146,6 +169,8 @@ def main(
         dump,
         language=args.language,
         stats=stats,
+        revision_budget=budget.from_args(
+            args, stats=stats['performance']['budget']),
     )
 
     writer.writerow((
@@ -163,7 +188,14 @@ def main(
         hasredirect_rev = None
         hasredirect_prevrev = None
 
-        for revision in sorted(mw_page.revisions, key=lambda r: r.timestamp):
+        # the revisions of the pages with a huge history are spilled to disk
+        sorted_revisions = spill.sorted_spilled(
+            mw_page.revisions,
+            key=lambda r: r.timestamp,
+            buffer_size=args.sort_buffer_size,
+            stats=stats['performance']['spill'],
+        )
+        for revision in sorted_revisions:
 
             revision_parent_id = revision.parent_id
             if revision.parent_id is None:
@@ -174,10 +206,9 @@ def main(
             else:
                 revision_minor = 0
 
-            redirect_list = [red for red in revision.redirects]
-            if len(redirect_list) > 0:
+            if len(revision.redirects) > 0:
                 # there is a redirect in this revision
-                for redirect in redirect_list:
+                for redirect in revision.redirects:
                     hasredirect_rev = True
 
                     redirect_target = redirect.target
@@ -218,6 +249,7 @@ def main(
             hasredirect_prevrev = hasredirect_rev
 
     stats['performance']['end_time'] = datetime.datetime.utcnow()
+    stats['performance']['revisions_filtered'] = dump.revisions_filtered
 
     with stats_output_h:
         dumper.render_template(
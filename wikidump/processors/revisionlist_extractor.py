@@ -3,19 +3,23 @@
 The output format is csv.
 """
 
+import array
 import csv
 import collections
 import datetime
 import functools
-import arrow
+import itertools
+import operator
 
 import fuzzywuzzy.process
 import jsonable
 import more_itertools
 import mwxml
-from typing import Iterable, Iterator, Mapping, NamedTuple, Optional
+import numpy
+from typing import (Iterable, Iterator, List, Mapping, NamedTuple, Optional,
+                    Tuple)
 
-from .. import dumper, extractors, languages, utils
+from .. import dumper, extractors, languages, spill, utils
 
 
 stats_template = '''
@@ -25,6 +29,8 @@ stats_template = '''
         <end_time>${stats['performance']['end_time'] | x}</end_time>
         <revisions_analyzed>${stats['performance']['revisions_analyzed'] | x}</revisions_analyzed>
         <pages_analyzed>${stats['performance']['pages_analyzed'] | x}</pages_analyzed>
+        <revisions_filtered>${stats['performance']['revisions_filtered'] | x}</revisions_filtered>
+        <spill pages="${stats['performance']['spill']['pages'] | x}" runs="${stats['performance']['spill']['runs'] | x}" />
     </performance>
 </stats>
 '''
@@ -56,6 +62,7 @@ Revision = NamedTuple('Revision', [
     ('model', str),
     ('format', str),
     ('timestamp', jsonable.Type),
+    ('unix_timestamp', int),
 ])
 
 
@@ -100,7 +107,8 @@ def extract_revisions(
             comment=mw_revision.comment,
             model=mw_revision.model,
             format=mw_revision.format,
-            timestamp=mw_revision.timestamp.to_json()
+            timestamp=mw_revision.timestamp.to_json(),
+            unix_timestamp=mw_revision.timestamp.unix(),
         )
         stats['performance']['revisions_analyzed'] += 1
 
@@ -135,6 +143,137 @@ def extract_pages(
         stats['performance']['pages_analyzed'] += 1
 
 
+def user_fields(user: Optional[mwxml.Revision.User]) -> Tuple[str, str, int]:
+    """Return the type, the username and the id of the user."""
+    if user is None:
+        return 'None', 'None', -2
+    if user.id is not None:
+        return 'registered', user.text, user.id
+    return 'ip', user.text, -1
+
+
+def revision_row(page: Page, revision: Revision) -> List:
+    """Return the csv row of the revision (see `csv_output_fields`)."""
+    user_type, user_username, user_id = user_fields(revision.user)
+    return [page.id,
+            page.title,
+            revision.id,
+            revision.parent_id,
+            revision.timestamp,
+            user_type,
+            user_username,
+            user_id,
+            1 if revision.minor else 0,
+            revision.nbytes,
+            ]
+
+
+class RevisionColumns:
+    """The revisions of a page, by columns.
+
+    The numbers (ids, timestamps in seconds since the epoch, bytes, ...) are
+    kept in arrays of int64, the strings in lists (they are the strings of
+    the revisions, they are not copied). The revisions are sorted only if
+    they were not added in order of time, as they almost always are.
+    """
+    __slots__ = ('ids', 'parent_ids', 'unix_timestamps', 'timestamps',
+                 'user_types', 'user_usernames', 'user_ids', 'minors',
+                 'nbytes', 'is_sorted')
+
+    # the parent id of the first revision is None
+    NO_PARENT = -1
+
+    def __init__(self):
+        """Instantiate empty columns."""
+        self.ids = array.array('q')
+        self.parent_ids = array.array('q')
+        self.unix_timestamps = array.array('q')
+        self.timestamps = []
+        self.user_types = []
+        self.user_usernames = []
+        self.user_ids = array.array('q')
+        self.minors = array.array('q')
+        self.nbytes = array.array('q')
+        self.is_sorted = True
+
+    def __len__(self) -> int:
+        """Return the number of revisions."""
+        return len(self.ids)
+
+    def append(self, revision: Revision) -> None:
+        """Add a revision."""
+        if self.unix_timestamps and \
+                revision.unix_timestamp < self.unix_timestamps[-1]:
+            self.is_sorted = False
+
+        user_type, user_username, user_id = user_fields(revision.user)
+        self.ids.append(revision.id)
+        self.parent_ids.append(revision.parent_id
+                               if revision.parent_id is not None
+                               else self.NO_PARENT)
+        self.unix_timestamps.append(revision.unix_timestamp)
+        self.timestamps.append(revision.timestamp)
+        self.user_types.append(user_type)
+        self.user_usernames.append(user_username)
+        self.user_ids.append(user_id)
+        self.minors.append(1 if revision.minor else 0)
+        self.nbytes.append(revision.nbytes)
+
+    def rows(self, page: Page, change_bytes: bool=False) -> Iterator[Tuple]:
+        """Return the csv rows of the revisions, sorted by time.
+
+        With change_bytes each row ends with the difference in bytes from the
+        previous revision (see `csv_output_fields_with_change`).
+        """
+        order = None
+        if not self.is_sorted:
+            # revisions with the same timestamp keep their order
+            order = numpy.argsort(
+                numpy.frombuffer(self.unix_timestamps, dtype=numpy.int64),
+                kind='stable',
+            )
+
+        def column(values):
+            values = numpy.frombuffer(values, dtype=numpy.int64)
+            if order is not None:
+                values = values[order]
+            return values
+
+        def sorted_list(values):
+            if order is None:
+                return values
+            return [values[index] for index in order.tolist()]
+
+        parent_ids = [parent_id if parent_id != self.NO_PARENT else None
+                      for parent_id in column(self.parent_ids).tolist()]
+        columns = [
+            itertools.repeat(page.id),
+            itertools.repeat(page.title),
+            column(self.ids).tolist(),
+            parent_ids,
+            sorted_list(self.timestamps),
+            sorted_list(self.user_types),
+            sorted_list(self.user_usernames),
+            column(self.user_ids).tolist(),
+            column(self.minors).tolist(),
+        ]
+        nbytes = column(self.nbytes)
+        columns.append(nbytes.tolist())
+        if change_bytes:
+            columns.append(numpy.diff(nbytes, prepend=0).tolist())
+
+        return zip(*columns)
+
+
+def with_change_bytes(rows: Iterable[Tuple]) -> Iterator[Tuple]:
+    """Add the difference in bytes from the previous row to the rows."""
+    prev_nbytes = 0
+    for row in rows:
+        nbytes = row[9]
+        yield row + (nbytes - prev_nbytes,)
+        prev_nbytes = nbytes
+
+
 def configure_subparsers(subparsers):
     """Configure a new subparser."""
     parser = subparsers.add_parser(
@@ -178,6 +317,8 @@ def main(
             'end_time': None,
             'revisions_analyzed': 0,
             'pages_analyzed': 0,
+            'revisions_filtered': 0,
+            'spill': spill.SpillStatsDict(),
         },
     }
     stats['performance']['start_time'] = datetime.datetime.utcnow()
@@ -202,81 +343,31 @@ def main(
         writer.writerow(csv_output_fields)
 
     for mw_page in pages_generator:
-        page_revision_list = []
-
-        for revision in mw_page.revisions:
-
-            if revision.user is None:
-                user_type = 'None'
-                user_username = 'None'
-                user_id = -2
-            else:
-                if revision.user.id is not None:
-                    user_type = 'registered'
-                    user_username = revision.user.text
-                    user_id = revision.user.id
-                else:
-                    user_type = 'ip'
-                    user_username = revision.user.text
-                    user_id = -1
-
-            revision_parent_id = revision.parent_id
-            if revision.parent_id is None:
-                revision_parent_id = -1
-
-            if revision.minor:
-                revision_minor = 1
-            else:
-                revision_minor = 0
-
-            revout = [mw_page.id,
-                      mw_page.title,
-                      revision.id,
-                      revision.parent_id,
-                      revision.timestamp,
-                      user_type,
-                      user_username,
-                      user_id,
-                      revision_minor,
-                      revision.nbytes
-                      ]
-
-            # change_bytes is redundant with respect to ensure_sorted, but we
-            # repeat it here for clarity
-            if args.ensure_sorted or args.change_bytes:
-                page_revision_list.append(revout)
-            else:
-                writer.writerow(revout)
-
-        if page_revision_list:
-
-            # revout:
-            #   - 0: mw_page.id,
-            #   - 1: mw_page.title,
-            #   - 2: revision.id,
-            #   - 3: revision.parent_id,
-            #   - 4: revision.timestamp,
-            #   - 5: user_type,
-            #   - 6: user_username,
-            #   - 7: user_id,
-            #   - 8: revision_minor,
-            #   - 9: bytes
-            page_revision_list.sort(key=lambda revout: arrow.get(revout[4]))
-            prev_nbites = None
-            for revout in page_revision_list:
+        if args.ensure_sorted:
+            # the revisions of the pages with a huge history are spilled to
+            # disk, the ISO 8601 timestamps sort as the time
+            runs = spill.SortedRuns(key=operator.itemgetter(4),
+                                    stats=stats['performance']['spill'])
+            columns = RevisionColumns()
+            for revision in mw_page.revisions:
+                columns.append(revision)
+                if len(columns) == args.sort_buffer_size:
+                    runs.spill(columns.rows(mw_page))
+                    columns = RevisionColumns()
+
+            if runs:
+                rows = runs.merge(columns.rows(mw_page))
                 if args.change_bytes:
-                    nbytes = revout[9]
-                    if prev_nbites is None:
-                        change = nbytes
-                    else:
-                        change = nbytes - prev_nbites
-
-                    writer.writerow(revout + [change])
-                    prev_nbites = nbytes
-                else:
-                    writer.writerow(revout)
+                    rows = with_change_bytes(rows)
+            else:
+                rows = columns.rows(mw_page, change_bytes=args.change_bytes)
+            writer.writerows(rows)
+        else:
+            for revision in mw_page.revisions:
+                writer.writerow(revision_row(mw_page, revision))
 
     stats['performance']['end_time'] = datetime.datetime.utcnow()
+    stats['performance']['revisions_filtered'] = dump.revisions_filtered
 
     with stats_output_h:
         dumper.render_template(
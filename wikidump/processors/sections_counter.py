@@ -4,9 +4,9 @@ import datetime
 
 import more_itertools
 import mwxml
-from typing import Mapping
+from typing import List, Mapping, Optional
 
-from .. import dumper, extractors, utils
+from .. import budget, cache, dumper, extractors, utils
 
 
 stats_template = '''
@@ -16,12 +16,19 @@ stats_template = '''
         <end_time>${stats['performance']['end_time']}</end_time>
         <revisions_analyzed>${stats['performance']['revisions_analyzed']}</revisions_analyzed>
         <pages_analyzed>${stats['performance']['pages_analyzed']}</pages_analyzed>
+        <revisions_filtered>${stats['performance']['revisions_filtered']}</revisions_filtered>
+        <cache hits="${stats['performance']['cache']['hits']}" misses="${stats['performance']['cache']['misses']}" />
+        <budget over_time="${stats['performance']['budget']['over_time']}" over_size="${stats['performance']['budget']['over_size']}" skipped="${stats['performance']['budget']['skipped']}" truncated="${stats['performance']['budget']['truncated']}" />
     </performance>
     <section-names-per-revision>
         % for key in ['global', 'last_revision']:
         <${key}>
             % for section_name, count in stats['section_names_per_revision'][key].most_common():
+            % if stats['top_k']:
+            <section name="${section_name | x}" count="${count}" error="${stats['section_names_per_revision'][key].error(section_name)}" />
+            % else:
             <section name="${section_name | x}" count="${count}" />
+            % endif
             % endfor
         </${key}>
         % endfor
@@ -43,12 +50,28 @@ stats_template = '''
 '''
 
 
+def section_names_in_revision(text: str) -> List[str]:
+    """Return the normalized names of the sections of the revision."""
+    text = utils.remove_comments(text)
+
+    return [section.name.strip().lower()
+            for section, _ in extractors.sections(text)]
+
+
 def analyze_revisions(
         page: mwxml.Page,
         stats: Mapping,
-        only_last_revision: bool) -> None:
+        only_last_revision: bool,
+        revision_cache_size: int=cache.DEFAULT_SIZE,
+        revision_budget: Optional[budget.Budget]=None) -> None:
     """Analyze revisions."""
+    if revision_budget is None:
+        revision_budget = budget.Budget()
     revisions = more_itertools.peekable(page)
+    revision_cache = cache.RevisionCache(
+        revision_cache_size,
+        stats=stats['performance']['cache'],
+    )
 
     section_names_stats = stats['section_names_per_revision']
     sections_stats = stats['sections_per_revision']
@@ -60,16 +83,21 @@ def analyze_revisions(
         if only_last_revision and not is_last_revision:
             continue
 
-        text = utils.remove_comments(mw_revision.text or '')
-
-        section_names = [section.name.strip().lower()
-                         for section, _ in extractors.sections(text)]
+        section_names = revision_budget.run(
+            mw_revision,
+            lambda text: revision_cache.get(
+                mw_revision,
+                lambda: section_names_in_revision(text),
+            ),
+        )
+        if section_names is None:
+            # over budget
+            continue
         sections_count = len(section_names)
 
-        for section_name in section_names:
-            section_names_stats['global'][section_name] += 1
-            if is_last_revision:
-                section_names_stats['last_revision'][section_name] += 1
+        section_names_stats['global'].update(section_names)
+        if is_last_revision:
+            section_names_stats['last_revision'].update(section_names)
 
         sections_stats['global'][sections_count] += 1
         if is_last_revision:
@@ -85,7 +113,9 @@ def analyze_revisions(
 def analyze_pages(
         dump: mwxml.Page,
         stats: Mapping,
-        only_last_revision: bool) -> None:
+        only_last_revision: bool,
+        revision_cache_size: int=cache.DEFAULT_SIZE,
+        revision_budget: Optional[budget.Budget]=None) -> None:
     """Analyze pages."""
     for mw_page in dump:
         utils.log("Processing", mw_page.title)
@@ -99,6 +129,8 @@ def analyze_pages(
             mw_page,
             stats=stats,
             only_last_revision=only_last_revision,
+            revision_cache_size=revision_cache_size,
+            revision_budget=revision_budget,
         )
 
         stats['performance']['pages_analyzed'] += 1
@@ -115,6 +147,13 @@ def configure_subparsers(subparsers) -> None:
         action='store_true',
         help='Consider only the last revision for each page.',
     )
+    parser.add_argument(
+        '--top-k',
+        metavar='N',
+        type=utils.parse_top_k,
+        default=0,
+        help=utils.TOP_K_HELP,
+    )
     parser.set_defaults(func=main)
 
 
@@ -130,15 +169,19 @@ def main(
             'last_revision': collections.Counter(),
         },
         'section_names_per_revision': {
-            'global': collections.Counter(),
-            'last_revision': collections.Counter(),
+            'global': utils.counter(args.top_k),
+            'last_revision': utils.counter(args.top_k),
         },
+        'top_k': args.top_k,
         'revisions': collections.Counter(),
         'performance': {
             'start_time': None,
             'end_time': None,
             'revisions_analyzed': 0,
             'pages_analyzed': 0,
+            'revisions_filtered': 0,
+            'cache': cache.CacheStatsDict(),
+            'budget': budget.BudgetStatsDict(),
         }
     }
     stats['performance']['start_time'] = datetime.datetime.utcnow()
@@ -146,8 +189,12 @@ def main(
         dump,
         stats=stats,
         only_last_revision=args.only_last_revision,
+        revision_cache_size=args.revision_cache_size,
+        revision_budget=budget.from_args(
+            args, stats=stats['performance']['budget']),
     )
     stats['performance']['end_time'] = datetime.datetime.utcnow()
+    stats['performance']['revisions_filtered'] = dump.revisions_filtered
 
     with stats_output_h:
         dumper.render_template(
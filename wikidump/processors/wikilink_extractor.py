@@ -14,16 +14,23 @@ import more_itertools
 import fuzzywuzzy.process
 from typing import Iterable, Iterator, Mapping, NamedTuple, Optional
 
-from .. import dumper, extractors, utils
+from .. import budget, cache, dumper, extractors, utils
 
 
 stats_template = '''
+<%!
+    from wikidump.extractors.incremental import speedup
+%>
 <stats>
     <performance>
         <start_time>${stats['performance']['start_time'] | x}</start_time>
         <end_time>${stats['performance']['end_time'] | x}</end_time>
         <revisions_analyzed>${stats['performance']['revisions_analyzed'] | x}</revisions_analyzed>
         <pages_analyzed>${stats['performance']['pages_analyzed'] | x}</pages_analyzed>
+        <revisions_filtered>${stats['performance']['revisions_filtered'] | x}</revisions_filtered>
+        <cache hits="${stats['performance']['cache']['hits'] | x}" misses="${stats['performance']['cache']['misses'] | x}" />
+        <budget over_time="${stats['performance']['budget']['over_time'] | x}" over_size="${stats['performance']['budget']['over_size'] | x}" skipped="${stats['performance']['budget']['skipped'] | x}" truncated="${stats['performance']['budget']['truncated'] | x}" />
+        <incremental chunks_reused="${stats['performance']['incremental']['chunks_reused']}" chunks_extracted="${stats['performance']['incremental']['chunks_extracted']}" chars_reused="${stats['performance']['incremental']['chars_reused']}" chars_extracted="${stats['performance']['incremental']['chars_extracted']}" speedup="${'%.2f' % speedup(stats['performance']['incremental'])}" />
     </performance>
 </stats>
 '''
@@ -39,7 +46,8 @@ Revision = NamedTuple('Revision', [
     ('format', str),
     ('timestamp', jsonable.Type),
     ('text', str),
-    ('wikilinks', Iterable[extractors.misc.Wikilink])
+    ('wikilinks', Iterable[extractors.common.CaptureResult[
+        extractors.misc.Wikilink]]),
 ])
 
 
@@ -55,8 +63,38 @@ def extract_revisions(
         mw_page: mwxml.Page,
         stats: Mapping,
         only_last_revision: bool,
-        debug: bool) -> Iterator[Revision]:
+        debug: bool,
+        revision_cache_size: int=cache.DEFAULT_SIZE,
+        revision_budget: Optional[budget.Budget]=None) -> Iterator[Revision]:
     """Extract the internall links (wikilinks) from the revisions."""
+    if revision_budget is None:
+        revision_budget = budget.Budget()
+
+    # the wikilinks of the sections that did not change are reused
+    raw_wikilinks = extractors.incremental.IncrementalExtractor(
+        functools.partial(extractors.misc.raw_wikilinks_chunk, mw_page.title),
+        stats=stats['performance']['incremental'],
+    )
+
+    def wikilinks_in_text(source):
+        """Return the wikilinks, with their spans in the source."""
+        text, offset_map = utils.strip_comments(source)
+        if '[[' not in text:
+            # no wikilinks, the sections are not needed
+            return []
+        return offset_map.original_captures(
+            extractors.wikilinks(
+                page_title=mw_page.title,
+                source=text,
+                sections=extractors.sections(text),
+                captures=None if debug else raw_wikilinks(text),
+            )
+        )
+
+    revision_cache = cache.RevisionCache(
+        revision_cache_size,
+        stats=stats['performance']['cache'],
+    )
 
     revisions = more_itertools.peekable(mw_page)
     for mw_revision in revisions:
@@ -66,17 +104,16 @@ def extract_revisions(
         if only_last_revision and not is_last_revision:
             continue
 
-        text = utils.remove_comments(mw_revision.text or '')
-
-        wikilinks = (wikilink
-                     for wikilink, _
-                     in extractors.wikilinks(
-                            page_title=mw_page.title,
-                            source=text,
-                            sections=extractors.sections(text),
-                            debug=debug,
-                            )
-                     )
+        wikilinks = revision_budget.run(
+            mw_revision,
+            lambda text: revision_cache.get(
+                mw_revision,
+                lambda: wikilinks_in_text(text),
+            ),
+        )
+        if wikilinks is None:
+            # over budget
+            continue
 
         yield Revision(
             id=mw_revision.id,
@@ -87,7 +124,7 @@ def extract_revisions(
             model=mw_revision.model,
             format=mw_revision.format,
             timestamp=mw_revision.timestamp.to_json(),
-            text=text,
+            text=mw_revision.text or '',
             wikilinks=wikilinks
         )
         stats['performance']['revisions_analyzed'] += 1
@@ -97,7 +134,9 @@ def extract_pages(
         dump: Iterable[mwxml.Page],
         stats: Mapping,
         only_last_revision: bool,
-        debug: bool) -> Iterator[Page]:
+        debug: bool,
+        revision_cache_size: int=cache.DEFAULT_SIZE,
+        revision_budget: Optional[budget.Budget]=None) -> Iterator[Page]:
     """Extract revisions from a page."""
     for mw_page in dump:
         utils.log("Processing", mw_page.title)
@@ -112,6 +151,8 @@ def extract_pages(
             stats=stats,
             only_last_revision=only_last_revision,
             debug=debug,
+            revision_cache_size=revision_cache_size,
+            revision_budget=revision_budget,
         )
 
         yield Page(
@@ -154,6 +195,10 @@ def main(
             'end_time': None,
             'revisions_analyzed': 0,
             'pages_analyzed': 0,
+            'revisions_filtered': 0,
+            'incremental': extractors.incremental.IncrementalStatsDict(),
+            'cache': cache.CacheStatsDict(),
+            'budget': budget.BudgetStatsDict(),
         },
         'section_names': {
             'global': collections.Counter(),
@@ -169,6 +214,9 @@ def main(
         stats=stats,
         only_last_revision=args.only_last_revision,
         debug=args.debug,
+        revision_cache_size=args.revision_cache_size,
+        revision_budget=budget.from_args(
+            args, stats=stats['performance']['budget']),
     )
 
     writer.writerow((
@@ -215,7 +263,7 @@ def main(
             else:
                 revision_minor = 0
 
-            for wikilink in revision.wikilinks:
+            for wikilink, _ in revision.wikilinks:
                 # project,page.id,page.title,revision.id,revision.parent_id,
                 # revision.timestamp,contributor_if_exists(revision.user),
                 # revision.minor,wikilink.link,wikilink.anchor,
@@ -240,6 +288,7 @@ def main(
                 ))
 
     stats['performance']['end_time'] = datetime.datetime.utcnow()
+    stats['performance']['revisions_filtered'] = dump.revisions_filtered
 
     with stats_output_h:
         dumper.render_template(
@@ -0,0 +1,281 @@
+"""Read XML dumps, filtering the revisions while they are parsed.
+
+The classes in this module extend the ones in `mwxml` so that revisions
+outside of a given time window are discarded as soon as their <timestamp> is
+read, before the rest of the <revision> element (most notably the <text>) is
+turned into a `mwxml.Revision`.
+
+Input files can also be verified against the checksums published with the
+dumps while they are decompressed, see `open_verified_file`.
+"""
+import hashlib
+import os
+import signal
+import subprocess
+import threading
+
+import arrow
+import mwxml
+import mwxml.errors
+from typing import IO, Mapping, Optional, Tuple
+
+# Format of the <timestamp> elements in the dumps, since it has fixed width
+# timestamps can be compared as strings.
+TIMESTAMP_FORMAT = 'YYYY-MM-DDTHH:mm:ss[Z]'
+
+
+def parse_timestamp(value: str) -> str:
+    """Parse a date from the command line into the format of the dumps."""
+    return arrow.get(value).to('UTC').format(TIMESTAMP_FORMAT)
+
+
+class OutOfWindow(Exception):
+    """Raised when a revision falls outside of the time window."""
+    pass
+
+
+class TimeWindow:
+    """Time window [since, until) on the revisions timestamps."""
+    def __init__(self, since: Optional[str]=None, until: Optional[str]=None):
+        """Instantiate a time window, bounds are in the format of the dumps."""
+        self.since = since
+        self.until = until
+        self.revisions_filtered = 0
+
+    @property
+    def is_unbounded(self) -> bool:
+        """Return True when the window does not filter anything."""
+        return self.since is None and self.until is None
+
+    def __contains__(self, timestamp: str) -> bool:
+        if self.since is not None and timestamp < self.since:
+            return False
+        if self.until is not None and timestamp >= self.until:
+            return False
+        return True
+
+
+class WindowedElement:
+    """Wrapper of a <revision> element checking the <timestamp>."""
+    def __init__(self, element, window: TimeWindow):
+        self.element = element
+        self.window = window
+
+    def __iter__(self):
+        for sub_element in self.element:
+            if sub_element.tag == 'timestamp' and \
+                    sub_element.text not in self.window:
+                raise OutOfWindow(sub_element.text)
+            yield sub_element
+
+    def __getattr__(self, attr):
+        return getattr(self.element, attr)
+
+
+class Page(mwxml.Page):
+    """Page whose revisions are filtered by `window`."""
+    window = TimeWindow()
+
+    @classmethod
+    def load_revisions(cls, first_revision, element):
+        if cls.window.is_unbounded:
+            yield from super().load_revisions(first_revision, element)
+            return
+
+        if first_revision is not None:
+            yield from cls.load_revision(first_revision)
+
+        for sub_element in element:
+            tag = sub_element.tag
+
+            if tag == 'revision':
+                yield from cls.load_revision(sub_element)
+            else:
+                raise mwxml.errors.MalformedXML(
+                    'Expected to see <revision>.  '
+                    'Instead saw <{0}>'.format(tag))
+
+    @classmethod
+    def load_revision(cls, element):
+        """Yield the revision in element if it is inside the window."""
+        try:
+            yield mwxml.Revision.from_element(
+                WindowedElement(element, cls.window))
+        except OutOfWindow:
+            # skip the rest of the <revision> element, <text> included
+            element.complete()
+            cls.window.revisions_filtered += 1
+
+
+class Dump(mwxml.Dump):
+    """Dump whose revisions are filtered by `window`."""
+    page_class = Page
+
+    @property
+    def window(self) -> TimeWindow:
+        return self.page_class.window
+
+    @property
+    def revisions_filtered(self) -> int:
+        """Number of revisions discarded because outside the window."""
+        return self.window.revisions_filtered
+
+    @classmethod
+    def process_item(cls, item_element, namespace_map):
+        if item_element.tag == 'page':
+            return cls.page_class.from_element(item_element, namespace_map)
+        return super().process_item(item_element, namespace_map)
+
+
+def dump_from_file(
+        f: IO,
+        since: Optional[str]=None,
+        until: Optional[str]=None) -> Dump:
+    """Return a dump of the revisions with timestamp in [since, until)."""
+    window = TimeWindow(since=since, until=until)
+    page_class = type('Page', (Page,), {'window': window})
+    dump_class = type('Dump', (Dump,), {'page_class': page_class})
+    return dump_class.from_file(f)
+
+
+# Commands that decompress the data read from the standard input.
+DECOMPRESSORS = {
+    '.xml': ['cat'],
+    '.gz': ['zcat'],
+    '.bz2': ['bzcat'],
+    '.lzma': ['lzcat'],
+}
+
+# 7z archives can not be extracted from a pipe, 7z reads the file by itself.
+DECOMPRESSORS_FROM_PATH = {
+    '.7z': ['7z', 'e', '-so'],
+}
+
+CHUNK_SIZE = 2**20
+
+# Length of the hex digest -> name of the hashing algorithm
+DIGEST_ALGORITHMS = {
+    32: 'md5',
+    40: 'sha1',
+}
+
+
+def load_checksums(path: str) -> Mapping[str, str]:
+    """Read a {md5,sha1}sums file and return a map filename -> digest."""
+    checksums = dict()
+    with open(path, 'rt') as infile:
+        for line in infile:
+            line = line.strip()
+            if not line:
+                continue
+            digest, filename = line.split(maxsplit=1)
+            # md5sum marks binary files with an asterisk
+            checksums[filename.lstrip('*')] = digest.lower()
+    return checksums
+
+
+class ChecksumVerifier(threading.Thread):
+    """Thread that hashes a file while it is being decompressed.
+
+    When `sink` is given the bytes read from the file are written there (i.e.
+    to the standard input of the decompressor), so the file is read only once.
+    The decompressor `process`, if given, is waited for by `verify`.
+    """
+    def __init__(self,
+                 path: str,
+                 expected: str,
+                 sink: Optional[IO]=None,
+                 process: Optional[subprocess.Popen]=None):
+        """Instantiate the thread, the algorithm is inferred from expected."""
+        super().__init__(name='checksum-verifier', daemon=True)
+        try:
+            algorithm = DIGEST_ALGORITHMS[len(expected)]
+        except KeyError:
+            raise ValueError('Unknown checksum {!r}'.format(expected))
+        self.path = path
+        self.expected = expected
+        self.sink = sink
+        self.process = process
+        self.hash = hashlib.new(algorithm)
+        self.complete = False
+
+    @property
+    def algorithm(self) -> str:
+        return self.hash.name
+
+    def run(self):
+        try:
+            with open(self.path, 'rb') as infile:
+                for chunk in iter(lambda: infile.read(CHUNK_SIZE), b''):
+                    self.hash.update(chunk)
+                    if self.sink is not None:
+                        self.sink.write(chunk)
+            self.complete = True
+        except BrokenPipeError:
+            # the decompressor exited before reading the whole file
+            pass
+        finally:
+            if self.sink is not None:
+                try:
+                    self.sink.close()
+                except BrokenPipeError:
+                    pass
+
+    def verify(self) -> Tuple[bool, str]:
+        """Wait for the decompressor and the thread and return (ok, message).
+
+        The output of the decompressor is closed: if it was not read until
+        the end the decompressor exits, instead of blocking the thread.
+        """
+        returncode = 0
+        if self.process is not None:
+            self.process.stdout.close()
+            returncode = self.process.wait()
+        self.join()
+        # the decompressor killed by the closed output exits with SIGPIPE,
+        # the file was not read until the end
+        if returncode and returncode != -signal.SIGPIPE:
+            return False, '{} exited with status {} decompressing {}'.format(
+                self.process.args[0], returncode, self.path)
+        if not self.complete:
+            return False, '{} of {} not computed, the file was not read ' \
+                'until the end'.format(self.algorithm, self.path)
+
+        digest = self.hash.hexdigest()
+        if digest != self.expected:
+            return False, '{} mismatch for {}: expected {}, got {}'.format(
+                self.algorithm, self.path, self.expected, digest)
+
+        return True, '{} of {} verified'.format(self.algorithm, self.path)
+
+
+def open_verified_file(path: str, expected: str) \
+        -> Tuple[IO, ChecksumVerifier]:
+    """Open a compressed file, hashing it in a side thread.
+
+    Return the file-object with the decompressed data and the thread
+    computing the checksum of the compressed data, whose `verify` also waits
+    for the decompressor and checks its exit status.
+    """
+    _, ext = os.path.splitext(path)
+    if ext in DECOMPRESSORS:
+        process = subprocess.Popen(
+            DECOMPRESSORS[ext],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        verifier = ChecksumVerifier(path, expected, sink=process.stdin,
+                                    process=process)
+    elif ext in DECOMPRESSORS_FROM_PATH:
+        process = subprocess.Popen(
+            DECOMPRESSORS_FROM_PATH[ext] + [path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        verifier = ChecksumVerifier(path, expected, process=process)
+    else:
+        raise ValueError('File type {!r} is not supported.'.format(path))
+
+    verifier.start()
+    return process.stdout, verifier
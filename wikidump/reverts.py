@@ -0,0 +1,107 @@
+"""Detection of the identity reverts.
+
+A revision is an identity revert if its text is the same of one of the last
+revisions of the page: it restores that revision, and the revisions in
+between are reverted. Edit wars add and remove the same identifiers over and
+over, the diffs of the reverted revisions can be collapsed (see `delayed`).
+
+The texts are compared by their sha1 (see `cache.revision_sha1`), only the
+sha1 of the last `radius` revisions of the page are kept.
+"""
+import collections
+import itertools
+
+from typing import (Callable, Hashable, Iterable, Iterator, List, NamedTuple,
+                    Optional, Tuple, TypeVar)
+
+T = TypeVar('T')
+
+# the maximum number of revisions reverted at once, as in mwreverts
+DEFAULT_RADIUS = 15
+
+Revert = NamedTuple('Revert', [
+    ('reverting', Hashable),
+    ('restored', Hashable),
+    ('reverteds', List[Hashable]),
+])
+
+
+def RevertsStatsDict():
+    """Return new RevertsStatsDict."""
+    return {
+        'reverts': 0,
+        'reverted': 0,
+    }
+
+
+class Detector:
+    """Detect the identity reverts among the revisions of a page.
+
+    The revisions are processed in order, the dict of the sha1 holds at most
+    radius + 1 of them.
+    """
+    def __init__(self, radius: int=DEFAULT_RADIUS):
+        """Instantiate a detector of the reverts of at most radius revisions.
+        """
+        self.radius = radius
+        # (sha1, revision id) of the last revisions
+        self.window = collections.deque()
+        # sha1 -> (number, revision id) of its last revision in the window
+        self.last = {}
+        self.number = 0
+
+    def process(self, sha1: Hashable, revision_id: Hashable) \
+            -> Optional[Revert]:
+        """Process the next revision, return its revert if it is one."""
+        revert = None
+        last = self.last.get(sha1)
+        if last is not None:
+            number, restored = last
+            reverted_count = self.number - number - 1
+            # a revision with the text of the previous one reverts nothing
+            if reverted_count:
+                reverteds = [
+                    reverted_id for _, reverted_id in itertools.islice(
+                        self.window, len(self.window) - reverted_count, None)
+                ]
+                revert = Revert(revision_id, restored, reverteds)
+
+        self.last[sha1] = (self.number, revision_id)
+        self.window.append((sha1, revision_id))
+        if len(self.window) > self.radius + 1:
+            old_sha1, _ = self.window.popleft()
+            old_number, _ = self.last[old_sha1]
+            if old_number == self.number - self.radius - 1:
+                del self.last[old_sha1]
+        self.number += 1
+        return revert
+
+
+def delayed(items: Iterable[T],
+            key: Callable[[T], Tuple[Hashable, Hashable]],
+            radius: int=DEFAULT_RADIUS) \
+        -> Iterator[Tuple[T, Optional[Revert], bool]]:
+    """Yield the items with their revert and whether they are reverted.
+
+    key returns the sha1 and the id of the revision of an item. The items
+    are yielded radius items late: an item can only be reverted by the next
+    radius ones.
+    """
+    detector = Detector(radius)
+    # [item, revert, reverted]
+    pending = collections.deque()
+    for item in items:
+        sha1, revision_id = key(item)
+        revert = detector.process(sha1, revision_id)
+        if revert is not None:
+            reverted_count = len(revert.reverteds)
+            for entry in itertools.islice(
+                    pending, len(pending) - reverted_count, None):
+                entry[2] = True
+
+        pending.append([item, revert, False])
+        if len(pending) > radius:
+            yield tuple(pending.popleft())
+
+    while pending:
+        yield tuple(pending.popleft())
@@ -0,0 +1,128 @@
+"""Sorting of the revisions of a page in bounded memory.
+
+Some pages (e.g. "Wikipedia:Sandbox") have hundreds of thousands of
+revisions, sorting them in memory can take gigabytes. At most `buffer_size`
+items are kept in memory: past it the buffer is sorted and spilled to a
+temporary file (a run), compressed, and the runs are merged at the end.
+
+The temporary files are created in the default temporary directory (see
+`tempfile`, e.g. the TMPDIR environment variable).
+"""
+import gzip
+import heapq
+import itertools
+import pickle
+import tempfile
+
+from typing import (Any, Callable, Iterable, Iterator, Mapping, Optional,
+                    TypeVar)
+
+T = TypeVar('T')
+
+DEFAULT_BUFFER_SIZE = 100000
+
+# the items are pickled in batches, one by one they take too long
+BATCH_SIZE = 1000
+# the runs are read once, fast compression is enough
+COMPRESS_LEVEL = 1
+
+
+def SpillStatsDict():
+    """Return new SpillStatsDict."""
+    return {
+        'pages': 0,
+        'runs': 0,
+    }
+
+
+class SortedRuns:
+    """Sorted runs of items in compressed temporary files.
+
+    The runs are merged with `merge`, that removes them.
+    """
+    def __init__(self,
+                 key: Optional[Callable[[T], Any]]=None,
+                 stats: Optional[Mapping]=None):
+        """Instantiate empty runs sorted by key, they are counted in stats."""
+        self.key = key
+        self.stats = stats if stats is not None else SpillStatsDict()
+        self.files = []
+
+    def __len__(self) -> int:
+        """Return the number of runs."""
+        return len(self.files)
+
+    def spill(self, items: Iterable[T]) -> None:
+        """Write the items, already sorted, to a new run."""
+        if not self.files:
+            self.stats['pages'] += 1
+        self.stats['runs'] += 1
+
+        run_file = tempfile.TemporaryFile()
+        self.files.append(run_file)
+        with gzip.GzipFile(fileobj=run_file, mode='wb',
+                           compresslevel=COMPRESS_LEVEL) as compressed:
+            items = iter(items)
+            batch = list(itertools.islice(items, BATCH_SIZE))
+            while batch:
+                pickle.dump(batch, compressed,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+                batch = list(itertools.islice(items, BATCH_SIZE))
+
+    @staticmethod
+    def read(run_file) -> Iterator[T]:
+        """Yield the items of a run."""
+        run_file.seek(0)
+        with gzip.GzipFile(fileobj=run_file, mode='rb') as compressed:
+            while True:
+                try:
+                    batch = pickle.load(compressed)
+                except EOFError:
+                    break
+                yield from batch
+
+    def merge(self, items: Iterable[T]=()) -> Iterator[T]:
+        """Yield the items of the runs and the (sorted) items, in order.
+
+        The order is stable: equal items are yielded in the order of the
+        runs, the items last. The runs are then removed.
+        """
+        try:
+            if not self.files:
+                yield from items
+            else:
+                yield from heapq.merge(
+                    *[self.read(run_file) for run_file in self.files],
+                    items,
+                    key=self.key,
+                )
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Remove the runs."""
+        for run_file in self.files:
+            run_file.close()
+        self.files = []
+
+
+def sorted_spilled(items: Iterable[T],
+                   key: Optional[Callable[[T], Any]]=None,
+                   buffer_size: int=DEFAULT_BUFFER_SIZE,
+                   stats: Optional[Mapping]=None) -> Iterator[T]:
+    """Yield the items sorted by key, as `sorted`.
+
+    At most buffer_size items are kept in memory, the others are spilled to
+    sorted runs (see `SortedRuns`), a buffer_size of 0 disables the limit.
+    """
+    runs = SortedRuns(key=key, stats=stats)
+    buffer = []
+    for item in items:
+        buffer.append(item)
+        if buffer_size and len(buffer) >= buffer_size:
+            buffer.sort(key=key)
+            runs.spill(buffer)
+            buffer = []
+
+    buffer.sort(key=key)
+    yield from runs.merge(buffer)
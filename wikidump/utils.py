@@ -1,18 +1,21 @@
 """Various utilities."""
 
+import bisect
+import collections
 import functools
+import heapq
 import itertools
 import sys
 
 import more_itertools
-import regex as re
-from typing import (Generic, Iterable, List, NamedTuple, Optional, T, Tuple,
-                    TypeVar)
+import numpy
+from typing import (Any, Generic, Hashable, Iterable, Iterator, List,
+                    NamedTuple, Optional, T, Tuple, TypeVar, Union)
 
 
 class Diff(NamedTuple("Diff", [("action", str), ("data", T)]), Generic[T]):
     """Class representing diff between two iterables."""
-    pass
+    __slots__ = ()
 
 
 T = TypeVar('T')
@@ -32,6 +35,202 @@ def diff(previous: Iterable[T], current: Iterable[T]) -> List[Diff[T]]:
     return diffs
 
 
+# the ids of InternTable, in sorted arrays without duplicates
+ID_DTYPE = numpy.uint32
+EMPTY_IDS = numpy.empty(0, dtype=ID_DTYPE)
+EMPTY_IDS.flags.writeable = False
+
+
+class InternTable:
+    """Map hashable items (e.g. identifiers) to consecutive ints, and back.
+
+    The sets of items of the revisions are kept as sorted arrays of ints
+    (see `array`), that take much less memory than sets or lists of tuples
+    of strings and are diffed without hashing (see `sorted_diff`).
+    """
+    def __init__(self):
+        """Instantiate an empty table."""
+        self.ids = {}
+        self.items = []
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __getitem__(self, id_: int) -> Hashable:
+        """Return the item with the id."""
+        return self.items[id_]
+
+    def intern(self, item: Hashable) -> int:
+        """Return the id of the item, adding it to the table if needed."""
+        try:
+            return self.ids[item]
+        except KeyError:
+            id_ = self.ids[item] = len(self.items)
+            self.items.append(item)
+            return id_
+
+    def array(self, items: Iterable[Hashable]) -> numpy.ndarray:
+        """Return the sorted array of the ids of the items, without
+        duplicates."""
+        ids = numpy.fromiter(map(self.intern, items), dtype=ID_DTYPE)
+        if not ids.size:
+            return EMPTY_IDS
+        return numpy.unique(ids)
+
+
+def sorted_diff(previous: numpy.ndarray, current: numpy.ndarray) \
+        -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """Return the ids added and removed, given two arrays of `InternTable`.
+
+    The arrays must be sorted and without duplicates, as the ones returned
+    by `InternTable.array`.
+    """
+    if previous is current or numpy.array_equal(previous, current):
+        # most revisions do not change the items
+        return EMPTY_IDS, EMPTY_IDS
+    return (numpy.setdiff1d(current, previous, assume_unique=True),
+            numpy.setdiff1d(previous, current, assume_unique=True))
+
+
+def diff_ids(previous: numpy.ndarray,
+             current: numpy.ndarray,
+             table: InternTable) -> List[Diff]:
+    """Return the diff of two arrays of ids of table, see `diff`."""
+    added, removed = sorted_diff(previous, current)
+    return (
+        [Diff('added', table[id_]) for id_ in added.tolist()]
+        + [Diff('removed', table[id_]) for id_ in removed.tolist()]
+    )
+
+
+Interval = NamedTuple('Interval', [
+    ('id', int),
+    ('start', Any),
+    ('end', Any),
+])
+
+
+class LiveIntervals:
+    """The intervals of time in which the ids are in a sequence of arrays.
+
+    The arrays of ids (e.g. the identifiers of the revisions of a page, see
+    `InternTable.array`) are added in order of time. Only the last array and
+    the start of the interval of each of its ids are kept: the intervals are
+    returned as soon as they are closed.
+    """
+    def __init__(self):
+        """Instantiate an empty sequence."""
+        self.ids = EMPTY_IDS
+        self.starts = {}
+
+    def __len__(self) -> int:
+        """Return the number of open intervals."""
+        return len(self.starts)
+
+    def add(self, time: Any, ids: numpy.ndarray) -> List[Interval]:
+        """Add the ids at time, return the intervals closed by them."""
+        added, removed = sorted_diff(self.ids, ids)
+        closed = [Interval(id_, self.starts.pop(id_), time)
+                  for id_ in removed.tolist()]
+        for id_ in added.tolist():
+            self.starts[id_] = time
+        self.ids = ids
+        return closed
+
+    def close(self) -> List[Interval]:
+        """Return the open intervals (their end is None) and reset them."""
+        open_intervals = [Interval(id_, self.starts[id_], None)
+                          for id_ in self.ids.tolist()]
+        self.ids = EMPTY_IDS
+        self.starts = {}
+        return open_intervals
+
+
+class SpaceSaving:
+    """The k most common keys of a stream, counted in bounded memory.
+
+    This is the Space-Saving algorithm (Metwally, Agrawal and El Abbadi,
+    2005): at most `size` keys are counted, a new key takes the place of the
+    key with the minimum count and starts from its count. The counts are
+    then overestimated, at most by their `error` (that is at most the total
+    count divided by size), and every key with a count over total / size is
+    counted. Like `collections.Counter`, keys are counted with `update` and
+    returned by `most_common`.
+    """
+    # the keys counted for each key returned, the more the smaller the errors
+    SIZE_FACTOR = 10
+
+    def __init__(self, k: int, size: Optional[int]=None):
+        """Instantiate an empty counter of the k most common keys."""
+        self.k = k
+        self.size = size if size is not None else k * self.SIZE_FACTOR
+        self.total = 0
+        # key -> [count, error]
+        self.counts = {}
+        # (count, key) of each key counted, the counts are updated lazily
+        self.heap = []
+
+    def __len__(self) -> int:
+        """Return the number of keys counted."""
+        return len(self.counts)
+
+    def update(self, keys: Iterable[Hashable]) -> None:
+        """Count the keys."""
+        counts = self.counts
+        heap = self.heap
+        for key in keys:
+            self.total += 1
+            entry = counts.get(key)
+            if entry is not None:
+                entry[0] += 1
+            elif len(counts) < self.size:
+                counts[key] = [1, 0]
+                heapq.heappush(heap, (1, key))
+            else:
+                # the minimum of the heap can be stale
+                min_count, min_key = heap[0]
+                while counts[min_key][0] != min_count:
+                    heapq.heapreplace(heap, (counts[min_key][0], min_key))
+                    min_count, min_key = heap[0]
+                del counts[min_key]
+                counts[key] = [min_count + 1, min_count]
+                heapq.heapreplace(heap, (min_count + 1, key))
+
+    def error(self, key: Hashable) -> int:
+        """Return the maximum overestimation of the count of the key."""
+        return self.counts[key][1]
+
+    def most_common(self, n: Optional[int]=None) -> List[Tuple[Hashable, int]]:
+        """Return the n (k by default) most common keys and their counts."""
+        if n is None:
+            n = self.k
+        return [(key, count) for key, (count, _) in heapq.nlargest(
+            n, self.counts.items(), key=lambda item: item[1][0])]
+
+
+TOP_K_HELP = (
+    'Report only the N most common section names, counted in bounded '
+    'memory: each count exceeds the exact one by at most the reported '
+    'error [default: all the names].'
+)
+
+
+def parse_top_k(value: str) -> int:
+    """Parse the number of keys of `counter`, 0 for all of them."""
+    top_k = int(value)
+    if top_k < 0:
+        raise ValueError('The number of keys must not be negative: {}.'
+                         .format(value))
+    return top_k
+
+
+def counter(top_k: int=0) -> Union[collections.Counter, SpaceSaving]:
+    """Return a Counter, or a SpaceSaving of the top_k keys if top_k."""
+    if top_k:
+        return SpaceSaving(top_k)
+    return collections.Counter()
+
+
 # https://github.com/shazow/unstdlib.py/blob/master/unstdlib/standard/list_.py#L149
 def listify(fn=None, wrapper=list):
     """
@@ -93,10 +292,120 @@ def log(*args):
     print('\n' + str(first), *rest, end='', file=sys.stderr, flush=True)
 
 
+COMMENT_START = '<!--'
+COMMENT_END = '-->'
+
+
+def comment_spans(source: str) -> Iterator[Tuple[int, int]]:
+    """Yield the begin and the end of the html comments of a string.
+
+    A comment ends at the first '-->' after its '<!--', the comments are
+    found in linear time: an unclosed comment is not removed, and no
+    comment can be closed after it.
+    """
+    pos = source.find(COMMENT_START)
+    while pos != -1:
+        end = source.find(COMMENT_END, pos + len(COMMENT_START))
+        if end == -1:
+            return
+        end += len(COMMENT_END)
+        yield pos, end
+        pos = source.find(COMMENT_START, end)
+
+
 def remove_comments(source: str) -> str:
-    """Remove all the html comments from a string."""
-    pattern = re.compile(r'<!--(.*?)-->', re.MULTILINE | re.DOTALL)
-    return pattern.sub('', source)
+    """Remove all the html comments from a string.
+
+    The string itself is returned if it does not contain any comment.
+    """
+    if COMMENT_START not in source:
+        return source
+    pieces = []
+    last_end = 0
+    for begin, end in comment_spans(source):
+        pieces.append(source[last_end:begin])
+        last_end = end
+    if not last_end:
+        return source
+    pieces.append(source[last_end:])
+    return ''.join(pieces)
+
+
+class OffsetMap:
+    """Map the offsets in a text without comments to the original text.
+
+    For each removed comment the map stores where it was in the stripped text
+    and how many chars have been removed up to it, included.
+    """
+    def __init__(self, positions: List[int]=(), removed: List[int]=()):
+        """Instantiate a map, positions must be sorted."""
+        self.positions = list(positions)
+        self.removed = list(removed)
+
+    def __bool__(self) -> bool:
+        """Return False if the map is the identity."""
+        return bool(self.positions)
+
+    def original(self, offset: int) -> int:
+        """Return the offset in the original text of the char at offset."""
+        # the comments removed at offset come before the char at offset
+        index = bisect.bisect_right(self.positions, offset)
+        if not index:
+            return offset
+        return offset + self.removed[index - 1]
+
+    def original_span(self, span: Tuple[int, int]) -> Tuple[int, int]:
+        """Return the span in the original text, of the same type of span.
+
+        The comments at the end of the span are not included.
+        """
+        begin, end = span
+        if not self.positions:
+            return span
+        original_begin = self.original(begin)
+        if end > begin:
+            original_end = self.original(end - 1) + 1
+        else:
+            original_end = original_begin
+        return type(span)(original_begin, original_end)
+
+    def original_captures(self,
+                          captures: Iterable[Tuple[T, Tuple[int, int]]]) \
+            -> List[Tuple[T, Tuple[int, int]]]:
+        """Return the captures with their spans in the original text."""
+        if not self.positions:
+            return list(captures)
+        return [
+            type(capture)(capture[0], self.original_span(capture[1]))
+            for capture in captures
+        ]
+
+
+def strip_comments(source: str) -> Tuple[str, OffsetMap]:
+    """Remove all the html comments from a string.
+
+    Return the string without the comments and the map of its offsets to the
+    original string. The string itself and an empty map are returned if it
+    does not contain any comment.
+    """
+    if COMMENT_START not in source:
+        return source, OffsetMap()
+
+    pieces = []
+    positions = []
+    removed = []
+    last_end = 0
+    length = 0
+    total_removed = 0
+    for begin, end in comment_spans(source):
+        pieces.append(source[last_end:begin])
+        length += begin - last_end
+        total_removed += end - begin
+        positions.append(length)
+        removed.append(total_removed)
+        last_end = end
+    pieces.append(source[last_end:])
+    return ''.join(pieces), OffsetMap(positions, removed)
 
 
 def has_next(peekable: more_itertools.peekable) -> bool: